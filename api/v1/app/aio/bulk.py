@@ -0,0 +1,159 @@
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.aio import rollups, stock, versions
+from app.bulk import (
+    NOT_FOUND, accept, brand_moves, chunk_ids, plan, result, segment_failed, settle, step_id, success, summary,
+    write_errors
+)
+from app.signals import collection_changed
+from app.stock import InvalidSale, StockError, check_sale, deltas
+
+# El mismo /bulk que app/bulk.py sobre AsyncMongoClient. La planificación de cada
+# operación y el armado de resultados se comparten; aquí solo van las esperas.
+
+class AsyncBulkRun:
+    def __init__(self, db, collection, ordered, prepare=None, single=None):
+        self.db = db
+        self.collection = collection
+        self.ordered = ordered
+        self.prepare = prepare
+        self.single = single or {}
+        self.results = {}
+        self.segment = []
+        self.segment_ids = set()
+        self.failed_at = None
+        self.changed = False
+        self.inserts_only = True
+        self.moved_stock = False
+
+    def stopped(self):
+        return self.ordered and self.failed_at is not None
+
+    async def fail(self, op, status, message):
+        if self.ordered:
+            await self.flush()
+            if self.failed_at is not None:
+                return
+            self.failed_at = op["index"]
+        self.results[op["index"]] = result(op, status, error=message)
+
+    async def run(self, operations, chunk_size):
+        for start in range(0, len(operations), chunk_size):
+            chunk = operations[start:start + chunk_size]
+            ids = chunk_ids(chunk)
+            docs = {
+                doc["_id"]: doc async for doc in self.db[self.collection].find({"_id": {"$in": ids}})
+            } if ids else {}
+            for op in chunk:
+                if self.stopped():
+                    break
+                await self.step(op, docs)
+            await self.flush()
+            if self.stopped():
+                break
+        await self.finish()
+        return summary(operations, self.results, self.ordered, self.failed_at)
+
+    async def step(self, op, docs):
+        if op["error"]:
+            return await self.fail(op, 400, op["error"])
+        if op["op"] in self.single:
+            await self.flush()
+            if not self.stopped():
+                await self.run_single(op, docs)
+            return
+
+        step = plan(op, docs, self.prepare)
+        if step["result"] is not None:
+            if step["result"]["status"] >= 400:
+                return await self.fail(op, step["result"]["status"], step["result"]["error"])
+            self.results[op["index"]] = step["result"]
+            return
+        if not self.ordered and step_id(step) in self.segment_ids:
+            # Sin orden, bulk_write agrupa por tipo (insert, update, delete): un segundo paso
+            # sobre el mismo _id va en otro bloque para que se escriba después del primero
+            await self.flush()
+        if self.collection == "sales":
+            try:
+                check_sale(step["after"])
+            except InvalidSale as e:
+                return await self.fail(op, 400, str(e))
+            step["changes"] = deltas({}, step["after"])
+            try:
+                await stock.reserve(self.db, step["changes"])
+            except StockError as e:
+                return await self.fail(op, 409, str(e))
+        accept(step, docs)
+        self.segment.append(step)
+        self.segment_ids.add(step_id(step))
+
+    async def run_single(self, op, docs):
+        before = docs.get(op["id"])
+        if before is None:
+            return await self.fail(op, 404, NOT_FOUND)
+        try:
+            if op["op"] == "update":
+                outcome = await self.single["update"](str(op["id"]), op["data"])
+            else:
+                outcome = await self.single["delete"](str(op["id"]))
+        except InvalidSale as e:
+            return await self.fail(op, 400, str(e))
+        except StockError as e:
+            return await self.fail(op, 409, str(e))
+        if outcome == 1:
+            if op["op"] == "update":
+                docs[op["id"]] = {**before, **op["data"]}
+                self.results[op["index"]] = result(op, 200, modified=True)
+            else:
+                docs.pop(op["id"], None)
+                self.results[op["index"]] = result(op, 200)
+        elif outcome == 0 and op["op"] == "update":
+            self.results[op["index"]] = result(op, 200, modified=False)
+        else:
+            await self.fail(op, 400, f"No se pudo ejecutar '{op['op']}'")
+
+    async def flush(self):
+        segment, self.segment = self.segment, []
+        self.segment_ids = set()
+        if not segment:
+            return
+        try:
+            await self.db[self.collection].bulk_write([step["write"] for step in segment], ordered=self.ordered)
+            failed = {}
+        except BulkWriteError as e:
+            failed = write_errors(e)
+        except PyMongoError as e:
+            failed = segment_failed(segment, e)
+        done, errors, skipped = settle(segment, failed, self.ordered)
+
+        for step in [step for step, _ in errors] + skipped:
+            await stock.undo(self.db, step["changes"])
+        for step in done:
+            self.results[step["op"]["index"]] = success(step)
+        for step, (status, message) in errors:
+            await self.fail(step["op"], status, message)
+        await self.effects(done)
+
+    async def effects(self, done):
+        if not done:
+            return
+        self.changed = True
+        self.inserts_only = self.inserts_only and all(step["op"]["op"] == "insert" for step in done)
+        if self.collection == "products":
+            for product_id, old, new in brand_moves(done):
+                await rollups.move_product(self.db, product_id, old, new)
+        if self.collection == "sales":
+            inserted = [step["after"] for step in done if step["op"]["op"] == "insert"]
+            if inserted:
+                await rollups.apply_sales(self.db, inserted)
+            self.moved_stock = self.moved_stock or any(step["changes"] for step in done)
+
+    async def finish(self):
+        if self.changed:
+            await versions.bump(self.db, self.collection, insert=self.inserts_only)
+            collection_changed.send(self.collection, op="bulk")
+        if self.moved_stock:
+            await versions.bump(self.db, stock.VERSION)
+            collection_changed.send(stock.VERSION, op="update")
+
+async def run_bulk(db, collection, operations, ordered=True, chunk_size=500, prepare=None, single=None):
+    return await AsyncBulkRun(db, collection, ordered, prepare, single).run(operations, chunk_size)
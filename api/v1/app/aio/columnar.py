@@ -0,0 +1,52 @@
+import asyncio
+import logging
+import time
+from app.aio import stock, versions
+from app.columnar import BATCH, COLLECTIONS, COUNTERS, DIMENSIONS, TABLES, columnar_store, version_state
+from app.versions import VERSIONS
+
+# La puesta al día de app/columnar.py sobre AsyncMongoClient. Las columnas y los
+# reportes son los mismos (columnar_store); aquí solo van las lecturas. Los reportes
+# no esperan nada, así que basta con que una sola tarea a la vez ponga al día.
+
+logger = logging.getLogger(__name__)
+
+refresh_lock = asyncio.Lock()
+
+async def _batches(cursor):
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def _append_new(store, db, name):
+    expected = await db[name].estimated_document_count()
+    async for batch in _batches(db[name].find(store.append_query(name), TABLES[name])):
+        store.append(name, batch)
+    return store.tables[name].size >= expected
+
+async def refresh(db, store=columnar_store):
+    async with refresh_lock:
+        stale = store.stale(await versions.current(db, COLLECTIONS))
+        if not stale:
+            return
+        states = {doc["_id"]: doc async for doc in db[VERSIONS].find({"_id": {"$in": stale}})}
+        for name in stale:
+            state = version_state(states.get(name))
+            if name in DIMENSIONS:
+                store.load_dimension(name, await db[name].find({}, DIMENSIONS[name]).to_list())
+            elif name == stock.VERSION:
+                if "products" not in stale:
+                    store.load_counters(await db.products.find({}, COUNTERS).to_list())
+            elif not (store.can_append(name, state) and await _append_new(store, db, name)):
+                started = time.perf_counter()
+                store.reset(name)
+                async for batch in _batches(db[name].find({}, TABLES[name]).batch_size(BATCH)):
+                    store.append(name, batch)
+                logger.info("Motor columnar: %s cargada (%d documentos, %.0f ms)", name,
+                            store.tables[name].size, (time.perf_counter() - started) * 1000)
+            store.synced[name] = state
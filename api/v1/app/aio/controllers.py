@@ -0,0 +1,289 @@
+import asyncio
+from quart import Blueprint, Response, current_app, jsonify, request
+from .models import brandsModel, productsModel, reviewsModel, salesModel, usersModel
+from .reports import reportsModel
+from ..models.reports import DASHBOARD_DEPENDS_ON
+from .utils import conditional, stream_ndjson
+from ..metrics import render
+from ..stock import InvalidSale, StockError
+from ..ingest import QueueFull, parse_ack
+from ..bulk import parse_ordered, parse_operations
+from ..columnar import check_whole_days, parse_engine
+from .ingest import asales_queue
+from ..utils.cache import report_cache
+from ..utils.pagination import wants_page, parse_page_args
+from ..utils.streaming import wants_stream
+from ..utils.projection import parse_fields
+from ..utils.relations import parse_ids, parse_expand
+from ..utils.query import parse_filters, parse_sort
+from ..utils.timeseries import parse_timeseries_args
+
+# Mismas rutas, nombres de endpoint y mensajes que app/controllers. Las cinco
+# colecciones tienen el mismo CRUD, así que sus blueprints se arman con una función.
+
+# colección: (modelo, singular, mensajes)
+COLLECTIONS = {
+    "brands": (brandsModel, "brand", {
+        "not_found": "Marca no encontrada",
+        "create": "No se pudo crear la marca",
+        "updated": "Marca actualizada",
+        "update": "No se pudo actualizar la marca",
+        "deleted": "Marca eliminada",
+        "delete": "No se pudo eliminar la marca",
+    }),
+    "products": (productsModel, "product", {
+        "not_found": "Producto no encontrado",
+        "create": "No se pudo crear el producto",
+        "updated": "Producto actualizado",
+        "update": "No se pudo actualizar el producto",
+        "deleted": "Producto eliminado",
+        "delete": "No se pudo eliminar el producto",
+    }),
+    "reviews": (reviewsModel, "review", {
+        "not_found": "Reseña no encontrada",
+        "create": "No se pudo crear la reseña",
+        "updated": "Reseña actualizada",
+        "update": "No se pudo actualizar la reseña",
+        "deleted": "Reseña eliminada",
+        "delete": "No se pudo eliminar la reseña",
+    }),
+    "sales": (salesModel, "sale", {
+        "not_found": "Venta no encontrada",
+        "create": "No se pudo registrar la venta",
+        "updated": "Venta actualizada",
+        "update": "No se pudo actualizar la venta",
+        "deleted": "Venta eliminada",
+        "delete": "No se pudo eliminar la venta",
+    }),
+    "users": (usersModel, "user", {
+        "not_found": "Usuario no encontrado",
+        "create": "No se pudo crear el usuario",
+        "updated": "Usuario actualizado",
+        "update": "No se pudo actualizar el usuario",
+        "deleted": "Usuario eliminado",
+        "delete": "No se pudo eliminar el usuario",
+    }),
+}
+
+async def create_sale():
+    data = await request.get_json()
+    if not asales_queue.running():
+        try:
+            sale_id = await salesModel.create(data)
+        except InvalidSale as e:
+            return jsonify({"error": str(e)}), 400
+        except StockError as e:
+            return jsonify({"error": str(e)}), 409
+        if sale_id:
+            return jsonify({"inserted_id": sale_id}), 201
+        return jsonify({"error": "No se pudo registrar la venta"}), 400
+
+    try:
+        ack = parse_ack(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        queued = await salesModel.enqueue(data)
+    except InvalidSale as e:
+        return jsonify({"error": str(e)}), 400
+    except StockError as e:
+        return jsonify({"error": str(e)}), 409
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    if queued is None:
+        return jsonify({"error": "No se pudo registrar la venta"}), 400
+
+    sale_id, future = queued
+    if ack == "queued":
+        return jsonify({"inserted_id": sale_id, "ack": "queued"}), 202
+    try:
+        # shield: al vencer la espera la venta sigue en la cola, solo se deja de esperar
+        saved = await asyncio.wait_for(asyncio.shield(future), current_app.config["SALES_QUEUE_ACK_TIMEOUT"])
+    except asyncio.TimeoutError:
+        return jsonify({"error": "La venta no se confirmó a tiempo", "inserted_id": sale_id}), 503, {"Retry-After": "1"}
+    if saved:
+        return jsonify({"inserted_id": sale_id}), 201
+    return jsonify({"error": "No se pudo registrar la venta"}), 400
+
+def collection_endpoint(name, model, singular, messages):
+    endpoint = Blueprint(f'{name}_endpoint', __name__)
+
+    @conditional(getattr(model.model, 'VERSIONS', (name,)), model.model.RELATIONS)
+    async def get_documents():
+        docId = request.args.get('id')
+        try:
+            fields = parse_fields(request.args, model.model.FIELDS)
+            expand = parse_expand(request.args, model.model.RELATIONS)
+            ids = parse_ids(request.args)
+            query = parse_filters(request.args, model.model.FILTERS, model.model.SEARCH)
+            sort = parse_sort(request.args, model.model.SORTS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if docId:
+            doc = await model.get_by_id(docId, fields, expand)
+            if doc:
+                return jsonify(doc), 200
+            return jsonify({"error": messages["not_found"]}), 404
+
+        if ids:
+            return jsonify(await model.get_many(ids, fields, expand)), 200
+
+        if wants_stream(request):
+            try:
+                _, after = parse_page_args(request.args, sort)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return stream_ndjson(
+                model.stream(after, fields, expand, query, sort),
+                transform=lambda batch: model.expand(batch, expand)
+            )
+
+        if wants_page(request.args):
+            try:
+                limit, after = parse_page_args(request.args, sort)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return jsonify(await model.get_page(limit, after, fields, expand, query, sort)), 200
+
+        return jsonify(await model.get_all(fields, expand, query, sort)), 200
+
+    async def create_document():
+        data = await request.get_json()
+        try:
+            doc_id = await model.create(data)
+        except InvalidSale as e:
+            return jsonify({"error": str(e)}), 400
+        except StockError as e:
+            return jsonify({"error": str(e)}), 409
+        if doc_id:
+            return jsonify({"inserted_id": doc_id}), 201
+        return jsonify({"error": messages["create"]}), 400
+
+    async def update_document():
+        docId = request.args.get('id')
+        data = await request.get_json()
+        try:
+            updated = await model.update(docId, data)
+        except InvalidSale as e:
+            return jsonify({"error": str(e)}), 400
+        except StockError as e:
+            return jsonify({"error": str(e)}), 409
+        if updated == 1:
+            return jsonify({"message": messages["updated"]}), 200
+        return jsonify({"error": messages["update"]}), 400
+
+    async def delete_document():
+        docId = request.args.get('id')
+        deleted = await model.delete(docId)
+        if deleted == 1:
+            return jsonify({"message": messages["deleted"]}), 200
+        return jsonify({"error": messages["delete"]}), 400
+
+    async def bulk_documents():
+        try:
+            ordered = parse_ordered(request.args)
+            operations = parse_operations(await request.get_json(), current_app.config["BULK_MAX_OPERATIONS"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(await model.bulk(operations, ordered, current_app.config["BULK_CHUNK_SIZE"])), 200
+
+    endpoint.add_url_rule(f'/{name}', f'get_{name}', get_documents, methods=['GET'])
+    # Las ventas pueden entrar por la cola de escritura (ver app/ingest.py)
+    create_view = create_sale if name == "sales" else create_document
+    endpoint.add_url_rule(f'/{name}', f'create_{singular}', create_view, methods=['POST'])
+    endpoint.add_url_rule(f'/{name}', f'update_{singular}', update_document, methods=['PUT'])
+    endpoint.add_url_rule(f'/{name}/bulk', f'bulk_{name}', bulk_documents, methods=['POST'])
+    endpoint.add_url_rule(f'/{name}', f'delete_{singular}', delete_document, methods=['DELETE'])
+    return endpoint
+
+collection_endpoints = [
+    collection_endpoint(name, model, singular, messages)
+    for name, (model, singular, messages) in COLLECTIONS.items()
+]
+
+reports_endpoint = Blueprint('reports_endpoint', __name__)
+
+async def run_report(method):
+    try:
+        engine = parse_engine(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if engine == "columnar":
+        return jsonify(await reportsModel.columnar(method)), 200
+    return jsonify(await getattr(reportsModel, method)()), 200
+
+# 1. Listado de todas las marcas que tienen al menos una venta
+@reports_endpoint.route('/reports/brands-with-sales', methods=['GET'])
+@conditional(reportsModel.brands_with_sales.depends_on)
+async def get_brands_with_sales():
+    return await run_report("brands_with_sales")
+
+# 2. Prendas vendidas y su cantidad restante en stock
+@reports_endpoint.route('/reports/products-stock', methods=['GET'])
+@conditional(reportsModel.products_sold_and_stock.depends_on)
+async def get_products_stock():
+    return await run_report("products_sold_and_stock")
+
+# 3. Top 5 marcas más vendidas y su cantidad de ventas
+@reports_endpoint.route('/reports/top-brands', methods=['GET'])
+@conditional(reportsModel.top_5_brands.depends_on)
+async def get_top_brands():
+    return await run_report("top_5_brands")
+
+# 4. Usuarios con más compras realizadas
+@reports_endpoint.route('/reports/top-users', methods=['GET'])
+@conditional(reportsModel.top_users.depends_on)
+async def get_top_users():
+    return await run_report("top_users")
+
+# 5. Promedio de calificación por producto
+@reports_endpoint.route('/reports/product-ratings', methods=['GET'])
+@conditional(reportsModel.average_ratings.depends_on)
+async def get_product_ratings():
+    return await run_report("average_ratings")
+
+# 6. Ventas por día, semana o mes en un rango de fechas (series densas, con ceros)
+@reports_endpoint.route('/reports/sales-timeseries', methods=['GET'])
+@conditional(reportsModel.sales_timeseries.depends_on)
+async def get_sales_timeseries():
+    try:
+        start, end, bucket, group_by = parse_timeseries_args(request.args)
+        engine = parse_engine(request.args)
+        if engine == "columnar":
+            check_whole_days(start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if engine == "columnar":
+        return jsonify(await reportsModel.columnar_timeseries(start, end, bucket, group_by)), 200
+    return jsonify(await reportsModel.sales_timeseries(start, end, bucket, group_by)), 200
+
+# 7. Panel: todos los reportes en una sola petición, con el tiempo de cada uno
+@reports_endpoint.route('/reports/dashboard', methods=['GET'])
+@conditional(DASHBOARD_DEPENDS_ON)
+async def get_dashboard():
+    try:
+        engine = parse_engine(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if engine == "columnar":
+        data = await reportsModel.columnar_dashboard()
+    else:
+        data = await reportsModel.dashboard(current_app.config["REPORTS_DASHBOARD_TIMEOUT"])
+    response = jsonify(data)
+    # Un panel incompleto (algún reporte falló o no terminó) no lleva ETag: el cliente no lo guarda
+    if data["errors"]:
+        response.cache_control.no_store = True
+    return response, 200
+
+# Estado de la caché de reportes (aciertos, fallos, desalojos, invalidaciones)
+@reports_endpoint.route('/reports/cache-stats', methods=['GET'])
+async def get_reports_cache_stats():
+    return jsonify(report_cache.stats()), 200
+
+metrics_endpoint = Blueprint('metrics_endpoint', __name__)
+
+# Métricas de MongoDB, de las peticiones y de la caché en formato de texto de Prometheus
+@metrics_endpoint.route('/metrics', methods=['GET'])
+async def get_metrics():
+    return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
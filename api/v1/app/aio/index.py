@@ -0,0 +1,133 @@
+import asyncio
+import os
+from pymongo import AsyncMongoClient, uri_parser
+from pymongo.errors import PyMongoError
+from quart import Quart, current_app, g, request
+from app.index import configure, report_missing_indexes
+from app.indexes import INDEXES, missing_in
+from app.metrics import command_metrics, begin_request, finish_request
+from app.logs import slow_query_log
+from app.utils.encoding import BSONJSONProvider
+from app.aio.ingest import asales_queue
+
+# Versión ASGI de la API: las mismas rutas de /clothing/api/v1 servidas por Quart
+# sobre AsyncMongoClient. Todas las peticiones de un proceso comparten un solo
+# event loop, así miles de peticiones concurrentes esperando a MongoDB no
+# necesitan un hilo cada una.
+
+class AsyncMongo:
+    """Equivalente async de PyMongo(): `cx` es el AsyncMongoClient y `db` la base de MONGO_URI."""
+
+    def __init__(self):
+        self.cx = None
+        self.db = None
+
+    def init_app(self, app, **kwargs):
+        # Mismo JSON que la app de Flask
+        app.json = BSONJSONProvider(app)
+
+        # El cliente se crea dentro del event loop del servidor (uno por worker) y se cierra al apagarlo
+        @app.before_serving
+        async def connect():
+            uri = app.config["MONGO_URI"]
+            self.cx = AsyncMongoClient(uri, **kwargs)
+            database = uri_parser.parse_uri(uri)["database"]
+            self.db = self.cx[database] if database else None
+
+        @app.after_serving
+        async def close():
+            if self.cx is not None:
+                await self.cx.close()
+
+amongo = AsyncMongo()
+
+def create_asgi_app():
+    app = Quart(__name__)
+
+    pool = configure(app)
+
+    # Los mismos listeners que la app de Flask: /metrics y el log de comandos lentos
+    amongo.init_app(app, event_listeners=[command_metrics, slow_query_log], **pool)
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+    app.teardown_request(record_failed_request)
+    app.after_request(allow_cors)
+    app.before_serving(check_indexes)
+    app.before_serving(warm_up_pool)
+    app.while_serving(run_sales_queue)
+
+    from .controllers import collection_endpoints, reports_endpoint, metrics_endpoint
+    for blueprint in collection_endpoints:
+        app.register_blueprint(blueprint, url_prefix="/clothing/api/v1")
+    app.register_blueprint(reports_endpoint, url_prefix="/clothing/api/v1")
+    app.register_blueprint(metrics_endpoint)
+
+    return app
+
+async def start_request_timer():
+    g.request_started = begin_request()
+
+async def record_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        finish_request(request.endpoint or "unmatched", request.method, response.status_code, started,
+                       current_app.config["SLOW_REQUEST_MS"] / 1000)
+    return response
+
+async def record_failed_request(error=None):
+    # Como en la app de Flask: una excepción que no llegó a after_request cuenta como 500
+    started = g.pop("request_started", None)
+    if started is not None:
+        finish_request(request.endpoint or "unmatched", request.method, 500, started,
+                       current_app.config["SLOW_REQUEST_MS"] / 1000)
+
+async def allow_cors(response):
+    # Lo mismo que CORS(app, origins="*") en la app de Flask, incluidas las preflight (OPTIONS)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    if request.method == "OPTIONS":
+        response.headers["Access-Control-Allow-Methods"] = response.headers.get("Allow", "GET, POST, PUT, DELETE")
+        requested = request.headers.get("Access-Control-Request-Headers")
+        if requested:
+            response.headers["Access-Control-Allow-Headers"] = requested
+    return response
+
+async def check_indexes():
+    app = current_app
+    mode = app.config["MONGO_INDEX_CHECK"]
+    if mode == "off":
+        return
+
+    try:
+        missing = []
+        for collection in INDEXES:
+            missing += missing_in(collection, await amongo.db[collection].index_information())
+    except PyMongoError as e:
+        if mode == "strict":
+            raise
+        app.logger.warning("No se pudieron verificar los índices: %s", e)
+        return
+    report_missing_indexes(app, missing)
+
+async def run_sales_queue():
+    # Después de conectar (before_serving) y antes de cerrar el cliente (after_serving): la cola se vacía al apagar
+    config = current_app.config
+    asales_queue.configure(config["SALES_QUEUE"] == "on", config["SALES_QUEUE_SIZE"],
+                           config["SALES_QUEUE_BATCH"], config["SALES_QUEUE_FLUSH_MS"])
+    asales_queue.start(amongo.db)
+    yield
+    await asales_queue.stop()
+
+async def warm_up(connections=1):
+    """Igual que app.index.warm_up: abre `connections` conexiones del pool antes de recibir tráfico."""
+    await amongo.cx.admin.command("ping")
+    if connections > 1:
+        await asyncio.gather(*(amongo.cx.admin.command("ping") for _ in range(connections)))
+
+async def warm_up_pool():
+    connections = int(os.getenv("MONGO_MIN_POOL_SIZE") or 1)
+    timeout = float(os.getenv("MONGO_WARMUP_TIMEOUT", "10"))
+    # Si MongoDB no responde el worker arranca igual, como con gunicorn (serve.py)
+    try:
+        await asyncio.wait_for(warm_up(connections), timeout)
+    except Exception as e:
+        current_app.logger.warning("No se pudo precalentar MongoDB: %s", e or type(e).__name__)
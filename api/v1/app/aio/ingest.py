@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.aio import rollups, stock, versions
+from app.ingest import QueueFull, failed_indexes, insert_operations
+from app.signals import collection_changed
+
+# La cola de ventas de app/ingest.py sobre asyncio: una tarea del event loop del
+# worker la vacía por lotes y el cliente con ack=durable espera un Future del loop.
+# Se inicia después de conectar AsyncMongoClient y se vacía antes de cerrarlo.
+
+logger = logging.getLogger(__name__)
+
+class AsyncSalesQueue:
+    _STOP = object()
+
+    def __init__(self):
+        self.enabled = False
+        self.size = 10000
+        self.batch = 500
+        self.flush_ms = 20
+        self.retries = 3
+        self._db = None
+        self._queue = None
+        self._task = None
+
+    def configure(self, enabled, size=10000, batch=500, flush_ms=20, retries=3):
+        self.enabled = enabled
+        self.size = size
+        self.batch = batch
+        self.flush_ms = flush_ms
+        self.retries = retries
+
+    def start(self, db):
+        if not self.enabled or self._task is not None:
+            return
+        self._db = db
+        self._queue = asyncio.Queue(maxsize=self.size)
+        self._task = asyncio.create_task(self._run())
+
+    def running(self):
+        return self._task is not None
+
+    def submit(self, sale, changes):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((sale, changes, future))
+        except asyncio.QueueFull:
+            raise QueueFull()
+        return future
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is None:
+            return
+        await self._queue.put(self._STOP)
+        await task
+        logger.info("Cola de ventas detenida")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_ms / 1000
+            stop = False
+            while len(batch) < self.batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _insert(self, sales):
+        for attempt in range(self.retries + 1):
+            try:
+                await self._db.sales.bulk_write(insert_operations(sales), ordered=False)
+                return set()
+            except BulkWriteError as e:
+                return failed_indexes(e, attempt)
+            except PyMongoError as e:
+                logger.warning("Lote de %d ventas no guardado (intento %d): %s", len(sales), attempt + 1, e)
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 2))
+        return set(range(len(sales)))
+
+    async def _flush(self, batch):
+        try:
+            failed = await self._insert([sale for sale, _, _ in batch])
+        except Exception:
+            logger.exception("Error inesperado guardando un lote de ventas")
+            failed = set(range(len(batch)))
+
+        saved = [sale for index, (sale, _, _) in enumerate(batch) if index not in failed]
+        moved_stock = False
+        for index, (sale, changes, future) in enumerate(batch):
+            moved_stock = moved_stock or bool(changes)
+            if index in failed:
+                try:
+                    await stock.undo(self._db, changes)
+                except PyMongoError:
+                    logger.exception("No se pudo devolver el stock de la venta %s", sale.get("_id"))
+                if not future.done():
+                    future.set_result(None)
+
+        if saved:
+            try:
+                await rollups.apply_sales(self._db, saved)
+            except PyMongoError:
+                logger.exception("Totales de ventas sin actualizar; ejecuta 'clothing_db.py rebuild-rollups'")
+        try:
+            if saved:
+                await versions.bump(self._db, "sales", insert=True)
+            if moved_stock:
+                await versions.bump(self._db, stock.VERSION)
+        except PyMongoError:
+            logger.exception("No se pudieron actualizar las versiones de las colecciones")
+        if saved:
+            collection_changed.send("sales", op="insert")
+        if moved_stock:
+            collection_changed.send(stock.VERSION, op="update")
+
+        for index, (sale, _, future) in enumerate(batch):
+            # Un cliente que cortó la conexión cancela su Future
+            if index not in failed and not future.done():
+                future.set_result(str(sale["_id"]))
+        if failed:
+            logger.warning("%d de %d ventas del lote no se guardaron", len(failed), len(batch))
+
+asales_queue = AsyncSalesQueue()
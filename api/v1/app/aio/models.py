@@ -0,0 +1,268 @@
+from bson.objectid import ObjectId
+from app.aio.index import amongo
+from app.aio import rollups, stock, versions
+from app.aio.bulk import run_bulk
+from app.aio.utils import paginate, expand_relations
+from app.aio.ingest import asales_queue
+from app.ingest import QueueFull
+from app.signals import collection_changed
+from app.utils.pagination import page_sort
+from app.utils.streaming import open_cursor
+from app.utils.projection import build_projection
+from app.utils.query import sort_fields
+from app.utils.relations import coerce_ids, order_by_ids
+from app.models.brands import brandsModel as brands
+from app.models.products import productsModel as products
+from app.models.reviews import reviewsModel as reviews
+from app.models.sales import salesModel as sales
+from app.models.users import usersModel as users
+
+class asyncModel:
+    """
+    Versión async de los modelos de app/models sobre AsyncMongoClient. Los campos
+    permitidos, la proyección por defecto, las relaciones (?fields=, ?expand=), los
+    filtros y los campos de orden se toman del modelo síncrono (`model`), así ambas
+    APIs aceptan lo mismo.
+    """
+    collection = None
+    model = None
+
+    @classmethod
+    def projection(cls, fields, expand):
+        return build_projection(fields, cls.model.DEFAULT_PROJECTION, expand)
+
+    @classmethod
+    async def expand(cls, docs, fields):
+        return await expand_relations(amongo.db, docs, cls.model.RELATIONS, fields)
+
+    @classmethod
+    async def get_all(cls, fields=None, expand=None, query=None, sort=None):
+        cursor = amongo.db[cls.collection].find(query or {}, cls.projection(fields, expand))
+        if sort:
+            cursor = cursor.sort(page_sort(sort))
+        return await cls.expand(await cursor.to_list(), expand)
+
+    @classmethod
+    async def get_page(cls, limit, after=None, fields=None, expand=None, query=None, sort=None):
+        # Los campos de `sort` se proyectan siempre: el cursor de la página siguiente sale de ellos
+        projection = cls.projection(fields, (expand or []) + sort_fields(sort))
+        page = await paginate(amongo.db[cls.collection], limit, after, query, projection, sort)
+        await cls.expand(page['data'], expand)
+        return page
+
+    @classmethod
+    async def get_many(cls, ids, fields=None, expand=None):
+        # Una sola consulta $in para toda la lista de ids
+        docs = await amongo.db[cls.collection].find({"_id": {"$in": ids}}, cls.projection(fields, expand)).to_list()
+        return await cls.expand(order_by_ids(docs, ids), expand)
+
+    @classmethod
+    def stream(cls, after=None, fields=None, expand=None, query=None, sort=None):
+        return open_cursor(amongo.db[cls.collection], after, cls.projection(fields, expand), query, sort)
+
+    @classmethod
+    async def get_by_id(cls, doc_id, fields=None, expand=None):
+        try:
+            doc = await amongo.db[cls.collection].find_one({"_id": ObjectId(doc_id)}, cls.projection(fields, expand))
+            if doc:
+                await cls.expand([doc], expand)
+                return doc
+        except:
+            return None
+
+    @classmethod
+    def _coerce_fields(cls, data):
+        return coerce_ids(data, cls.model.RELATIONS)
+
+    @classmethod
+    async def create(cls, data):
+        cls._coerce_fields(data)
+        try:
+            result = await amongo.db[cls.collection].insert_one(data)
+        except:
+            return None
+        await versions.bump(amongo.db, cls.collection, insert=True)
+        collection_changed.send(cls.collection, op="insert")
+        return str(result.inserted_id)
+
+    @classmethod
+    async def update(cls, doc_id, data):
+        cls._coerce_fields(data)
+        try:
+            result = await amongo.db[cls.collection].update_one(
+                {"_id": ObjectId(doc_id)},
+                {"$set": data}
+            )
+        except:
+            return -1
+        if result.modified_count:
+            await versions.bump(amongo.db, cls.collection)
+            collection_changed.send(cls.collection, op="update")
+        return result.modified_count
+
+    @classmethod
+    async def delete(cls, doc_id):
+        try:
+            result = await amongo.db[cls.collection].delete_one({"_id": ObjectId(doc_id)})
+        except:
+            return -1
+        if result.deleted_count:
+            await versions.bump(amongo.db, cls.collection)
+            collection_changed.send(cls.collection, op="delete")
+        return result.deleted_count
+
+    @classmethod
+    async def bulk(cls, operations, ordered=True, chunk_size=500):
+        return await run_bulk(amongo.db, cls.collection, operations, ordered, chunk_size, prepare=cls._coerce_fields)
+
+class brandsModel(asyncModel):
+    collection = "brands"
+    model = brands
+
+class reviewsModel(asyncModel):
+    collection = "reviews"
+    model = reviews
+
+class usersModel(asyncModel):
+    collection = "users"
+    model = users
+
+class productsModel(asyncModel):
+    collection = "products"
+    model = products
+
+    @classmethod
+    async def create(cls, data):
+        cls._coerce_fields(data)
+        try:
+            result = await amongo.db.products.insert_one(data)
+        except:
+            return None
+        await rollups.move_product(amongo.db, result.inserted_id, None, data.get("brand_id"))
+        await versions.bump(amongo.db, "products", insert=True)
+        collection_changed.send("products", op="insert")
+        return str(result.inserted_id)
+
+    @classmethod
+    async def update(cls, product_id, data):
+        cls._coerce_fields(data)
+        try:
+            # Se necesita la marca anterior por si el producto cambia de marca
+            before = await amongo.db.products.find_one_and_update(
+                {"_id": ObjectId(product_id)},
+                {"$set": data}
+            )
+        except:
+            return -1
+        if before is None or all(key in before and before[key] == value for key, value in data.items()):
+            return 0
+        await rollups.move_product(amongo.db, before["_id"], before.get("brand_id"), {**before, **data}.get("brand_id"))
+        await versions.bump(amongo.db, "products")
+        collection_changed.send("products", op="update")
+        return 1
+
+    @classmethod
+    async def delete(cls, product_id):
+        try:
+            product = await amongo.db.products.find_one_and_delete({"_id": ObjectId(product_id)})
+        except:
+            return -1
+        if product is None:
+            return 0
+        await rollups.move_product(amongo.db, product["_id"], product.get("brand_id"), None)
+        await versions.bump(amongo.db, "products")
+        collection_changed.send("products", op="delete")
+        return 1
+
+class salesModel(asyncModel):
+    collection = "sales"
+    model = sales
+
+    @classmethod
+    async def _stock_changed(cls, changes):
+        if changes:
+            await versions.bump(amongo.db, stock.VERSION)
+            collection_changed.send(stock.VERSION, op="update")
+
+    @classmethod
+    async def create(cls, data):
+        sales._coerce_fields(data)
+        stock.check_sale(data)
+        changes = stock.deltas({}, data)
+        await stock.reserve(amongo.db, changes)
+        try:
+            result = await amongo.db.sales.insert_one(data)
+        except:
+            await stock.undo(amongo.db, changes)
+            return None
+        await rollups.apply_sale(amongo.db, data)
+        await versions.bump(amongo.db, "sales", insert=True)
+        collection_changed.send("sales", op="insert")
+        await cls._stock_changed(changes)
+        return str(result.inserted_id)
+
+    @classmethod
+    async def enqueue(cls, data):
+        if not isinstance(data, dict):
+            return None
+        sales._coerce_fields(data)
+        stock.check_sale(data)
+        data.setdefault("_id", ObjectId())
+        changes = stock.deltas({}, data)
+        await stock.reserve(amongo.db, changes)
+        try:
+            future = asales_queue.submit(data, changes)
+        except QueueFull:
+            await stock.undo(amongo.db, changes)
+            raise
+        return str(data["_id"]), future
+
+    @classmethod
+    async def update(cls, sale_id, data):
+        sales._coerce_fields(data)
+        try:
+            # Se necesita la venta anterior para restar sus totales y su stock
+            before = await amongo.db.sales.find_one({"_id": ObjectId(sale_id)})
+        except:
+            return -1
+        if before is None or all(key in before and before[key] == value for key, value in data.items()):
+            return 0
+        # La venta como queda también tiene que poder mover stock (no se puede quitar el producto)
+        stock.check_sale({**before, **data})
+        changes = stock.deltas(before, {**before, **data})
+        await stock.reserve(amongo.db, changes)
+        try:
+            before = await amongo.db.sales.find_one_and_update(stock.sale_filter(before), {"$set": data})
+        except:
+            before = None
+        if before is None:
+            await stock.undo(amongo.db, changes)
+            return -1
+        await stock.release(amongo.db, changes)
+        await rollups.update_sale(amongo.db, before, {**before, **data})
+        await versions.bump(amongo.db, "sales")
+        collection_changed.send("sales", op="update")
+        await cls._stock_changed(changes)
+        return 1
+
+    @classmethod
+    async def delete(cls, sale_id):
+        try:
+            sale = await amongo.db.sales.find_one_and_delete({"_id": ObjectId(sale_id)})
+        except:
+            return -1
+        if sale is None:
+            return 0
+        changes = stock.deltas(sale, {})
+        await stock.release(amongo.db, changes)
+        await rollups.apply_sale(amongo.db, sale, -1)
+        await versions.bump(amongo.db, "sales")
+        collection_changed.send("sales", op="delete")
+        await cls._stock_changed(changes)
+        return 1
+
+    @classmethod
+    async def bulk(cls, operations, ordered=True, chunk_size=500):
+        return await run_bulk(amongo.db, "sales", operations, ordered, chunk_size,
+                              prepare=sales._coerce_fields,
+                              single={"update": cls.update, "delete": cls.delete})
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from app.aio.index import amongo
+from app.aio import columnar, rollups, stock, versions
+from app.columnar import columnar_store
+from app.models.reports import DASHBOARD, reportsModel as pipelines, _timed
+from app.utils.cache import cached_report
+from app.utils.timeseries import bucket_starts, densify
+
+# Los mismos reportes que app/models/reports.py: los pipelines vienen de ahí
+# (métodos `*_pipeline`) y la caché es la misma `report_cache`.
+
+logger = logging.getLogger(__name__)
+
+async def current_versions(names):
+    return await versions.current(amongo.db, names)
+
+async def _aggregate(collection, pipeline):
+    cursor = await amongo.db[collection].aggregate(pipeline)
+    return await cursor.to_list()
+
+class reportsModel:
+
+    # 1. Listado de todas las marcas que tienen al menos una venta
+    @staticmethod
+    @cached_report(("brands", "products", "sales"), current_versions)
+    async def brands_with_sales():
+        return await _aggregate(*pipelines.brands_with_sales_pipeline(await rollups.is_ready(amongo.db)))
+
+    # 2. Prendas vendidas y su cantidad restante en stock
+    @staticmethod
+    @cached_report(("products", "sales", stock.VERSION), current_versions)
+    async def products_sold_and_stock():
+        if await stock.is_ready(amongo.db):
+            return await _aggregate(*pipelines.products_sold_and_stock_pipeline(from_counters=True))
+        return await _aggregate(*pipelines.products_sold_and_stock_pipeline(await rollups.is_ready(amongo.db)))
+
+    # 3. Top 5 marcas más vendidas
+    @staticmethod
+    @cached_report(("brands", "products", "sales"), current_versions)
+    async def top_5_brands():
+        return await _aggregate(*pipelines.top_5_brands_pipeline(await rollups.is_ready(amongo.db)))
+
+    # 4. Usuarios con más compras realizadas
+    @staticmethod
+    @cached_report(("users", "sales"), current_versions)
+    async def top_users():
+        top = await _aggregate(*pipelines.top_users_pipeline(await rollups.is_ready(amongo.db)))
+        missing = pipelines.TOP - len(top)
+        if missing <= 0:
+            return top
+        query, projection = pipelines.users_without_purchases_query(top)
+        users = await amongo.db.users.find(query, projection).limit(missing).to_list()
+        return top + pipelines.without_purchases(users)
+
+    # 5. Promedio de calificación por producto
+    @staticmethod
+    @cached_report(("products", "reviews"), current_versions)
+    async def average_ratings():
+        return await _aggregate(*pipelines.average_ratings_pipeline())
+
+    # 6. Ventas por intervalo de tiempo (día, semana o mes), opcionalmente por producto o marca
+    @staticmethod
+    @cached_report(("brands", "products", "sales"), current_versions)
+    async def sales_timeseries(start, end, bucket, group_by=None):
+        from_rollups = pipelines.timeseries_can_use_rollups(start, end, group_by) and await rollups.is_ready(amongo.db)
+        rows = await _aggregate(*pipelines.timeseries_pipeline(start, end, bucket, group_by, from_rollups))
+        series = densify(rows, bucket_starts(start, end, bucket))
+
+        names = {}
+        if group_by is not None:
+            collection, query = pipelines.timeseries_names_query(group_by, series)
+            async for doc in amongo.db[collection].find(query, {"name": 1}):
+                names[doc["_id"]] = doc.get("name")
+        return pipelines.timeseries_result(start, end, bucket, group_by, series, names)
+
+    # Motor columnar (?engine=columnar): las mismas columnas de app/columnar.py
+    @staticmethod
+    async def columnar(method, *args):
+        await columnar.refresh(amongo.db)
+        return getattr(columnar_store, method)(*args)
+
+    @staticmethod
+    async def columnar_timeseries(start, end, bucket, group_by=None):
+        series, names = await reportsModel.columnar("sales_series", start, end, bucket, group_by)
+        return pipelines.timeseries_result(start, end, bucket, group_by, series, names)
+
+    @staticmethod
+    async def columnar_dashboard():
+        started = time.perf_counter()
+        await columnar.refresh(amongo.db)
+        reports = {name: _timed(name, getattr(columnar_store, method)) for name, method in DASHBOARD}
+        return pipelines.dashboard_result(reports, started)
+
+    # 7. Panel: los cinco reportes a la vez, en el mismo event loop (no hacen falta hilos)
+    @staticmethod
+    async def dashboard(timeout=30):
+        started = time.perf_counter()
+
+        async def timed(name, report):
+            report_started = time.perf_counter()
+            try:
+                entry = {"data": await asyncio.wait_for(report(), timeout)}
+            except asyncio.TimeoutError:
+                entry = {"error": "Tiempo de espera agotado"}
+            except Exception:
+                logger.exception("Falló el reporte %s del panel", name)
+                entry = {"error": "No se pudo calcular el reporte"}
+            entry["ms"] = round((time.perf_counter() - report_started) * 1000, 3)
+            return name, entry
+
+        entries = await asyncio.gather(*(
+            timed(name, getattr(reportsModel, method)) for name, method in DASHBOARD
+        ))
+        return pipelines.dashboard_result(dict(entries), started)
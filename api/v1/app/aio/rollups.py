@@ -0,0 +1,56 @@
+from app.rollups import BY_PRODUCT, BY_BRAND, BY_USER, BY_DAY, META, SALE_FIELDS, _amount, _day, batch_operations, product_ids
+
+# Las mismas actualizaciones de totales que app/rollups.py, sobre AsyncMongoClient.
+# La reconstrucción (rebuild) y la verificación quedan en app/rollups.py.
+
+async def _inc(db, collection, key, quantity, total, count):
+    await db[collection].update_one(
+        {"_id": key},
+        {"$inc": {"quantity": quantity, "total": total, "count": count}},
+        upsert=True
+    )
+
+async def is_ready(db):
+    return await db[META].find_one({"_id": "sales"}, {"_id": 1}) is not None
+
+async def apply_sale(db, sale, sign=1):
+    quantity = sign * _amount(sale.get("quantity"))
+    total = sign * _amount(sale.get("total"))
+    product_id = sale.get("product_id")
+
+    await _inc(db, BY_PRODUCT, product_id, quantity, total, sign)
+    await _inc(db, BY_USER, sale.get("user_id"), quantity, total, sign)
+
+    day = _day(sale.get("sale_date"))
+    if day is not None:
+        await _inc(db, BY_DAY, day, quantity, total, sign)
+
+    product = await db.products.find_one({"_id": product_id}, {"brand_id": 1}) if product_id is not None else None
+    if product and product.get("brand_id") is not None:
+        await _inc(db, BY_BRAND, product["brand_id"], quantity, total, sign)
+
+async def update_sale(db, before, after):
+    if all(before.get(field) == after.get(field) for field in SALE_FIELDS):
+        return
+    await apply_sale(db, before, -1)
+    await apply_sale(db, after, 1)
+
+async def apply_sales(db, sales):
+    ids = product_ids(sales)
+    brands = {
+        product["_id"]: product.get("brand_id")
+        async for product in db.products.find({"_id": {"$in": ids}}, {"brand_id": 1})
+    } if ids else {}
+    for collection, operations in batch_operations(sales, brands).items():
+        await db[collection].bulk_write(operations, ordered=False)
+
+async def move_product(db, product_id, old_brand_id, new_brand_id):
+    if old_brand_id == new_brand_id:
+        return
+    totals = await db[BY_PRODUCT].find_one({"_id": product_id})
+    if not totals or not totals.get("count"):
+        return
+    if old_brand_id is not None:
+        await _inc(db, BY_BRAND, old_brand_id, -totals["quantity"], -totals["total"], -totals["count"])
+    if new_brand_id is not None:
+        await _inc(db, BY_BRAND, new_brand_id, totals["quantity"], totals["total"], totals["count"])
@@ -0,0 +1,38 @@
+from app.stock import VERSION, InvalidSale, StockError, check_sale, deltas, not_found, sale_filter, _move_query, _move_update
+from app.rollups import META
+
+# Los mismos movimientos de stock que app/stock.py, sobre AsyncMongoClient.
+# check_sale(), deltas() y sale_filter() no consultan la base y se usan tal cual; el backfill
+# y la verificación quedan en app/stock.py.
+
+async def is_ready(db):
+    return await db[META].find_one({"_id": "stock"}, {"_id": 1}) is not None
+
+async def move(db, product_id, quantity):
+    result = await db.products.update_one(_move_query(product_id, quantity), _move_update(quantity))
+    if result.matched_count == 0 and quantity > 0:
+        if not await db.products.count_documents({"_id": product_id}, limit=1):
+            raise not_found(product_id, quantity)
+        raise StockError(product_id, quantity)
+
+async def reserve(db, changes):
+    done = []
+    try:
+        for product_id, quantity in changes.items():
+            if quantity > 0:
+                await move(db, product_id, quantity)
+                done.append((product_id, quantity))
+    except StockError:
+        for product_id, quantity in done:
+            await move(db, product_id, -quantity)
+        raise
+
+async def undo(db, changes):
+    for product_id, quantity in changes.items():
+        if quantity > 0:
+            await move(db, product_id, -quantity)
+
+async def release(db, changes):
+    for product_id, quantity in changes.items():
+        if quantity < 0:
+            await move(db, product_id, quantity)
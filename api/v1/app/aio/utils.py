@@ -0,0 +1,73 @@
+from functools import wraps
+from quart import Response, current_app, make_response, request
+from app.aio import versions
+from app.aio.index import amongo
+from app.utils.etag import dependencies, make_etag, not_modified, tag_response
+from app.utils.pagination import page_query, page_result, page_sort
+from app.utils.relations import relation_ids, attach_related
+from app.utils.streaming import NDJSON_MIMETYPE, STREAM_BATCH_SIZE
+
+# Versiones async de app/utils (paginación, ?expand=, NDJSON y ETags) para AsyncMongoClient.
+# Para abrir el cursor del stream sirve app.utils.streaming.open_cursor tal cual.
+
+async def paginate(collection, limit, after=None, query=None, projection=None, sort=None):
+    # Keyset igual que app.utils.pagination.paginate
+    cursor = collection.find(page_query(after, query, sort), projection).sort(page_sort(sort)).limit(limit + 1)
+    return page_result(await cursor.to_list(), limit, sort)
+
+async def expand_relations(db, docs, relations, fields):
+    # Una consulta $in por relación, igual que app.utils.relations.expand_relations
+    if not fields or not docs:
+        return docs
+
+    for field in fields:
+        collection, projection = relations[field]
+        ids = relation_ids(docs, field)
+
+        related = {}
+        if ids:
+            async for rel in db[collection].find({"_id": {"$in": ids}}, projection):
+                related[str(rel['_id'])] = rel
+
+        attach_related(docs, field, related)
+
+    return docs
+
+def stream_ndjson(cursor, transform=None):
+    """Como app.utils.streaming.stream_ndjson; `transform` es una corrutina que recibe cada lote."""
+    dumps = current_app.json.dumps_bytes
+
+    async def encode(batch):
+        if transform:
+            await transform(batch)
+        return b'\n'.join(dumps(doc) for doc in batch) + b'\n'
+
+    async def generate():
+        try:
+            batch = []
+            async for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    yield await encode(batch)
+                    batch = []
+            if batch:
+                yield await encode(batch)
+        finally:
+            # También si el cliente se desconecta: se libera el cursor en el servidor
+            await cursor.close()
+
+    return Response(generate(), mimetype=NDJSON_MIMETYPE)
+
+def conditional(depends_on, relations=None):
+    """Como app.utils.etag.conditional, para rutas async."""
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            current = await versions.current(amongo.db, dependencies(request.args, depends_on, relations))
+            tag = make_etag(request, current)
+            response = not_modified(request, tag, current_app.response_class)
+            if response is not None:
+                return response
+            return tag_response(await make_response(await fn(*args, **kwargs)), tag)
+        return wrapper
+    return decorator
@@ -0,0 +1,21 @@
+from bson.objectid import ObjectId
+from app.versions import VERSIONS, increments, read_result, version_mirror
+
+# Los mismos contadores de versión que app/versions.py, sobre AsyncMongoClient.
+# La copia en memoria (version_mirror) es la misma para las dos APIs.
+
+async def bump(db, collection, insert=False):
+    await db[VERSIONS].update_one(
+        {"_id": collection},
+        {"$inc": increments(insert), "$setOnInsert": {"epoch": ObjectId()}},
+        upsert=True
+    )
+
+async def current(db, names):
+    values, missing, generation = version_mirror.get(names)
+    if missing:
+        docs = await db[VERSIONS].find({"_id": {"$in": missing}}).to_list()
+        loaded = read_result(docs, missing)
+        version_mirror.put(loaded, generation)
+        values.update(loaded)
+    return values
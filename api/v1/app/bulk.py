@@ -0,0 +1,330 @@
+from bson.objectid import ObjectId
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from app import rollups, stock, versions
+from app.signals import collection_changed
+
+# Operaciones en lote de POST /<colección>/bulk: una lista de
+#   {"op": "insert", "data": {...}}
+#   {"op": "update", "id": "<id>", "data": {...}}
+#   {"op": "delete", "id": "<id>"}
+# Cada bloque (BULK_CHUNK_SIZE operaciones) lee de una vez los documentos que toca y
+# escribe con un solo bulk_write. El resultado de cada operación sale de esa lectura:
+# 404 si el documento no existe, `modified` si el update cambia algo. Con ordered=true
+# la primera operación que falla detiene el resto (424); con ordered=false se sigue, y
+# dos operaciones sobre el mismo _id van en bulk_write distintos (ver BulkRun.step).
+# Las ventas mueven el stock de app/stock.py: cada insert lo reserva (409 si no alcanza o
+# el producto no existe, 400 sin `product_id` o sin cantidad positiva) y los update/delete
+# van uno a uno por salesModel, que calcula las diferencias exactas.
+# La versión async (app/aio/bulk.py) reusa plan(), settle() y el armado de resultados.
+
+ACTIONS = ("insert", "update", "delete")
+NOT_FOUND = "Documento no encontrado"
+SKIPPED = 424
+
+def parse_ordered(args):
+    raw = args.get('ordered', 'true')
+    if raw not in ('true', 'false'):
+        raise ValueError("Parámetro 'ordered' inválido, debe ser true o false")
+    return raw == 'true'
+
+def _parse_operation(index, item):
+    op = {"index": index, "op": None, "id": None, "data": None, "error": None}
+    action = item.get("op") if isinstance(item, dict) else None
+    if action not in ACTIONS:
+        op["error"] = f"Operación inválida, 'op' debe ser uno de: {', '.join(ACTIONS)}"
+        return op
+    op["op"] = action
+
+    if action != "insert":
+        raw = item.get("id")
+        if isinstance(raw, ObjectId):
+            op["id"] = raw
+        elif isinstance(raw, str) and ObjectId.is_valid(raw):
+            op["id"] = ObjectId(raw)
+        else:
+            op["error"] = f"Id inválido: '{raw}'"
+            return op
+
+    if action != "delete":
+        data = item.get("data")
+        if not isinstance(data, dict) or not data:
+            op["error"] = "'data' debe ser un objeto con al menos un campo"
+            return op
+        op["data"] = data
+    return op
+
+def parse_operations(body, max_operations):
+    """Valida el cuerpo (lista de operaciones). Las operaciones mal formadas llevan su `error`."""
+    if not isinstance(body, list):
+        raise ValueError("El cuerpo debe ser una lista de operaciones")
+    if not body:
+        raise ValueError("La lista de operaciones está vacía")
+    if len(body) > max_operations:
+        raise ValueError(f"Máximo {max_operations} operaciones por petición")
+    return [_parse_operation(index, item) for index, item in enumerate(body)]
+
+def result(op, status, **fields):
+    return {"index": op["index"], "op": op["op"], "status": status, **fields}
+
+def chunk_ids(chunk):
+    return list({op["id"] for op in chunk if op["id"] is not None and op["error"] is None})
+
+def plan(op, docs, prepare=None):
+    """
+    Paso de una operación válida contra `docs` ({_id: documento} como quedan con las
+    operaciones anteriores del lote). Sin `write` el paso ya tiene su `result`.
+    """
+    step = {"op": op, "write": None, "result": None, "before": None, "after": None, "changes": {}}
+    if op["op"] == "insert":
+        doc = op["data"]
+        if prepare:
+            prepare(doc)
+        # Con un _id del cliente el producto podría tener ventas anteriores (ver app/rollups.py).
+        # Se guarda como ObjectId, igual que el `id` de update y delete
+        step["client_id"] = "_id" in doc
+        if isinstance(doc.get("_id"), str) and ObjectId.is_valid(doc["_id"]):
+            doc["_id"] = ObjectId(doc["_id"])
+        doc.setdefault("_id", ObjectId())
+        step["after"] = doc
+        step["write"] = InsertOne(doc)
+        return step
+
+    before = docs.get(op["id"])
+    if before is None:
+        step["result"] = result(op, 404, error=NOT_FOUND)
+        return step
+    step["before"] = before
+
+    if op["op"] == "delete":
+        step["write"] = DeleteOne({"_id": op["id"]})
+        return step
+
+    data = op["data"]
+    if prepare:
+        prepare(data)
+    if all(key in before and before[key] == value for key, value in data.items()):
+        step["result"] = result(op, 200, modified=False)
+        return step
+    step["after"] = {**before, **data}
+    step["write"] = UpdateOne({"_id": op["id"]}, {"$set": data})
+    return step
+
+def step_id(step):
+    # _id del documento que escribe el paso
+    return (step["after"] or step["before"])["_id"]
+
+def accept(step, docs):
+    # El paso entra al bloque: las operaciones siguientes ven el documento como queda
+    if step["after"] is not None:
+        docs[step["after"]["_id"]] = step["after"]
+    else:
+        docs.pop(step["before"]["_id"], None)
+
+def settle(segment, failed, ordered):
+    """
+    Reparte un bloque escrito según los errores de bulk_write ({posición: (status, mensaje)}):
+    (pasos guardados, [(paso, (status, mensaje))] con error, pasos sin ejecutar por ordered).
+    """
+    first = min(failed) if failed else None
+    done, errors, skipped = [], [], []
+    for position, step in enumerate(segment):
+        if position in failed:
+            errors.append((step, failed[position]))
+        elif ordered and first is not None and position > first:
+            skipped.append(step)
+        else:
+            done.append(step)
+    return done, errors, skipped
+
+def write_errors(error):
+    return {item["index"]: (400, item.get("errmsg", "Error de escritura")) for item in error.details.get("writeErrors", [])}
+
+def segment_failed(segment, error):
+    # Sin respuesta de MongoDB (conexión, tiempo de espera) todo el bloque cuenta como fallido
+    return {position: (503, f"Error de base de datos: {error}") for position in range(len(segment))}
+
+def success(step):
+    op = step["op"]
+    if op["op"] == "insert":
+        return result(op, 201, inserted_id=str(step["after"]["_id"]))
+    if op["op"] == "update":
+        return result(op, 200, modified=True)
+    return result(op, 200)
+
+def brand_moves(steps):
+    """(producto, marca anterior, marca nueva) de los productos guardados que cambian de marca."""
+    moves = []
+    for step in steps:
+        if step["op"]["op"] == "insert" and not step.get("client_id"):
+            continue
+        old = step["before"].get("brand_id") if step["before"] else None
+        new = step["after"].get("brand_id") if step["after"] else None
+        if old != new:
+            moves.append(((step["before"] or step["after"])["_id"], old, new))
+    return moves
+
+def summary(operations, results, ordered, failed_at):
+    items = [
+        results.get(op["index"]) or result(op, SKIPPED, error=f"No se ejecutó: falló la operación {failed_at}")
+        for op in operations
+    ]
+    return {
+        "ordered": ordered,
+        "inserted": sum(1 for item in items if item["status"] == 201),
+        "updated": sum(1 for item in items if item["op"] == "update" and item["status"] == 200),
+        "deleted": sum(1 for item in items if item["op"] == "delete" and item["status"] == 200),
+        "failed": sum(1 for item in items if item["status"] >= 400),
+        "results": items,
+    }
+
+class BulkRun:
+    """Una petición de /bulk sobre `collection`. `single` son las operaciones que van una a una por el model."""
+
+    def __init__(self, db, collection, ordered, prepare=None, single=None):
+        self.db = db
+        self.collection = collection
+        self.ordered = ordered
+        self.prepare = prepare
+        self.single = single or {}
+        self.results = {}
+        self.segment = []
+        self.segment_ids = set()
+        self.failed_at = None
+        self.changed = False
+        self.inserts_only = True
+        self.moved_stock = False
+
+    def stopped(self):
+        return self.ordered and self.failed_at is not None
+
+    def fail(self, op, status, message):
+        if self.ordered:
+            # Lo anterior se escribe primero; si falla, esta operación queda sin ejecutar
+            self.flush()
+            if self.failed_at is not None:
+                return
+            self.failed_at = op["index"]
+        self.results[op["index"]] = result(op, status, error=message)
+
+    def run(self, operations, chunk_size):
+        for start in range(0, len(operations), chunk_size):
+            chunk = operations[start:start + chunk_size]
+            ids = chunk_ids(chunk)
+            docs = {doc["_id"]: doc for doc in self.db[self.collection].find({"_id": {"$in": ids}})} if ids else {}
+            for op in chunk:
+                if self.stopped():
+                    break
+                self.step(op, docs)
+            self.flush()
+            if self.stopped():
+                break
+        self.finish()
+        return summary(operations, self.results, self.ordered, self.failed_at)
+
+    def step(self, op, docs):
+        if op["error"]:
+            return self.fail(op, 400, op["error"])
+        if op["op"] in self.single:
+            self.flush()
+            if not self.stopped():
+                self.run_single(op, docs)
+            return
+
+        step = plan(op, docs, self.prepare)
+        if step["result"] is not None:
+            if step["result"]["status"] >= 400:
+                return self.fail(op, step["result"]["status"], step["result"]["error"])
+            self.results[op["index"]] = step["result"]
+            return
+        if not self.ordered and step_id(step) in self.segment_ids:
+            # Sin orden, bulk_write agrupa por tipo (insert, update, delete): un segundo paso
+            # sobre el mismo _id va en otro bloque para que se escriba después del primero
+            self.flush()
+        if self.collection == "sales":
+            try:
+                stock.check_sale(step["after"])
+            except stock.InvalidSale as e:
+                return self.fail(op, 400, str(e))
+            step["changes"] = stock.deltas({}, step["after"])
+            try:
+                stock.reserve(self.db, step["changes"])
+            except stock.StockError as e:
+                return self.fail(op, 409, str(e))
+        accept(step, docs)
+        self.segment.append(step)
+        self.segment_ids.add(step_id(step))
+
+    def run_single(self, op, docs):
+        before = docs.get(op["id"])
+        if before is None:
+            return self.fail(op, 404, NOT_FOUND)
+        try:
+            if op["op"] == "update":
+                outcome = self.single["update"](str(op["id"]), op["data"])
+            else:
+                outcome = self.single["delete"](str(op["id"]))
+        except stock.InvalidSale as e:
+            return self.fail(op, 400, str(e))
+        except stock.StockError as e:
+            return self.fail(op, 409, str(e))
+        if outcome == 1:
+            if op["op"] == "update":
+                docs[op["id"]] = {**before, **op["data"]}
+                self.results[op["index"]] = result(op, 200, modified=True)
+            else:
+                docs.pop(op["id"], None)
+                self.results[op["index"]] = result(op, 200)
+        elif outcome == 0 and op["op"] == "update":
+            self.results[op["index"]] = result(op, 200, modified=False)
+        else:
+            self.fail(op, 400, f"No se pudo ejecutar '{op['op']}'")
+
+    def flush(self):
+        segment, self.segment = self.segment, []
+        self.segment_ids = set()
+        if not segment:
+            return
+        try:
+            self.db[self.collection].bulk_write([step["write"] for step in segment], ordered=self.ordered)
+            failed = {}
+        except BulkWriteError as e:
+            failed = write_errors(e)
+        except PyMongoError as e:
+            failed = segment_failed(segment, e)
+        done, errors, skipped = settle(segment, failed, self.ordered)
+
+        # El stock reservado por ventas que no se guardaron vuelve al producto
+        for step in [step for step, _ in errors] + skipped:
+            stock.undo(self.db, step["changes"])
+        for step in done:
+            self.results[step["op"]["index"]] = success(step)
+        for step, (status, message) in errors:
+            self.fail(step["op"], status, message)
+        self.effects(done)
+
+    def effects(self, done):
+        if not done:
+            return
+        self.changed = True
+        self.inserts_only = self.inserts_only and all(step["op"]["op"] == "insert" for step in done)
+        if self.collection == "products":
+            for product_id, old, new in brand_moves(done):
+                rollups.move_product(self.db, product_id, old, new)
+        if self.collection == "sales":
+            inserted = [step["after"] for step in done if step["op"]["op"] == "insert"]
+            if inserted:
+                rollups.apply_sales(self.db, inserted)
+            self.moved_stock = self.moved_stock or any(step["changes"] for step in done)
+
+    def finish(self):
+        # Una versión nueva y un aviso por petición, no uno por documento
+        if self.changed:
+            versions.bump(self.db, self.collection, insert=self.inserts_only)
+            collection_changed.send(self.collection, op="bulk")
+        if self.moved_stock:
+            versions.bump(self.db, stock.VERSION)
+            collection_changed.send(stock.VERSION, op="update")
+
+def run_bulk(db, collection, operations, ordered=True, chunk_size=500, prepare=None, single=None):
+    return BulkRun(db, collection, ordered, prepare, single).run(operations, chunk_size)
@@ -0,0 +1,527 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from bson.objectid import ObjectId
+from app import stock, versions
+from app.rollups import _amount
+from app.utils.timeseries import bucket_starts
+
+# NumPy es opcional (pip install numpy): sin él los reportes solo usan MongoDB (engine=mongo)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Motor columnar de reportes (?engine=columnar). Cada proceso guarda `sales` y `reviews`
+# en columnas de NumPy: producto, usuario y marca como códigos enteros, la fecha como
+# días desde 1970, cantidades y totales como float64. Los reportes se calculan con
+# bincount/argsort sobre esas columnas y sobre los totales por producto y usuario, que
+# se mantienen al cargar, sin consultar MongoDB en cada petición.
+#
+# Antes de cada reporte se comparan las versiones de app/versions.py con las leídas:
+#   - products, users y brands (pequeñas) se vuelven a leer completas si cambiaron; si
+#     solo cambió la versión de stock (una venta), se relee solo `stock` de products.
+#   - sales y reviews, si desde la última lectura solo hubo inserts (`inserts` subió lo
+#     mismo que `version`), se leen solo los documentos nuevos por _id. Con updates o
+#     deletes, o si falta alguno, se recargan completas.
+# Los resultados son los mismos que los de los pipelines de app/models/reports.py.
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ("mongo", "columnar")
+
+# Colecciones del motor y campos que se leen de cada una (en el orden en que se cargan)
+DIMENSIONS = {
+    "brands": {"name": 1, "country": 1},
+    "products": {"name": 1, "stock": 1, "brand_id": 1},
+    "users": {"username": 1, "email": 1},
+}
+TABLES = {
+    "sales": {"product_id": 1, "user_id": 1, "sale_date": 1, "quantity": 1, "total": 1},
+    "reviews": {"product_id": 1, "rating": 1},
+}
+# Contadores de products que mueven las ventas: con su versión propia (app/stock.py)
+# se releen solos, sin recargar los productos
+COUNTERS = {"stock": 1}
+COLLECTIONS = tuple(DIMENSIONS) + (stock.VERSION,) + tuple(TABLES)
+
+SALES_COLUMNS = {"product": "int32", "user": "int32", "day": "int32", "quantity": "float64", "total": "float64"}
+REVIEWS_COLUMNS = {"product": "int32", "rating": "float64", "rated": "int8"}
+
+# Documentos por lote al leer de MongoDB
+BATCH = 50000
+# Celdas (llave × intervalo) hasta las que una serie de tiempo se suma con bincount directo
+CELLS = 1 << 20
+# Al leer lo nuevo se repasan también los _id de los últimos segundos: un insert puede
+# llegar después de otro con un _id mayor (p. ej. una venta de la cola de app/ingest.py)
+APPEND_LAG = timedelta(seconds=5)
+
+EPOCH = datetime(1970, 1, 1)
+# Día de las ventas sin `sale_date` (o que no es una fecha): no entra en ningún rango
+NO_DAY = -2 ** 31
+
+def available():
+    return np is not None
+
+def parse_engine(args):
+    engine = args.get('engine', 'mongo')
+    if engine not in ENGINES:
+        raise ValueError(f"Parámetro 'engine' inválido, debe ser uno de: {', '.join(ENGINES)}")
+    if engine == 'columnar' and not available():
+        raise ValueError("engine=columnar no está disponible: instala numpy")
+    return engine
+
+def check_whole_days(start, end):
+    # Las columnas guardan el día de cada venta, no la hora
+    midnight = lambda value: value == value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if not (midnight(start) and midnight(end)):
+        raise ValueError("Con engine=columnar 'from' y 'to' deben ser días completos (YYYY-MM-DD)")
+
+def epoch_day(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None)
+        return (value - EPOCH).days
+    return NO_DAY
+
+def batches(docs, size=BATCH):
+    docs = iter(docs)
+    while True:
+        batch = list(islice(docs, size))
+        if not batch:
+            return
+        yield batch
+
+def version_state(doc):
+    """(epoch, version, inserts) del documento de app/versions.py de una colección."""
+    if doc is None:
+        return (None, 0, 0)
+    return (str(doc.get("epoch")), doc.get("version", 0), doc.get("inserts", 0))
+
+def only_inserts(before, after):
+    """Si entre dos estados de version_state solo hubo inserts."""
+    epoch, version, inserts = before
+    if epoch is None:
+        # Sin documento de versión todavía: todo lo que cuenta el nuevo vino después
+        return after[1] == after[2]
+    return after[0] == epoch and after[1] - version == after[2] - inserts
+
+def _fit(array, size, fill=0):
+    # Ajusta un arreglo por código al número actual de códigos (los nuevos con `fill`)
+    if len(array) >= size:
+        return array[:size]
+    grown = np.full(size, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def _number(value, integral):
+    # Como $sum: entero si todos los valores sumados eran enteros
+    return int(round(value)) if integral else float(value)
+
+class Codes:
+    """Código entero de cada valor distinto (un _id, None, ...). Un valor conserva su código al recargar."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+class Columns:
+    """Columnas de NumPy que crecen al agregar filas (la capacidad se duplica)."""
+
+    def __init__(self, dtypes):
+        self.dtypes = dtypes
+        self.size = 0
+        self.arrays = {name: np.empty(0, dtype) for name, dtype in dtypes.items()}
+
+    def append(self, chunk, rows):
+        needed = self.size + rows
+        capacity = len(self.arrays[next(iter(self.dtypes))])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2, 1024)
+            for name, array in self.arrays.items():
+                grown = np.empty(capacity, self.dtypes[name])
+                grown[:self.size] = array[:self.size]
+                self.arrays[name] = grown
+        for name, values in chunk.items():
+            self.arrays[name][self.size:needed] = values
+        self.size = needed
+
+    def __getitem__(self, name):
+        return self.arrays[name][:self.size]
+
+def _top(codes, values, top):
+    """Los `top` códigos de mayor valor, de mayor a menor (en un empate, el primero de `codes`)."""
+    if len(codes) > top:
+        keep = np.sort(np.argpartition(-values, top - 1)[:top])
+        codes, values = codes[keep], values[keep]
+    return codes[np.argsort(-values, kind="stable")]
+
+class ColumnarStore:
+    """
+    Las columnas de un proceso. `refresh` (o la versión async de app/aio/columnar.py)
+    y los reportes se llaman con `lock` tomado.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.codes = {name: Codes() for name in DIMENSIONS}
+        self.docs = {name: {} for name in DIMENSIONS}
+        self.order = {name: np.empty(0, np.int64) for name in DIMENSIONS} if available() else {}
+        self.synced = {}
+        self.checkpoints = {}
+        self.product_brand = None
+        self.tables = {}
+        for name in TABLES:
+            self.reset(name)
+
+    # --- Carga ---
+
+    def stale(self, current):
+        """Colecciones cuya versión (de versions.current) cambió desde la última lectura."""
+        return [
+            name for name in COLLECTIONS
+            if name not in self.synced or self.synced[name][:2] != current[name]
+        ]
+
+    def can_append(self, name, state):
+        if name not in TABLES or name not in self.synced:
+            return False
+        # Sin un _id de tipo ObjectId no hay desde dónde leer lo nuevo
+        if name not in self.checkpoints and self.tables[name].size:
+            return False
+        return only_inserts(self.synced[name], state)
+
+    def append_query(self, name):
+        if name not in self.checkpoints:
+            return {}
+        _, since, _ = self.checkpoints[name]
+        return {"_id": {"$gte": since}}
+
+    def load_dimension(self, name, docs):
+        codes = self.codes[name]
+        loaded, order = {}, []
+        for doc in docs:
+            code = codes.encode(doc["_id"])
+            loaded[code] = doc
+            order.append(code)
+        self.docs[name] = loaded
+        self.order[name] = np.array(order, dtype=np.int64)
+        if name == "products":
+            # Marca de cada producto existente (el valor de brand_id, exista o no la marca); -1 si no existe
+            brand = np.full(len(codes), -1, np.int64)
+            for code, doc in loaded.items():
+                brand[code] = self.codes["brands"].encode(doc.get("brand_id"))
+            self.product_brand = brand
+
+    def load_counters(self, docs):
+        codes, loaded = self.codes["products"].codes, self.docs["products"]
+        for doc in docs:
+            product = loaded.get(codes.get(doc["_id"]))
+            if product is not None:
+                product.update(doc)
+
+    def reset(self, name):
+        self.checkpoints.pop(name, None)
+        if not available():
+            return
+        if name == "sales":
+            self.tables[name] = Columns(SALES_COLUMNS)
+            self.integral = {"quantity": True, "total": True}
+            self.product_quantity = np.zeros(0)
+            self.product_sales = np.zeros(0, np.int64)
+            self.user_sales = np.zeros(0, np.int64)
+        else:
+            self.tables[name] = Columns(REVIEWS_COLUMNS)
+            self.product_rating = np.zeros(0)
+            self.product_rated = np.zeros(0, np.int64)
+            self.product_reviews = np.zeros(0, np.int64)
+
+    def append(self, name, docs):
+        """Agrega un lote de documentos (los que ya están, por _id, se saltan)."""
+        _, _, recent = self.checkpoints.get(name, (None, None, set()))
+        if recent:
+            docs = [doc for doc in docs if not isinstance(doc["_id"], ObjectId) or doc["_id"].binary not in recent]
+        if not docs:
+            return
+        if name == "sales":
+            self._append_sales(docs)
+        else:
+            self._append_reviews(docs)
+        self._advance(name, [doc["_id"] for doc in docs])
+
+    def _advance(self, name, ids):
+        # El _id más nuevo cargado, desde dónde leer lo nuevo (APPEND_LAG antes) y los _id
+        # ya cargados desde ahí. Se comparan los 12 bytes del ObjectId, que ordenan igual
+        newest, since, recent = self.checkpoints.get(name, (None, None, set()))
+        binaries = [value.binary for value in ids if isinstance(value, ObjectId)]
+        if not binaries:
+            return
+        if newest is None or max(binaries) > newest.binary:
+            newest = ObjectId(max(binaries))
+            start = ObjectId.from_datetime(newest.generation_time - APPEND_LAG)
+            # `since` tiene resolución de segundos: solo se recorta `recent` cuando avanza
+            if start != since:
+                since = start
+                recent = {value for value in recent if value >= since.binary}
+        recent.update(value for value in binaries if value >= since.binary)
+        self.checkpoints[name] = (newest, since, recent)
+
+    def _append_sales(self, docs):
+        products, users = self.codes["products"], self.codes["users"]
+        quantities = [_amount(doc.get("quantity")) for doc in docs]
+        totals = [_amount(doc.get("total")) for doc in docs]
+        self.integral["quantity"] = self.integral["quantity"] and all(isinstance(v, int) for v in quantities)
+        self.integral["total"] = self.integral["total"] and all(isinstance(v, int) for v in totals)
+        chunk = {
+            "product": np.array([products.encode(doc.get("product_id")) for doc in docs], np.int32),
+            "user": np.array([users.encode(doc.get("user_id")) for doc in docs], np.int32),
+            "day": np.array([epoch_day(doc.get("sale_date")) for doc in docs], np.int32),
+            "quantity": np.array(quantities, np.float64),
+            "total": np.array(totals, np.float64),
+        }
+        self.tables["sales"].append(chunk, len(docs))
+
+        # Totales por producto y por usuario: lo que suma el lote, agrupado con bincount
+        n_products, n_users = len(products), len(users)
+        self.product_quantity = _fit(self.product_quantity, n_products) + np.bincount(
+            chunk["product"], weights=chunk["quantity"], minlength=n_products)
+        self.product_sales = _fit(self.product_sales, n_products) + np.bincount(chunk["product"], minlength=n_products)
+        self.user_sales = _fit(self.user_sales, n_users) + np.bincount(chunk["user"], minlength=n_users)
+
+    def _append_reviews(self, docs):
+        products = self.codes["products"]
+        ratings = [doc.get("rating") for doc in docs]
+        # Como $avg: las calificaciones que no son números no cuentan
+        rated = [isinstance(value, (int, float)) and not isinstance(value, bool) for value in ratings]
+        chunk = {
+            "product": np.array([products.encode(doc.get("product_id")) for doc in docs], np.int32),
+            "rating": np.array([value if ok else 0 for value, ok in zip(ratings, rated)], np.float64),
+            "rated": np.array(rated, np.int8),
+        }
+        self.tables["reviews"].append(chunk, len(docs))
+
+        n_products = len(products)
+        self.product_rating = _fit(self.product_rating, n_products) + np.bincount(
+            chunk["product"], weights=chunk["rating"], minlength=n_products)
+        self.product_rated = _fit(self.product_rated, n_products) + np.bincount(
+            chunk["product"], weights=chunk["rated"], minlength=n_products).astype(np.int64)
+        self.product_reviews = _fit(self.product_reviews, n_products) + np.bincount(chunk["product"], minlength=n_products)
+
+    def refresh(self, db):
+        """Pone las columnas al día con MongoDB."""
+        stale = self.stale(versions.current(db, COLLECTIONS))
+        if not stale:
+            return
+        states = {doc["_id"]: doc for doc in db[versions.VERSIONS].find({"_id": {"$in": stale}})}
+        for name in stale:
+            state = version_state(states.get(name))
+            if name in DIMENSIONS:
+                self.load_dimension(name, db[name].find({}, DIMENSIONS[name]))
+            elif name == stock.VERSION:
+                # Si products se acaba de recargar ya trae los contadores al día
+                if "products" not in stale:
+                    self.load_counters(db.products.find({}, COUNTERS))
+            elif not (self.can_append(name, state) and self._append_new(db, name)):
+                started = time.perf_counter()
+                self.reset(name)
+                for batch in batches(db[name].find({}, TABLES[name]).batch_size(BATCH)):
+                    self.append(name, batch)
+                logger.info("Motor columnar: %s cargada (%d documentos, %.0f ms)", name,
+                            self.tables[name].size, (time.perf_counter() - started) * 1000)
+            self.synced[name] = state
+
+    def _append_new(self, db, name):
+        # Si después de leer lo nuevo hay menos filas que documentos, faltó alguno: se recarga
+        expected = db[name].estimated_document_count()
+        for batch in batches(db[name].find(self.append_query(name), TABLES[name])):
+            self.append(name, batch)
+        return self.tables[name].size >= expected
+
+    # --- Reportes (los mismos de reportsModel) ---
+
+    def _by_brand(self, per_product):
+        """Suma por código de marca de un arreglo por producto, solo con productos que existen."""
+        brand = self.product_brand if self.product_brand is not None else np.empty(0, np.int64)
+        values = _fit(per_product, len(brand))
+        existing = brand >= 0
+        return np.bincount(brand[existing], weights=values[existing], minlength=len(self.codes["brands"]))
+
+    def _brands_with_sales(self):
+        # Marcas de la colección `brands` con al menos una venta, en su orden natural
+        sales = self._by_brand(self.product_sales)
+        brands = self.order["brands"]
+        return brands[sales[brands] > 0]
+
+    def brands_with_sales(self):
+        docs = self.docs["brands"]
+        return [
+            {"_id": str(docs[code]["_id"]), "name": docs[code].get("name"), "country": docs[code].get("country")}
+            for code in self._brands_with_sales().tolist()
+        ]
+
+    def products_sold_and_stock(self):
+        docs = self.docs["products"]
+        n_products = len(self.codes["products"])
+        sold = _fit(self.product_quantity, n_products)
+        sales = _fit(self.product_sales, n_products)
+        products = self.order["products"]
+        integral = self.integral["quantity"]
+        data = []
+        for code, quantity, count in zip(products.tolist(), sold[products].tolist(), sales[products].tolist()):
+            doc = docs[code]
+            item = {"_id": str(doc["_id"])}
+            for field in ("name", "stock"):
+                if field in doc:
+                    item[field] = doc[field]
+            item["sold_quantity"] = _number(quantity, integral) if count else 0
+            data.append(item)
+        return data
+
+    def top_5_brands(self, top=5):
+        quantity = self._by_brand(self.product_quantity)
+        brands = self._brands_with_sales()
+        brands = _top(brands, quantity[brands], top)
+        docs = self.docs["brands"]
+        return [
+            {
+                "_id": str(docs[code]["_id"]),
+                "brand_name": docs[code].get("name"),
+                "total_sales": _number(total, self.integral["quantity"])
+            }
+            for code, total in zip(brands.tolist(), quantity[brands].tolist())
+        ]
+
+    def top_users(self, top=5):
+        sales = _fit(self.user_sales, len(self.codes["users"]))
+        users = self.order["users"]
+        buyers = users[sales[users] > 0]
+        buyers = _top(buyers, sales[buyers], top)
+        docs = self.docs["users"]
+
+        def row(code, purchases):
+            doc = docs[code]
+            item = {"_id": str(doc["_id"])}
+            for field in ("username", "email"):
+                if field in doc:
+                    item[field] = doc[field]
+            item["total_purchases"] = purchases
+            return item
+
+        data = [row(code, purchases) for code, purchases in zip(buyers.tolist(), sales[buyers].tolist())]
+        # Si hay menos de `top` compradores, se completa con usuarios sin compras (total 0)
+        missing = top - len(data)
+        if missing > 0:
+            rest = users[~np.isin(users, buyers)][:missing]
+            data += [row(code, 0) for code in rest.tolist()]
+        return data
+
+    def average_ratings(self):
+        n_products = len(self.codes["products"])
+        products = self.order["products"]
+        rating = _fit(self.product_rating, n_products)[products]
+        rated = _fit(self.product_rated, n_products)[products]
+        reviews = _fit(self.product_reviews, n_products)[products]
+
+        average = np.full(len(products), -np.inf)
+        has_rating = rated > 0
+        average[has_rating] = rating[has_rating] / rated[has_rating]
+        # Sin calificaciones (null) van al final, como en el $sort de MongoDB
+        positions = np.argsort(-average, kind="stable")
+
+        docs = self.docs["products"]
+        data = []
+        for code, value, rated, count in zip(products[positions].tolist(), average[positions].tolist(),
+                                             has_rating[positions].tolist(), reviews[positions].tolist()):
+            doc = docs[code]
+            item = {"_id": str(doc["_id"])}
+            if "name" in doc:
+                item["name"] = doc["name"]
+            item["avg_rating"] = value if rated else None
+            item["total_reviews"] = count
+            data.append(item)
+        return data
+
+    def sales_series(self, start, end, bucket, group_by=None):
+        """
+        (series, nombres) para reportsModel.timeseries_result: las ventas de [start, end)
+        por intervalo y, si se pide, por producto o marca. Solo días completos.
+        """
+        starts = bucket_starts(start, end, bucket)
+        sales = self.tables["sales"]
+        first, last = epoch_day(start), epoch_day(end)
+        day = sales["day"]
+        inside = (day >= first) & (day < last)
+        # Intervalo de cada día del rango (el último inicio que no es posterior a él) y de cada venta
+        bucket_of_day = np.searchsorted(
+            np.array([epoch_day(value) for value in starts]), np.arange(first, last), side="right") - 1
+        position = bucket_of_day[day[inside] - first]
+        quantity = sales["quantity"][inside]
+        total = sales["total"][inside]
+
+        if group_by is None:
+            keys, values = np.zeros(len(position), np.int64), [None]
+        else:
+            keys = sales["product"][inside].astype(np.int64)
+            values = self.codes["products"].values
+            if group_by == "brand":
+                # Como el $unwind del pipeline: solo ventas de productos que existen
+                brand = _fit(self.product_brand, len(self.codes["products"]), -1)[keys]
+                existing = brand >= 0
+                keys, position, quantity, total = brand[existing], position[existing], quantity[existing], total[existing]
+                values = self.codes["brands"].values
+
+        # Una celda por (llave, intervalo). Si caben, se suman todas con bincount;
+        # si no (p. ej. miles de productos por día), solo las que tienen ventas
+        cell = keys * len(starts) + position
+        n_cells = len(values) * len(starts)
+        if n_cells <= max(len(cell), CELLS):
+            count = np.bincount(cell, minlength=n_cells)
+            cells = np.flatnonzero(count)
+            sums = {
+                "quantity": np.bincount(cell, weights=quantity, minlength=n_cells)[cells],
+                "total": np.bincount(cell, weights=total, minlength=n_cells)[cells],
+                "count": count[cells],
+            }
+        else:
+            cells, inverse = np.unique(cell, return_inverse=True)
+            sums = {
+                "quantity": np.bincount(inverse, weights=quantity, minlength=len(cells)),
+                "total": np.bincount(inverse, weights=total, minlength=len(cells)),
+                "count": np.bincount(inverse, minlength=len(cells)),
+            }
+
+        series = {}
+        rows = zip(cells.tolist(), sums["quantity"].tolist(), sums["total"].tolist(), sums["count"].tolist())
+        for cell, quantity, total, count in rows:
+            key = values[cell // len(starts)]
+            if key not in series:
+                series[key] = {field: [0] * len(starts) for field in ("quantity", "total", "count")}
+            row = series[key]
+            index = cell % len(starts)
+            row["quantity"][index] = _number(quantity, self.integral["quantity"])
+            row["total"][index] = _number(total, self.integral["total"])
+            row["count"][index] = count
+
+        names = {}
+        if group_by is not None:
+            dimension = "products" if group_by == "product" else "brands"
+            codes, docs = self.codes[dimension], self.docs[dimension]
+            for key in series:
+                doc = docs.get(codes.codes.get(key)) if key is not None else None
+                if doc is not None:
+                    names[key] = doc.get("name")
+        return series, names
+
+columnar_store = ColumnarStore()
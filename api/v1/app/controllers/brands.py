@@ -1,19 +1,55 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from ..models.brands import brandsModel
+from ..utils.pagination import wants_page, parse_page_args
+from ..utils.streaming import wants_stream, stream_ndjson
+from ..utils.projection import parse_fields
+from ..utils.relations import parse_ids, parse_expand
+from ..utils.query import parse_filters, parse_sort
+from ..utils.etag import conditional
+from ..bulk import parse_ordered, parse_operations
 
 brands_endpoint = Blueprint('brands_endpoint', __name__)
 
 @brands_endpoint.route('/brands', methods=['GET'])
+@conditional(('brands',), brandsModel.RELATIONS)
 def get_brands():
     brandId = request.args.get('id')
+    try:
+        fields = parse_fields(request.args, brandsModel.FIELDS)
+        expand = parse_expand(request.args, brandsModel.RELATIONS)
+        ids = parse_ids(request.args)
+        query = parse_filters(request.args, brandsModel.FILTERS, brandsModel.SEARCH)
+        sort = parse_sort(request.args, brandsModel.SORTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if brandId:
-        brand = brandsModel.get_by_id(brandId)
+        brand = brandsModel.get_by_id(brandId, fields, expand)
         if brand:
             return jsonify(brand), 200
         return jsonify({"error": "Marca no encontrada"}), 404
 
-    brands = brandsModel.get_all()
+    if ids:
+        return jsonify(brandsModel.get_many(ids, fields, expand)), 200
+
+    if wants_stream(request):
+        try:
+            _, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return stream_ndjson(
+            brandsModel.stream(after, fields, expand, query, sort),
+            transform=lambda batch: brandsModel.expand(batch, expand)
+        )
+
+    if wants_page(request.args):
+        try:
+            limit, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(brandsModel.get_page(limit, after, fields, expand, query, sort)), 200
+
+    brands = brandsModel.get_all(fields, expand, query, sort)
     return jsonify(brands), 200
 
 @brands_endpoint.route('/brands', methods=['POST'])
@@ -39,4 +75,13 @@ def delete_brand():
     deleted = brandsModel.delete(brandId)
     if deleted == 1:
         return jsonify({"message": "Marca eliminada"}), 200
-    return jsonify({"error": "No se pudo eliminar la marca"}), 400
\ No newline at end of file
+    return jsonify({"error": "No se pudo eliminar la marca"}), 400
+
+@brands_endpoint.route('/brands/bulk', methods=['POST'])
+def bulk_brands():
+    try:
+        ordered = parse_ordered(request.args)
+        operations = parse_operations(request.json, current_app.config["BULK_MAX_OPERATIONS"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(brandsModel.bulk(operations, ordered, current_app.config["BULK_CHUNK_SIZE"])), 200
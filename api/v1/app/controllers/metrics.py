@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from ..metrics import render
+
+metrics_endpoint = Blueprint('metrics_endpoint', __name__)
+
+# Métricas de MongoDB, de las peticiones y de la caché en formato de texto de Prometheus
+@metrics_endpoint.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -1,19 +1,55 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from ..models.products import productsModel
+from ..utils.pagination import wants_page, parse_page_args
+from ..utils.streaming import wants_stream, stream_ndjson
+from ..utils.projection import parse_fields
+from ..utils.relations import parse_ids, parse_expand
+from ..utils.query import parse_filters, parse_sort
+from ..utils.etag import conditional
+from ..bulk import parse_ordered, parse_operations
 
 products_endpoint = Blueprint('products_endpoint', __name__)
 
 @products_endpoint.route('/products', methods=['GET'])
+@conditional(productsModel.VERSIONS, productsModel.RELATIONS)
 def get_products():
     productId = request.args.get('id')
+    try:
+        fields = parse_fields(request.args, productsModel.FIELDS)
+        expand = parse_expand(request.args, productsModel.RELATIONS)
+        ids = parse_ids(request.args)
+        query = parse_filters(request.args, productsModel.FILTERS, productsModel.SEARCH)
+        sort = parse_sort(request.args, productsModel.SORTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if productId:
-        product = productsModel.get_by_id(productId)
+        product = productsModel.get_by_id(productId, fields, expand)
         if product:
             return jsonify(product), 200
         return jsonify({"error": "Producto no encontrado"}), 404
 
-    products = productsModel.get_all()
+    if ids:
+        return jsonify(productsModel.get_many(ids, fields, expand)), 200
+
+    if wants_stream(request):
+        try:
+            _, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return stream_ndjson(
+            productsModel.stream(after, fields, expand, query, sort),
+            transform=lambda batch: productsModel.expand(batch, expand)
+        )
+
+    if wants_page(request.args):
+        try:
+            limit, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(productsModel.get_page(limit, after, fields, expand, query, sort)), 200
+
+    products = productsModel.get_all(fields, expand, query, sort)
     return jsonify(products), 200
 
 @products_endpoint.route('/products', methods=['POST'])
@@ -39,4 +75,13 @@ def delete_product():
     deleted = productsModel.delete(productId)
     if deleted == 1:
         return jsonify({"message": "Producto eliminado"}), 200
-    return jsonify({"error": "No se pudo eliminar el producto"}), 400
\ No newline at end of file
+    return jsonify({"error": "No se pudo eliminar el producto"}), 400
+
+@products_endpoint.route('/products/bulk', methods=['POST'])
+def bulk_products():
+    try:
+        ordered = parse_ordered(request.args)
+        operations = parse_operations(request.json, current_app.config["BULK_MAX_OPERATIONS"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(productsModel.bulk(operations, ordered, current_app.config["BULK_CHUNK_SIZE"])), 200
@@ -1,34 +1,91 @@
-from flask import Blueprint, jsonify
-from ..models.reports import reportsModel
+from flask import Blueprint, current_app, jsonify, request
+from ..columnar import check_whole_days, parse_engine
+from ..models.reports import DASHBOARD_DEPENDS_ON, reportsModel
+from ..utils.cache import report_cache
+from ..utils.etag import conditional
+from ..utils.timeseries import parse_timeseries_args
 
 reports_endpoint = Blueprint('reports_endpoint', __name__)
 
+def run_report(method):
+    # ?engine=columnar calcula el reporte en memoria (app/columnar.py) en vez de con MongoDB
+    try:
+        engine = parse_engine(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if engine == "columnar":
+        return jsonify(reportsModel.columnar(method)), 200
+    return jsonify(getattr(reportsModel, method)()), 200
+
 # 1. Listado de todas las marcas que tienen al menos una venta
 @reports_endpoint.route('/reports/brands-with-sales', methods=['GET'])
+@conditional(reportsModel.brands_with_sales.depends_on)
 def get_brands_with_sales():
-    data = reportsModel.brands_with_sales()
-    return jsonify(data), 200
+    return run_report("brands_with_sales")
 
 # 2. Prendas vendidas y su cantidad restante en stock
 @reports_endpoint.route('/reports/products-stock', methods=['GET'])
+@conditional(reportsModel.products_sold_and_stock.depends_on)
 def get_products_stock():
-    data = reportsModel.products_sold_and_stock()
-    return jsonify(data), 200
+    return run_report("products_sold_and_stock")
 
 # 3. Top 5 marcas más vendidas y su cantidad de ventas
 @reports_endpoint.route('/reports/top-brands', methods=['GET'])
+@conditional(reportsModel.top_5_brands.depends_on)
 def get_top_brands():
-    data = reportsModel.top_5_brands()
-    return jsonify(data), 200
+    return run_report("top_5_brands")
 
 # 4. Usuarios con más compras realizadas
 @reports_endpoint.route('/reports/top-users', methods=['GET'])
+@conditional(reportsModel.top_users.depends_on)
 def get_top_users():
-    data = reportsModel.top_users()
-    return jsonify(data), 200
+    return run_report("top_users")
 
 # 5. Promedio de calificación por producto
 @reports_endpoint.route('/reports/product-ratings', methods=['GET'])
+@conditional(reportsModel.average_ratings.depends_on)
 def get_product_ratings():
-    data = reportsModel.average_ratings()
+    return run_report("average_ratings")
+
+# 6. Ventas por día, semana o mes en un rango de fechas (series densas, con ceros)
+@reports_endpoint.route('/reports/sales-timeseries', methods=['GET'])
+@conditional(reportsModel.sales_timeseries.depends_on)
+def get_sales_timeseries():
+    try:
+        start, end, bucket, group_by = parse_timeseries_args(request.args)
+        engine = parse_engine(request.args)
+        if engine == "columnar":
+            check_whole_days(start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if engine == "columnar":
+        data = reportsModel.columnar_timeseries(start, end, bucket, group_by)
+    else:
+        data = reportsModel.sales_timeseries(start, end, bucket, group_by)
     return jsonify(data), 200
+
+# 7. Panel: todos los reportes en una sola petición, con el tiempo de cada uno
+@reports_endpoint.route('/reports/dashboard', methods=['GET'])
+@conditional(DASHBOARD_DEPENDS_ON)
+def get_dashboard():
+    try:
+        engine = parse_engine(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if engine == "columnar":
+        data = reportsModel.columnar_dashboard()
+    else:
+        data = reportsModel.dashboard(
+            current_app.config["REPORTS_DASHBOARD_WORKERS"],
+            current_app.config["REPORTS_DASHBOARD_TIMEOUT"]
+        )
+    response = jsonify(data)
+    # Un panel incompleto (algún reporte falló o no terminó) no lleva ETag: el cliente no lo guarda
+    if data["errors"]:
+        response.cache_control.no_store = True
+    return response, 200
+
+# Estado de la caché de reportes (aciertos, fallos, desalojos, invalidaciones)
+@reports_endpoint.route('/reports/cache-stats', methods=['GET'])
+def get_reports_cache_stats():
+    return jsonify(report_cache.stats()), 200
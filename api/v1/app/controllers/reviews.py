@@ -1,19 +1,55 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from ..models.reviews import reviewsModel
+from ..utils.pagination import wants_page, parse_page_args
+from ..utils.streaming import wants_stream, stream_ndjson
+from ..utils.projection import parse_fields
+from ..utils.relations import parse_ids, parse_expand
+from ..utils.query import parse_filters, parse_sort
+from ..utils.etag import conditional
+from ..bulk import parse_ordered, parse_operations
 
 reviews_endpoint = Blueprint('reviews_endpoint', __name__)
 
 @reviews_endpoint.route('/reviews', methods=['GET'])
+@conditional(('reviews',), reviewsModel.RELATIONS)
 def get_reviews():
     reviewId = request.args.get('id')
+    try:
+        fields = parse_fields(request.args, reviewsModel.FIELDS)
+        expand = parse_expand(request.args, reviewsModel.RELATIONS)
+        ids = parse_ids(request.args)
+        query = parse_filters(request.args, reviewsModel.FILTERS, reviewsModel.SEARCH)
+        sort = parse_sort(request.args, reviewsModel.SORTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if reviewId:
-        review = reviewsModel.get_by_id(reviewId)
+        review = reviewsModel.get_by_id(reviewId, fields, expand)
         if review:
             return jsonify(review), 200
         return jsonify({"error": "Reseña no encontrada"}), 404
 
-    reviews = reviewsModel.get_all()
+    if ids:
+        return jsonify(reviewsModel.get_many(ids, fields, expand)), 200
+
+    if wants_stream(request):
+        try:
+            _, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return stream_ndjson(
+            reviewsModel.stream(after, fields, expand, query, sort),
+            transform=lambda batch: reviewsModel.expand(batch, expand)
+        )
+
+    if wants_page(request.args):
+        try:
+            limit, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(reviewsModel.get_page(limit, after, fields, expand, query, sort)), 200
+
+    reviews = reviewsModel.get_all(fields, expand, query, sort)
     return jsonify(reviews), 200
 
 @reviews_endpoint.route('/reviews', methods=['POST'])
@@ -39,4 +75,13 @@ def delete_review():
     deleted = reviewsModel.delete(reviewId)
     if deleted == 1:
         return jsonify({"message": "Reseña eliminada"}), 200
-    return jsonify({"error": "No se pudo eliminar la reseña"}), 400
\ No newline at end of file
+    return jsonify({"error": "No se pudo eliminar la reseña"}), 400
+
+@reviews_endpoint.route('/reviews/bulk', methods=['POST'])
+def bulk_reviews():
+    try:
+        ordered = parse_ordered(request.args)
+        operations = parse_operations(request.json, current_app.config["BULK_MAX_OPERATIONS"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(reviewsModel.bulk(operations, ordered, current_app.config["BULK_CHUNK_SIZE"])), 200
@@ -1,34 +1,116 @@
-from flask import Blueprint, jsonify, request
+from concurrent.futures import TimeoutError
+from flask import Blueprint, current_app, jsonify, request
 from ..models.sales import salesModel
+from ..stock import InvalidSale, StockError
+from ..ingest import QueueFull, parse_ack, sales_queue
+from ..utils.pagination import wants_page, parse_page_args
+from ..utils.streaming import wants_stream, stream_ndjson
+from ..utils.projection import parse_fields
+from ..utils.relations import parse_ids, parse_expand
+from ..utils.query import parse_filters, parse_sort
+from ..utils.etag import conditional
+from ..bulk import parse_ordered, parse_operations
 
 sales_endpoint = Blueprint('sales_endpoint', __name__)
 
 @sales_endpoint.route('/sales', methods=['GET'])
+@conditional(('sales',), salesModel.RELATIONS)
 def get_sales():
     saleId = request.args.get('id')
+    try:
+        fields = parse_fields(request.args, salesModel.FIELDS)
+        expand = parse_expand(request.args, salesModel.RELATIONS)
+        ids = parse_ids(request.args)
+        query = parse_filters(request.args, salesModel.FILTERS, salesModel.SEARCH)
+        sort = parse_sort(request.args, salesModel.SORTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if saleId:
-        sale = salesModel.get_by_id(saleId)
+        sale = salesModel.get_by_id(saleId, fields, expand)
         if sale:
             return jsonify(sale), 200
         return jsonify({"error": "Venta no encontrada"}), 404
 
-    sales = salesModel.get_all()
+    if ids:
+        return jsonify(salesModel.get_many(ids, fields, expand)), 200
+
+    if wants_stream(request):
+        try:
+            _, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return stream_ndjson(
+            salesModel.stream(after, fields, expand, query, sort),
+            transform=lambda batch: salesModel.expand(batch, expand)
+        )
+
+    if wants_page(request.args):
+        try:
+            limit, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(salesModel.get_page(limit, after, fields, expand, query, sort)), 200
+
+    sales = salesModel.get_all(fields, expand, query, sort)
     return jsonify(sales), 200
 
 @sales_endpoint.route('/sales', methods=['POST'])
 def create_sale():
     data = request.json
-    sale_id = salesModel.create(data)
+    if sales_queue.running():
+        return enqueue_sale(data)
+    try:
+        sale_id = salesModel.create(data)
+    except InvalidSale as e:
+        return jsonify({"error": str(e)}), 400
+    except StockError as e:
+        # Se pidieron más unidades de las que quedan
+        return jsonify({"error": str(e)}), 409
     if sale_id:
         return jsonify({"inserted_id": sale_id}), 201
     return jsonify({"error": "No se pudo registrar la venta"}), 400
 
+def enqueue_sale(data):
+    # Con SALES_QUEUE=on la venta se guarda en lote (ver app/ingest.py)
+    try:
+        ack = parse_ack(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        queued = salesModel.enqueue(data)
+    except InvalidSale as e:
+        return jsonify({"error": str(e)}), 400
+    except StockError as e:
+        return jsonify({"error": str(e)}), 409
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    if queued is None:
+        return jsonify({"error": "No se pudo registrar la venta"}), 400
+
+    sale_id, future = queued
+    if ack == "queued":
+        return jsonify({"inserted_id": sale_id, "ack": "queued"}), 202
+    # ack=durable: responde cuando el lote de esta venta ya está en MongoDB
+    try:
+        saved = future.result(timeout=current_app.config["SALES_QUEUE_ACK_TIMEOUT"])
+    except TimeoutError:
+        # La venta sigue en la cola y puede guardarse después: el id sirve para consultarla antes de reintentar
+        return jsonify({"error": "La venta no se confirmó a tiempo", "inserted_id": sale_id}), 503, {"Retry-After": "1"}
+    if saved:
+        return jsonify({"inserted_id": sale_id}), 201
+    return jsonify({"error": "No se pudo registrar la venta"}), 400
+
 @sales_endpoint.route('/sales', methods=['PUT'])
 def update_sale():
     saleId = request.args.get('id')
     data = request.json
-    updated = salesModel.update(saleId, data)
+    try:
+        updated = salesModel.update(saleId, data)
+    except InvalidSale as e:
+        return jsonify({"error": str(e)}), 400
+    except StockError as e:
+        return jsonify({"error": str(e)}), 409
     if updated == 1:
         return jsonify({"message": "Venta actualizada"}), 200
     return jsonify({"error": "No se pudo actualizar la venta"}), 400
@@ -39,4 +121,13 @@ def delete_sale():
     deleted = salesModel.delete(saleId)
     if deleted == 1:
         return jsonify({"message": "Venta eliminada"}), 200
-    return jsonify({"error": "No se pudo eliminar la venta"}), 400
\ No newline at end of file
+    return jsonify({"error": "No se pudo eliminar la venta"}), 400
+
+@sales_endpoint.route('/sales/bulk', methods=['POST'])
+def bulk_sales():
+    try:
+        ordered = parse_ordered(request.args)
+        operations = parse_operations(request.json, current_app.config["BULK_MAX_OPERATIONS"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(salesModel.bulk(operations, ordered, current_app.config["BULK_CHUNK_SIZE"])), 200
@@ -1,19 +1,55 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from ..models.users import usersModel
+from ..utils.pagination import wants_page, parse_page_args
+from ..utils.streaming import wants_stream, stream_ndjson
+from ..utils.projection import parse_fields
+from ..utils.relations import parse_ids, parse_expand
+from ..utils.query import parse_filters, parse_sort
+from ..utils.etag import conditional
+from ..bulk import parse_ordered, parse_operations
 
 users_endpoint = Blueprint('users_endpoint', __name__)
 
 @users_endpoint.route('/users', methods=['GET'])
+@conditional(('users',), usersModel.RELATIONS)
 def get_users():
     userId = request.args.get('id')
+    try:
+        fields = parse_fields(request.args, usersModel.FIELDS)
+        expand = parse_expand(request.args, usersModel.RELATIONS)
+        ids = parse_ids(request.args)
+        query = parse_filters(request.args, usersModel.FILTERS, usersModel.SEARCH)
+        sort = parse_sort(request.args, usersModel.SORTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if userId:
-        user = usersModel.get_by_id(userId)
+        user = usersModel.get_by_id(userId, fields, expand)
         if user:
             return jsonify(user), 200
         return jsonify({"error": "Usuario no encontrado"}), 404
 
-    users = usersModel.get_all()
+    if ids:
+        return jsonify(usersModel.get_many(ids, fields, expand)), 200
+
+    if wants_stream(request):
+        try:
+            _, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return stream_ndjson(
+            usersModel.stream(after, fields, expand, query, sort),
+            transform=lambda batch: usersModel.expand(batch, expand)
+        )
+
+    if wants_page(request.args):
+        try:
+            limit, after = parse_page_args(request.args, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(usersModel.get_page(limit, after, fields, expand, query, sort)), 200
+
+    users = usersModel.get_all(fields, expand, query, sort)
     return jsonify(users), 200
 
 @users_endpoint.route('/users', methods=['POST'])
@@ -39,4 +75,13 @@ def delete_user():
     deleted = usersModel.delete(userId)
     if deleted == 1:
         return jsonify({"message": "Usuario eliminado"}), 200
-    return jsonify({"error": "No se pudo eliminar el usuario"}), 400
\ No newline at end of file
+    return jsonify({"error": "No se pudo eliminar el usuario"}), 400
+
+@users_endpoint.route('/users/bulk', methods=['POST'])
+def bulk_users():
+    try:
+        ordered = parse_ordered(request.args)
+        operations = parse_operations(request.json, current_app.config["BULK_MAX_OPERATIONS"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(usersModel.bulk(operations, ordered, current_app.config["BULK_CHUNK_SIZE"])), 200
@@ -1,8 +1,17 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask
 from flask_cors import CORS
 from flask_pymongo import PyMongo
+from pymongo.errors import PyMongoError
 from dotenv import load_dotenv
+from .indexes import missing_indexes
+from .utils.cache import report_cache
+from .utils.encoding import BSONJSONProvider
+from .versions import version_mirror
+from .ingest import sales_queue
+from .metrics import command_metrics, start_request_timer, record_request, record_failed_request
+from .logs import configure_logging, configure_access_log, slow_query_log
 
 # Carga las variables del .env
 load_dotenv()
@@ -12,10 +21,19 @@ mongo = PyMongo()
 def create_app():
     app = Flask(__name__)
     
-    # Usa la variable del entorno en lugar de hardcodear la URI
-    app.config["MONGO_URI"] = os.getenv("MONGO_URI")
+    pool = configure(app)
+    
+    # Los listeners miden cada comando de MongoDB: métricas para /metrics y log de comandos lentos
+    mongo.init_app(app, event_listeners=[command_metrics, slow_query_log], **pool)
+    # Después de init_app, que instala el proveedor JSON de Flask-PyMongo
+    app.json = BSONJSONProvider(app)
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+    app.teardown_request(record_failed_request)
+    # Con SALES_QUEUE=on arranca el hilo que guarda las ventas encoladas (uno por proceso)
+    sales_queue.start(mongo.db)
 
-    mongo.init_app(app)
+    check_indexes(app)
     
     CORS(app, origins="*")
 
@@ -37,4 +55,107 @@ def create_app():
     from .controllers.reports import reports_endpoint
     app.register_blueprint(reports_endpoint, url_prefix="/clothing/api/v1")
 
-    return app
\ No newline at end of file
+    # /metrics va en la raíz, fuera del prefijo de la API, donde lo busca Prometheus
+    from .controllers.metrics import metrics_endpoint
+    app.register_blueprint(metrics_endpoint)
+
+    return app
+
+def configure(app):
+    """
+    Lee la configuración del entorno y configura logging y caché. La comparten
+    create_app() y la app ASGI (app/aio/index.py). Devuelve las opciones del pool de MongoDB.
+    """
+    # Usa la variable del entorno en lugar de hardcodear la URI
+    app.config["MONGO_URI"] = os.getenv("MONGO_URI")
+
+    # Logging: nivel, formato (text | json), muestreo del log de acceso y umbrales de lentitud
+    app.config["LOG_LEVEL"] = os.getenv("LOG_LEVEL", "INFO")
+    app.config["LOG_FORMAT"] = os.getenv("LOG_FORMAT", "text")
+    app.config["LOG_SAMPLE_RATE"] = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+    app.config["SLOW_QUERY_MS"] = float(os.getenv("SLOW_QUERY_MS", "100"))
+    app.config["SLOW_REQUEST_MS"] = float(os.getenv("SLOW_REQUEST_MS", "500"))
+    configure_logging(app.config["LOG_LEVEL"], app.config["LOG_FORMAT"])
+    configure_access_log(app.config["LOG_SAMPLE_RATE"])
+    # 0 o menos desactiva el log de comandos lentos
+    slow_query_log.threshold_ms = app.config["SLOW_QUERY_MS"] if app.config["SLOW_QUERY_MS"] > 0 else None
+    # Fracción de respuestas de MongoDB cuyo tamaño se mide para /metrics (0 lo desactiva)
+    app.config["METRICS_REPLY_SAMPLE_RATE"] = float(os.getenv("METRICS_REPLY_SAMPLE_RATE", "0.01"))
+    command_metrics.reply_sample_rate = app.config["METRICS_REPLY_SAMPLE_RATE"]
+
+    # Pool de conexiones por proceso; sin variables se usan los valores por defecto de pymongo
+    pool = {}
+    for option, variable in (("maxPoolSize", "MONGO_MAX_POOL_SIZE"),
+                             ("minPoolSize", "MONGO_MIN_POOL_SIZE"),
+                             ("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS")):
+        if os.getenv(variable):
+            app.config[variable] = int(os.getenv(variable))
+            pool[option] = app.config[variable]
+
+    # warn: avisa si faltan índices | strict: no arranca | off: no verifica
+    app.config["MONGO_INDEX_CHECK"] = os.getenv("MONGO_INDEX_CHECK", "warn")
+
+    # Caché de reportes: TTL en segundos (0 la desactiva) y cantidad máxima de resultados guardados
+    app.config["REPORTS_CACHE_TTL"] = float(os.getenv("REPORTS_CACHE_TTL", "60"))
+    app.config["REPORTS_CACHE_SIZE"] = int(os.getenv("REPORTS_CACHE_SIZE", "128"))
+    report_cache.configure(app.config["REPORTS_CACHE_TTL"], app.config["REPORTS_CACHE_SIZE"])
+
+    # ETags: segundos que cada proceso reutiliza las versiones leídas de MongoDB (0 las lee en cada GET)
+    app.config["ETAG_VERSIONS_TTL"] = float(os.getenv("ETAG_VERSIONS_TTL", "1"))
+    version_mirror.configure(app.config["ETAG_VERSIONS_TTL"])
+
+    # Panel de reportes: hilos (por proceso) para calcularlos a la vez y espera máxima en segundos
+    app.config["REPORTS_DASHBOARD_WORKERS"] = int(os.getenv("REPORTS_DASHBOARD_WORKERS", "5"))
+    app.config["REPORTS_DASHBOARD_TIMEOUT"] = float(os.getenv("REPORTS_DASHBOARD_TIMEOUT", "30"))
+
+    # Cola de escritura de ventas (on | off): ventas en espera, ventas por lote y espera máxima de un lote en ms
+    app.config["SALES_QUEUE"] = os.getenv("SALES_QUEUE", "off")
+    app.config["SALES_QUEUE_SIZE"] = int(os.getenv("SALES_QUEUE_SIZE", "10000"))
+    app.config["SALES_QUEUE_BATCH"] = int(os.getenv("SALES_QUEUE_BATCH", "500"))
+    app.config["SALES_QUEUE_FLUSH_MS"] = float(os.getenv("SALES_QUEUE_FLUSH_MS", "20"))
+    # Segundos que ?ack=durable espera que se guarde el lote antes de responder 503
+    app.config["SALES_QUEUE_ACK_TIMEOUT"] = float(os.getenv("SALES_QUEUE_ACK_TIMEOUT", "5"))
+    sales_queue.configure(app.config["SALES_QUEUE"] == "on", app.config["SALES_QUEUE_SIZE"],
+                          app.config["SALES_QUEUE_BATCH"], app.config["SALES_QUEUE_FLUSH_MS"])
+
+    # POST /<colección>/bulk: operaciones máximas por petición y operaciones por bulk_write
+    app.config["BULK_MAX_OPERATIONS"] = int(os.getenv("BULK_MAX_OPERATIONS", "1000"))
+    app.config["BULK_CHUNK_SIZE"] = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+    return pool
+
+def check_indexes(app):
+    mode = app.config["MONGO_INDEX_CHECK"]
+    if mode == "off":
+        return
+
+    try:
+        missing = missing_indexes(mongo.db)
+    except PyMongoError as e:
+        if mode == "strict":
+            raise
+        app.logger.warning("No se pudieron verificar los índices: %s", e)
+        return
+    report_missing_indexes(app, missing)
+
+def report_missing_indexes(app, missing):
+    mode = app.config["MONGO_INDEX_CHECK"]
+    if not missing:
+        return
+
+    names = ", ".join(f"{collection}.{name}" for collection, name in missing)
+    message = f"Faltan índices: {names}. Ejecuta 'python database/clothing_db.py create-indexes'."
+    if mode == "strict":
+        raise RuntimeError(message)
+    app.logger.warning(message)
+
+def warm_up(connections=1):
+    """
+    Abre `connections` conexiones del pool antes de recibir tráfico: la primera
+    resuelve el servidor y hace el handshake, el resto se abre en paralelo para
+    que las primeras peticiones concurrentes no esperen una conexión nueva.
+    """
+    mongo.cx.admin.command("ping")
+    if connections <= 1:
+        return
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        list(pool.map(lambda _: mongo.cx.admin.command("ping"), range(connections)))
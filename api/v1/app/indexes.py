@@ -0,0 +1,88 @@
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+# Índices declarados por colección. Cubren las llaves de los $lookup de los
+# reportes, el filtro por fecha de ventas y los filtros, órdenes y búsquedas (?q=)
+# de las rutas GET; sin ellos cada join o búsqueda recorre la colección completa.
+# Este módulo solo depende de pymongo: lo usan tanto la API como database/clothing_db.py.
+
+def sorted_by(field):
+    # ?sort=campo pagina por (campo, _id) y ?sort=-campo por el orden inverso (ver
+    # app/utils/pagination.py): un solo índice sirve los dos, y también los filtros por campo
+    return IndexModel([(field, ASCENDING), ("_id", ASCENDING)], name=f"{field}_1__id_1", background=True)
+
+# Cada campo de SORTS de los modelos tiene su índice sorted_by
+INDEXES = {
+    "products": [
+        IndexModel([("brand_id", ASCENDING)], name="brand_id_1", background=True),
+        IndexModel([("category", ASCENDING)], name="category_1", background=True),
+        sorted_by("name"),
+        sorted_by("price"),
+        sorted_by("stock"),
+        # Los nombres son marcas y modelos: sin stemming ni palabras vacías de un idioma
+        IndexModel([("name", TEXT)], name="name_text", default_language="none", background=True),
+    ],
+    "sales": [
+        IndexModel([("product_id", ASCENDING)], name="product_id_1", background=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_1", background=True),
+        sorted_by("sale_date"),
+        sorted_by("quantity"),
+        sorted_by("total"),
+    ],
+    "reviews": [
+        IndexModel([("product_id", ASCENDING)], name="product_id_1", background=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_1", background=True),
+        sorted_by("rating"),
+        sorted_by("review_date"),
+        IndexModel([("comment", TEXT)], name="comment_text", default_language="spanish", background=True),
+    ],
+    "users": [
+        IndexModel([("role", ASCENDING)], name="role_1", background=True),
+        sorted_by("username"),
+        sorted_by("created_at"),
+    ],
+    "brands": [
+        sorted_by("name"),
+        sorted_by("country"),
+        sorted_by("founded"),
+    ],
+    # Colecciones de totales (app/rollups.py): los reportes las recorren de mayor a menor
+    "sales_by_brand": [
+        IndexModel([("quantity", DESCENDING)], name="quantity_-1", background=True),
+    ],
+    "sales_by_user": [
+        IndexModel([("count", DESCENDING)], name="count_-1", background=True),
+    ],
+}
+
+def create_indexes(db):
+    """
+    Crea los índices declarados. Es idempotente: crear un índice que ya existe
+    con la misma definición no hace nada. Devuelve {colección: [nombres]}.
+    """
+    created = {}
+    for collection, models in INDEXES.items():
+        created[collection] = db[collection].create_indexes(models)
+    return created
+
+def missing_indexes(db):
+    """Devuelve [(colección, nombre)] de los índices declarados que no existen en la base."""
+    missing = []
+    for collection in INDEXES:
+        missing += missing_in(collection, db[collection].index_information())
+    return missing
+
+def missing_in(collection, index_information):
+    """Índices declarados de `collection` que no están en su index_information()."""
+    existing = [_key(info) for info in index_information.values()]
+    return [
+        (collection, model.document["name"])
+        for model in INDEXES[collection]
+        if list(model.document["key"].items()) not in existing
+    ]
+
+def _key(info):
+    # Un índice de texto aparece como [("_fts", "text"), ("_ftsx", 1)]: sus campos están en `weights`
+    key = [(field, direction) for field, direction in info["key"]]
+    if ("_fts", "text") in key:
+        return [(field, TEXT) for field in sorted(info.get("weights", {}))]
+    return key
@@ -0,0 +1,202 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from app import rollups, stock, versions
+from app.signals import collection_changed
+
+# Cola de escritura de ventas (write-behind). Con SALES_QUEUE=on, POST /sales descuenta
+# el stock (sigue siendo un update_one con guarda, así la API puede responder 409) y deja
+# la venta en una cola acotada en memoria. Un hilo la vacía por lotes: un bulk_write no
+# ordenado a `sales`, los totales de app/rollups.py sumados por llave y una sola versión
+# nueva por lote. El cliente elige con ?ack= cuándo recibir la respuesta:
+#   durable: cuando su lote ya está en MongoDB (201, por defecto)
+#   queued:  en cuanto la venta entra en la cola (202); si el proceso muere sin vaciarla se pierde
+# Al apagar el proceso la cola se vacía antes de salir.
+
+logger = logging.getLogger(__name__)
+
+ACKS = ("durable", "queued")
+# Código de MongoDB para llave duplicada
+DUPLICATE_KEY = 11000
+
+class QueueFull(Exception):
+    """La cola de ventas llegó a su tamaño máximo."""
+
+    def __init__(self):
+        super().__init__("La cola de ventas está llena, reintenta en unos segundos")
+
+def parse_ack(args):
+    ack = args.get('ack', 'durable')
+    if ack not in ACKS:
+        raise ValueError(f"Parámetro 'ack' inválido, debe ser uno de: {', '.join(ACKS)}")
+    return ack
+
+def insert_operations(sales):
+    return [InsertOne(sale) for sale in sales]
+
+def failed_indexes(error, attempt):
+    """
+    Posiciones del lote que no se guardaron según el BulkWriteError. En un reintento,
+    una llave duplicada es una venta que ya entró en el intento anterior (las ventas
+    de la cola llevan su _id desde que se aceptan), así que no cuenta como error.
+    """
+    return {
+        item["index"] for item in error.details.get("writeErrors", [])
+        if not (attempt and item.get("code") == DUPLICATE_KEY)
+    }
+
+class SalesQueue:
+    """
+    Cola de ventas de un proceso de Flask: la vacía un hilo propio, por tamaño
+    (`batch` ventas) o por tiempo (`flush_ms` desde la primera venta del lote).
+    """
+
+    _STOP = object()
+
+    def __init__(self):
+        self.enabled = False
+        self.size = 10000
+        self.batch = 500
+        self.flush_ms = 20
+        self.retries = 3
+        self._db = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled, size=10000, batch=500, flush_ms=20, retries=3):
+        self.enabled = enabled
+        self.size = size
+        self.batch = batch
+        self.flush_ms = flush_ms
+        self.retries = retries
+
+    def start(self, db):
+        with self._lock:
+            if not self.enabled or self._thread is not None:
+                return
+            self._db = db
+            self._queue = queue.Queue(maxsize=self.size)
+            self._thread = threading.Thread(target=self._run, name="sales-queue", daemon=True)
+            self._thread.start()
+        # El hilo es daemon para no bloquear la salida; atexit lo espera después de vaciar la cola
+        atexit.register(self.stop)
+
+    def running(self):
+        return self._thread is not None
+
+    def submit(self, sale, changes):
+        """Encola una venta (con su _id ya asignado). El Future da el _id guardado o None."""
+        future = Future()
+        try:
+            self._queue.put_nowait((sale, changes, future))
+        except queue.Full:
+            raise QueueFull()
+        return future
+
+    def stop(self, timeout=None):
+        """Vacía la cola y detiene el hilo. Se puede llamar más de una vez."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(self._STOP)
+        thread.join(timeout)
+        # Lo que se encoló mientras el hilo terminaba
+        pending = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                pending.append(item)
+        for start in range(0, len(pending), self.batch):
+            self._flush(pending[start:start + self.batch])
+        logger.info("Cola de ventas detenida")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_ms / 1000
+            stop = False
+            while len(batch) < self.batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _insert(self, sales):
+        """Posiciones de `sales` que no se pudieron guardar."""
+        for attempt in range(self.retries + 1):
+            try:
+                self._db.sales.bulk_write(insert_operations(sales), ordered=False)
+                return set()
+            except BulkWriteError as e:
+                return failed_indexes(e, attempt)
+            except PyMongoError as e:
+                logger.warning("Lote de %d ventas no guardado (intento %d): %s", len(sales), attempt + 1, e)
+                time.sleep(min(0.1 * 2 ** attempt, 2))
+        return set(range(len(sales)))
+
+    def _flush(self, batch):
+        # Ningún error puede dejar esperando a un cliente con ack=durable
+        try:
+            failed = self._insert([sale for sale, _, _ in batch])
+        except Exception:
+            logger.exception("Error inesperado guardando un lote de ventas")
+            failed = set(range(len(batch)))
+
+        saved = [sale for index, (sale, _, _) in enumerate(batch) if index not in failed]
+        moved_stock = False
+        for index, (sale, changes, future) in enumerate(batch):
+            moved_stock = moved_stock or bool(changes)
+            if index in failed:
+                try:
+                    stock.undo(self._db, changes)
+                except PyMongoError:
+                    logger.exception("No se pudo devolver el stock de la venta %s", sale.get("_id"))
+                future.set_result(None)
+
+        if saved:
+            try:
+                rollups.apply_sales(self._db, saved)
+            except PyMongoError:
+                logger.exception("Totales de ventas sin actualizar; ejecuta 'clothing_db.py rebuild-rollups'")
+        try:
+            if saved:
+                versions.bump(self._db, "sales", insert=True)
+            if moved_stock:
+                versions.bump(self._db, stock.VERSION)
+        except PyMongoError:
+            logger.exception("No se pudieron actualizar las versiones de las colecciones")
+        if saved:
+            collection_changed.send("sales", op="insert")
+        if moved_stock:
+            collection_changed.send(stock.VERSION, op="update")
+
+        for index, (sale, _, future) in enumerate(batch):
+            if index not in failed:
+                future.set_result(str(sale["_id"]))
+        if failed:
+            logger.warning("%d de %d ventas del lote no se guardaron", len(failed), len(batch))
+
+sales_queue = SalesQueue()
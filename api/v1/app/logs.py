@@ -0,0 +1,142 @@
+import json
+import logging
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from bson import json_util
+from pymongo import monitoring
+
+# Configuración de logging compartida por la API y database/clothing_db.py.
+# Este módulo no depende de Flask.
+
+logger = logging.getLogger("clothing")
+access_logger = logging.getLogger("clothing.access")
+slow_logger = logging.getLogger("clothing.slow_query")
+
+# Campos internos del driver que no aportan al leer un comando lento
+DRIVER_FIELDS = {"$db", "lsid", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "apiVersion", "signature"}
+# Documentos insertados: pueden ser miles, no se copian al log
+OMITTED_FIELDS = {"documents"}
+MAX_COMMAND_CHARS = 2000
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro; los datos extra van en `fields` (logger.info(..., extra={"fields": {...}}))."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+_handler = None
+
+def configure_logging(level="INFO", fmt="text", stream=None):
+    """Instala (o reemplaza) el handler del logger raíz. `fmt` es "json" o "text"."""
+    global _handler
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    _handler = logging.StreamHandler(stream or sys.stderr)
+    _handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root.addHandler(_handler)
+    root.setLevel(str(level).upper())
+
+# Fracción de peticiones exitosas y rápidas que se registran en el log de acceso. Por defecto
+# una de cada cien: con carga, registrarlas todas llena el log y suma formato y escritura a cada respuesta
+_sample_rate = 0.01
+
+def configure_access_log(sample_rate):
+    global _sample_rate
+    _sample_rate = max(0.0, min(1.0, sample_rate))
+
+def log_request(endpoint, method, status, seconds, mongo_seconds, slow_seconds):
+    # Errores y peticiones lentas siempre se registran; el resto según el muestreo
+    if status >= 500:
+        level = logging.ERROR
+    elif seconds >= slow_seconds:
+        level = logging.WARNING
+    elif random.random() < _sample_rate:
+        level = logging.INFO
+    else:
+        return
+    if not access_logger.isEnabledFor(level):
+        return
+    access_logger.log(level, "%s %s %s", method, endpoint, status, extra={"fields": {
+        "endpoint": endpoint,
+        "method": method,
+        "status": status,
+        "duration_ms": round(seconds * 1000, 3),
+        "mongo_ms": round(mongo_seconds * 1000, 3),
+    }})
+
+def describe_command(command):
+    """Filtro, pipeline, etc. del comando como JSON recortado (sin campos del driver)."""
+    body = {}
+    for key, value in command.items():
+        if key in DRIVER_FIELDS:
+            continue
+        body[key] = f"<{len(value)} documentos>" if key in OMITTED_FIELDS else value
+    text = json_util.dumps(body)
+    if len(text) > MAX_COMMAND_CHARS:
+        text = text[:MAX_COMMAND_CHARS] + "..."
+    return text
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Registra con nivel WARNING los comandos de MongoDB que tardan más de `threshold_ms`."""
+
+    def __init__(self, threshold_ms=100):
+        self.threshold_ms = threshold_ms
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _key(self, event):
+        return (event.connection_id, event.request_id, event.operation_id)
+
+    def started(self, event):
+        if self.threshold_ms is None:
+            return
+        # Solo se guarda la referencia: el comando se serializa únicamente si resulta lento
+        with self._lock:
+            self._pending[self._key(event)] = (event.database_name, event.command)
+
+    def _finish(self, event, outcome):
+        with self._lock:
+            database, command = self._pending.pop(self._key(event), (None, None))
+        if command is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms or not slow_logger.isEnabledFor(logging.WARNING):
+            return
+        slow_logger.warning("Comando lento: %s (%.1f ms)", event.command_name, duration_ms, extra={"fields": {
+            "database": database,
+            "command": event.command_name,
+            "duration_ms": round(duration_ms, 3),
+            "outcome": outcome,
+            "body": describe_command(command),
+        }})
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "failed")
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,233 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+import bson
+from flask import current_app, g, request
+from pymongo import monitoring
+from app.utils.cache import report_cache
+from app.logs import log_request
+
+# Métricas en memoria (por proceso) expuestas en formato de texto de Prometheus en /metrics.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DOCUMENT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.label_names = labels
+        # {labels: [cuenta por bucket..., suma, cantidad]}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * len(self.buckets) + [0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, entry in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, entry):
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {entry[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(entry[-2])}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {entry[-1]}")
+        return lines
+
+mongo_duration = Histogram(
+    "mongo_command_duration_seconds", "Duración de los comandos de MongoDB.",
+    LATENCY_BUCKETS, ("collection", "command")
+)
+mongo_documents = Histogram(
+    "mongo_command_documents", "Documentos devueltos (o afectados) por comando.",
+    DOCUMENT_BUCKETS, ("collection", "command")
+)
+mongo_reply_bytes = Histogram(
+    "mongo_command_reply_bytes", "Tamaño BSON de la respuesta de una muestra de comandos (METRICS_REPLY_SAMPLE_RATE).",
+    BYTE_BUCKETS, ("collection", "command")
+)
+mongo_failures = Counter(
+    "mongo_command_failures_total", "Comandos de MongoDB que fallaron.",
+    ("collection", "command")
+)
+request_duration = Histogram(
+    "http_request_duration_seconds", "Duración de cada petición por endpoint.",
+    LATENCY_BUCKETS, ("endpoint", "method", "status")
+)
+request_mongo_duration = Histogram(
+    "http_request_mongo_duration_seconds",
+    "Tiempo de cada petición esperando a MongoDB; la diferencia con http_request_duration_seconds es Python y JSON.",
+    LATENCY_BUCKETS, ("endpoint", "method")
+)
+request_mongo_commands = Histogram(
+    "http_request_mongo_commands", "Comandos de MongoDB ejecutados por petición.",
+    DOCUMENT_BUCKETS, ("endpoint", "method")
+)
+
+REGISTRY = [
+    mongo_duration, mongo_documents, mongo_reply_bytes, mongo_failures,
+    request_duration, request_mongo_duration, request_mongo_commands,
+]
+
+def _collection(command_name, command):
+    # En getMore el primer campo es el id del cursor; la colección viene aparte
+    if command_name == "getMore":
+        return command.get("collection", "")
+    value = command.get(command_name)
+    return value if isinstance(value, str) else ""
+
+def _documents(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if "value" in reply:
+        return 0 if reply["value"] is None else 1
+    return reply.get("n", 0)
+
+# [segundos, comandos] de MongoDB de la petición en curso. Es una ContextVar y no `g`
+# para que sirva igual con Flask (un hilo por petición) y con la app ASGI (una tarea por petición).
+_request_mongo = ContextVar("request_mongo", default=None)
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Registra duración, documentos y bytes de cada comando por colección. Los eventos
+    de pymongo se emiten en el hilo (o la tarea de asyncio) que ejecuta el comando,
+    así el tiempo también se suma a la petición en curso.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Fracción de respuestas cuyo tamaño se mide: bson.encode cuesta casi lo mismo
+        # que decodificar la respuesta, así que medirlas todas duplica ese trabajo
+        self.reply_sample_rate = 0.01
+
+    def _key(self, event):
+        return (event.connection_id, event.request_id, event.operation_id)
+
+    def started(self, event):
+        with self._lock:
+            self._pending[self._key(event)] = _collection(event.command_name, event.command)
+
+    def _finish(self, event):
+        with self._lock:
+            collection = self._pending.pop(self._key(event), "")
+        seconds = event.duration_micros / 1e6
+        mongo_duration.observe(seconds, collection, event.command_name)
+        totals = _request_mongo.get()
+        if totals is not None:
+            totals[0] += seconds
+            totals[1] += 1
+        return collection
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        mongo_documents.observe(_documents(event.reply), collection, event.command_name)
+        if random.random() < self.reply_sample_rate:
+            mongo_reply_bytes.observe(len(bson.encode(event.reply)), collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        mongo_failures.inc(collection, event.command_name)
+
+command_metrics = CommandMetrics()
+
+def begin_request():
+    """Empieza a medir una petición; devuelve el instante de inicio."""
+    _request_mongo.set([0.0, 0])
+    return time.perf_counter()
+
+def finish_request(endpoint, method, status, started, slow_seconds):
+    seconds = time.perf_counter() - started
+    mongo_seconds, mongo_commands = _request_mongo.get() or (0, 0)
+    request_duration.observe(seconds, endpoint, method, str(status))
+    request_mongo_duration.observe(mongo_seconds, endpoint, method)
+    request_mongo_commands.observe(mongo_commands, endpoint, method)
+    log_request(endpoint, method, status, seconds, mongo_seconds, slow_seconds)
+    _request_mongo.set(None)
+
+def start_request_timer():
+    g.request_started = begin_request()
+
+def record_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        finish_request(request.endpoint or "unmatched", request.method, response.status_code, started,
+                       current_app.config["SLOW_REQUEST_MS"] / 1000)
+    return response
+
+def record_failed_request(error=None):
+    # teardown_request: si una excepción no dejó llegar la petición a after_request, cuenta como 500
+    started = g.pop("request_started", None)
+    if started is not None:
+        finish_request(request.endpoint or "unmatched", request.method, 500, started,
+                       current_app.config["SLOW_REQUEST_MS"] / 1000)
+
+def _cache_lines():
+    stats = report_cache.stats()
+    lines = []
+    names = {"hits": "aciertos", "misses": "fallos", "evictions": "desalojos", "invalidations": "invalidaciones"}
+    for name, description in names.items():
+        lines += [
+            f"# HELP reports_cache_{name}_total Caché de reportes: {description}.",
+            f"# TYPE reports_cache_{name}_total counter",
+            f"reports_cache_{name}_total {stats[name]}",
+        ]
+    lines += [
+        "# HELP reports_cache_size Resultados guardados en la caché de reportes.",
+        "# TYPE reports_cache_size gauge",
+        f"reports_cache_size {stats['size']}",
+    ]
+    return lines
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += _cache_lines()
+    return "\n".join(lines) + "\n"
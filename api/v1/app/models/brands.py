@@ -1,23 +1,70 @@
+import logging
 from bson.objectid import ObjectId
 from app.index import mongo
+from app import versions
+from app.signals import collection_changed
+from app.bulk import run_bulk
+from app.utils.pagination import paginate, page_sort
+from app.utils.streaming import open_cursor
+from app.utils.projection import build_projection
+from app.utils.query import sort_fields
+from app.utils.relations import expand_relations, order_by_ids
+
+logger = logging.getLogger(__name__)
 
 class brandsModel:
+    # Campos que se pueden pedir con ?fields=
+    FIELDS = ('name', 'country', 'founded')
+    DEFAULT_PROJECTION = None
+    # Referencias que se pueden resolver con ?expand= (colección y campos que se traen)
+    RELATIONS = {}
+    # Filtros de la query string (campo: tipo, ver app/utils/query.py) y campos de ?sort=.
+    # `brands` es chica: no necesita índices para esto
+    FILTERS = {'name': 'string', 'country': 'string', 'founded': 'number'}
+    SORTS = ('name', 'country', 'founded')
+    SEARCH = False
+
+    @staticmethod
+    def expand(docs, fields):
+        return expand_relations(mongo.db, docs, brandsModel.RELATIONS, fields)
+
+    @staticmethod
+    def get_all(fields=None, expand=None, query=None, sort=None):
+        # Consulta de diagnóstico (una ida y vuelta extra al servidor): solo con LOG_LEVEL=DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Colecciones: %s", mongo.db.list_collection_names())
+        cursor = mongo.db.brands.find(query or {}, build_projection(fields, brandsModel.DEFAULT_PROJECTION, expand))
+        if sort:
+            cursor = cursor.sort(page_sort(sort))
+        return brandsModel.expand(list(cursor), expand)
+
+    @staticmethod
+    def get_page(limit, after=None, fields=None, expand=None, query=None, sort=None):
+        # Los campos de `sort` se proyectan siempre: el cursor de la página siguiente sale de ellos
+        projection = build_projection(fields, brandsModel.DEFAULT_PROJECTION, (expand or []) + sort_fields(sort))
+        page = paginate(mongo.db.brands, limit, after, query, projection, sort)
+        brandsModel.expand(page['data'], expand)
+        return page
+
     @staticmethod
-    def get_all():
-        print(mongo.db.list_collection_names())
-        cursor = mongo.db.brands.find()
-        brands = []
-        for brand in cursor:
-            brand['_id'] = str(brand['_id'])
-            brands.append(brand)
-        return brands
+    def get_many(ids, fields=None, expand=None):
+        # Una sola consulta $in para toda la lista de ids
+        brands = list(mongo.db.brands.find({"_id": {"$in": ids}}, build_projection(fields, brandsModel.DEFAULT_PROJECTION, expand)))
+        return brandsModel.expand(order_by_ids(brands, ids), expand)
 
     @staticmethod
-    def get_by_id(brand_id):
+    def stream(after=None, fields=None, expand=None, query=None, sort=None):
+        return open_cursor(mongo.db.brands, after, build_projection(fields, brandsModel.DEFAULT_PROJECTION, expand), query, sort)
+
+    @staticmethod
+    def get_by_id(brand_id, fields=None, expand=None):
         try:
-            brand = mongo.db.brands.find_one({"_id": ObjectId(brand_id)})
+            brand = mongo.db.brands.find_one(
+                {"_id": ObjectId(brand_id)},
+                build_projection(fields, brandsModel.DEFAULT_PROJECTION, expand)
+            )
             if brand:
-                brand['_id'] = str(brand['_id'])
+                brandsModel.expand([brand], expand)
                 return brand
         except:
             return None
@@ -26,9 +73,11 @@ class brandsModel:
     def create(data):
         try:
             result = mongo.db.brands.insert_one(data)
-            return str(result.inserted_id)
         except:
             return None
+        versions.bump(mongo.db, "brands", insert=True)
+        collection_changed.send("brands", op="insert")
+        return str(result.inserted_id)
 
     @staticmethod
     def update(brand_id, data):
@@ -37,14 +86,24 @@ class brandsModel:
                 {"_id": ObjectId(brand_id)},
                 {"$set": data}
             )
-            return result.modified_count
         except:
             return -1
+        if result.modified_count:
+            versions.bump(mongo.db, "brands")
+            collection_changed.send("brands", op="update")
+        return result.modified_count
 
     @staticmethod
     def delete(brand_id):
         try:
             result = mongo.db.brands.delete_one({"_id": ObjectId(brand_id)})
-            return result.deleted_count
         except:
-            return -1
\ No newline at end of file
+            return -1
+        if result.deleted_count:
+            versions.bump(mongo.db, "brands")
+            collection_changed.send("brands", op="delete")
+        return result.deleted_count
+
+    @staticmethod
+    def bulk(operations, ordered=True, chunk_size=500):
+        return run_bulk(mongo.db, "brands", operations, ordered, chunk_size)
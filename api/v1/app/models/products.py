@@ -1,50 +1,128 @@
+import logging
 from bson.objectid import ObjectId
 from app.index import mongo
+from app import stock, versions
+from app.signals import collection_changed
+from app.bulk import run_bulk
+from app.rollups import move_product
+from app.utils.pagination import paginate, page_sort
+from app.utils.streaming import open_cursor
+from app.utils.projection import build_projection
+from app.utils.query import sort_fields
+from app.utils.relations import coerce_ids, expand_relations, order_by_ids
+
+logger = logging.getLogger(__name__)
 
 class productsModel:
+    # Campos que se pueden pedir con ?fields=
+    FIELDS = ('name', 'brand_id', 'category', 'price', 'stock')
+    # Versiones de las que dependen las ETags de GET /products: `stock` y `sold_quantity`
+    # los mueven las ventas con su propia versión (app/stock.py)
+    VERSIONS = ('products', stock.VERSION)
+    DEFAULT_PROJECTION = None
+    # Referencias que se pueden resolver con ?expand= (colección y campos que se traen)
+    RELATIONS = {
+        'brand_id': ('brands', {'name': 1, 'country': 1}),
+    }
+    # Filtros de la query string (campo: tipo, ver app/utils/query.py) y campos de ?sort=
+    FILTERS = {'brand_id': 'id', 'category': 'string', 'price': 'number', 'stock': 'number'}
+    SORTS = ('name', 'price', 'stock')
+    # ?q= usa el índice de texto sobre `name` (ver app/indexes.py)
+    SEARCH = True
+
     @staticmethod
-    def get_all():
-        print(mongo.db.list_collection_names())
-        products_cursor = mongo.db.products.find()
-        products = []
-        for product in products_cursor:
-            product['_id'] = str(product['_id'])
-            products.append(product)
-        return products
+    def expand(docs, fields):
+        return expand_relations(mongo.db, docs, productsModel.RELATIONS, fields)
 
     @staticmethod
-    def get_by_id(product_id):
+    def get_all(fields=None, expand=None, query=None, sort=None):
+        # Consulta de diagnóstico (una ida y vuelta extra al servidor): solo con LOG_LEVEL=DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Colecciones: %s", mongo.db.list_collection_names())
+        cursor = mongo.db.products.find(query or {}, build_projection(fields, productsModel.DEFAULT_PROJECTION, expand))
+        if sort:
+            cursor = cursor.sort(page_sort(sort))
+        return productsModel.expand(list(cursor), expand)
+
+    @staticmethod
+    def get_page(limit, after=None, fields=None, expand=None, query=None, sort=None):
+        # Los campos de `sort` se proyectan siempre: el cursor de la página siguiente sale de ellos
+        projection = build_projection(fields, productsModel.DEFAULT_PROJECTION, (expand or []) + sort_fields(sort))
+        page = paginate(mongo.db.products, limit, after, query, projection, sort)
+        productsModel.expand(page['data'], expand)
+        return page
+
+    @staticmethod
+    def get_many(ids, fields=None, expand=None):
+        # Una sola consulta $in para toda la lista de ids
+        products = list(mongo.db.products.find({"_id": {"$in": ids}}, build_projection(fields, productsModel.DEFAULT_PROJECTION, expand)))
+        return productsModel.expand(order_by_ids(products, ids), expand)
+
+    @staticmethod
+    def stream(after=None, fields=None, expand=None, query=None, sort=None):
+        return open_cursor(mongo.db.products, after, build_projection(fields, productsModel.DEFAULT_PROJECTION, expand), query, sort)
+
+    @staticmethod
+    def get_by_id(product_id, fields=None, expand=None):
         try:
-            product = mongo.db.products.find_one({"_id": ObjectId(product_id)})
+            product = mongo.db.products.find_one(
+                {"_id": ObjectId(product_id)},
+                build_projection(fields, productsModel.DEFAULT_PROJECTION, expand)
+            )
             if product:
-                product['_id'] = str(product['_id'])
+                productsModel.expand([product], expand)
                 return product
         except:
             return None
 
+    @staticmethod
+    def _coerce_fields(data):
+        # Las referencias de RELATIONS se guardan como ObjectId (llegan del JSON como texto)
+        return coerce_ids(data, productsModel.RELATIONS)
+
     @staticmethod
     def create(data):
+        productsModel._coerce_fields(data)
         try:
             result = mongo.db.products.insert_one(data)
-            return str(result.inserted_id)
         except:
             return None
+        move_product(mongo.db, result.inserted_id, None, data.get("brand_id"))
+        versions.bump(mongo.db, "products", insert=True)
+        collection_changed.send("products", op="insert")
+        return str(result.inserted_id)
 
     @staticmethod
     def update(product_id, data):
+        productsModel._coerce_fields(data)
         try:
-            result = mongo.db.products.update_one(
+            # Se necesita la marca anterior por si el producto cambia de marca
+            before = mongo.db.products.find_one_and_update(
                 {"_id": ObjectId(product_id)},
                 {"$set": data}
             )
-            return result.modified_count
         except:
             return -1
+        if before is None or all(key in before and before[key] == value for key, value in data.items()):
+            return 0
+        move_product(mongo.db, before["_id"], before.get("brand_id"), {**before, **data}.get("brand_id"))
+        versions.bump(mongo.db, "products")
+        collection_changed.send("products", op="update")
+        return 1
 
     @staticmethod
     def delete(product_id):
         try:
-            result = mongo.db.products.delete_one({"_id": ObjectId(product_id)})
-            return result.deleted_count
+            product = mongo.db.products.find_one_and_delete({"_id": ObjectId(product_id)})
         except:
-            return -1
\ No newline at end of file
+            return -1
+        if product is None:
+            return 0
+        move_product(mongo.db, product["_id"], product.get("brand_id"), None)
+        versions.bump(mongo.db, "products")
+        collection_changed.send("products", op="delete")
+        return 1
+
+    @staticmethod
+    def bulk(operations, ordered=True, chunk_size=500):
+        return run_bulk(mongo.db, "products", operations, ordered, chunk_size, prepare=productsModel._coerce_fields)
@@ -1,51 +1,281 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import copy_context
 from bson.objectid import ObjectId
 from app.index import mongo
+from app.utils.cache import cached_report
+from app.utils.timeseries import bucket_starts, date_trunc, densify
+from app import rollups, stock, versions
+from app.columnar import columnar_store
+
+logger = logging.getLogger(__name__)
+
+# Reportes del panel (/reports/dashboard): nombre en la respuesta y método de reportsModel
+DASHBOARD = (
+    ("brands-with-sales", "brands_with_sales"),
+    ("products-stock", "products_sold_and_stock"),
+    ("top-brands", "top_5_brands"),
+    ("top-users", "top_users"),
+    ("product-ratings", "average_ratings"),
+)
+
+# Hilos compartidos por todas las peticiones del proceso: acota cuántas agregaciones
+# del panel corren a la vez, sin importar cuántos paneles se pidan en paralelo
+_dashboard_pool = None
+_dashboard_lock = threading.Lock()
+
+def _dashboard_executor(workers):
+    global _dashboard_pool
+    if _dashboard_pool is None:
+        # Con el lock, dos paneles que llegan juntos al primer pedido no crean dos pools
+        with _dashboard_lock:
+            if _dashboard_pool is None:
+                _dashboard_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dashboard")
+    return _dashboard_pool
+
+def current_versions(names):
+    # Las versiones con las que se guarda cada reporte en la caché (ver cached_report)
+    return versions.current(mongo.db, names)
+
+def _timed(name, report):
+    started = time.perf_counter()
+    try:
+        entry = {"data": report()}
+    except Exception:
+        logger.exception("Falló el reporte %s del panel", name)
+        entry = {"error": "No se pudo calcular el reporte"}
+    entry["ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return entry
 
 class reportsModel:
 
+    # Los reportes agrupan primero `sales`/`reviews` con $group y recién después
+    # hacen el join con el resultado (pequeño) por `_id`. Cuando el join no se puede
+    # evitar, el $lookup usa un sub-pipeline que devuelve solo la suma o el conteo,
+    # nunca el arreglo completo de ventas o reseñas.
+    #
+    # Cada reporte arma su pipeline con un método `*_pipeline` que devuelve
+    # (colección, etapas); la versión async de los reportes (app/aio/reports.py)
+    # usa los mismos.
+
+    TOP = 5
+
     # 1. Listado de todas las marcas que tienen al menos una venta
     @staticmethod
+    @cached_report(("brands", "products", "sales"), current_versions)
     def brands_with_sales():
-        pipeline = [
+        collection, pipeline = reportsModel.brands_with_sales_pipeline(rollups.is_ready(mongo.db))
+        return list(mongo.db[collection].aggregate(pipeline))
+
+    # 2. Prendas vendidas y su cantidad restante en stock
+    @staticmethod
+    @cached_report(("products", "sales", stock.VERSION), current_versions)
+    def products_sold_and_stock():
+        if stock.is_ready(mongo.db):
+            collection, pipeline = reportsModel.products_sold_and_stock_pipeline(from_counters=True)
+        else:
+            collection, pipeline = reportsModel.products_sold_and_stock_pipeline(rollups.is_ready(mongo.db))
+        return list(mongo.db[collection].aggregate(pipeline))
+
+    # 3. Top 5 marcas más vendidas
+    @staticmethod
+    @cached_report(("brands", "products", "sales"), current_versions)
+    def top_5_brands():
+        collection, pipeline = reportsModel.top_5_brands_pipeline(rollups.is_ready(mongo.db))
+        return list(mongo.db[collection].aggregate(pipeline))
+
+    # 4. Usuarios con más compras realizadas
+    @staticmethod
+    @cached_report(("users", "sales"), current_versions)
+    def top_users():
+        collection, pipeline = reportsModel.top_users_pipeline(rollups.is_ready(mongo.db))
+        top = list(mongo.db[collection].aggregate(pipeline))
+        missing = reportsModel.TOP - len(top)
+        if missing <= 0:
+            return top
+        # Si hay menos de 5 compradores, el reporte se completa con usuarios sin compras (total 0)
+        query, projection = reportsModel.users_without_purchases_query(top)
+        cursor = mongo.db.users.find(query, projection).limit(missing)
+        return top + reportsModel.without_purchases(cursor)
+
+    # 5. Promedio de calificación por producto
+    @staticmethod
+    @cached_report(("products", "reviews"), current_versions)
+    def average_ratings():
+        collection, pipeline = reportsModel.average_ratings_pipeline()
+        return list(mongo.db[collection].aggregate(pipeline))
+
+    # 6. Ventas por intervalo de tiempo (día, semana o mes), opcionalmente por producto o marca
+    @staticmethod
+    @cached_report(("brands", "products", "sales"), current_versions)
+    def sales_timeseries(start, end, bucket, group_by=None):
+        from_rollups = reportsModel.timeseries_can_use_rollups(start, end, group_by) and rollups.is_ready(mongo.db)
+        collection, pipeline = reportsModel.timeseries_pipeline(start, end, bucket, group_by, from_rollups)
+        series = densify(list(mongo.db[collection].aggregate(pipeline)), bucket_starts(start, end, bucket))
+
+        names = {}
+        if group_by is not None:
+            collection, query = reportsModel.timeseries_names_query(group_by, series)
+            names = {doc["_id"]: doc.get("name") for doc in mongo.db[collection].find(query, {"name": 1})}
+        return reportsModel.timeseries_result(start, end, bucket, group_by, series, names)
+
+    # 7. Panel: los cinco reportes anteriores calculados a la vez
+    @staticmethod
+    def dashboard(workers=5, timeout=30):
+        """
+        Corre los reportes de DASHBOARD en paralelo en un pool de `workers` hilos,
+        así la latencia es la del reporte más lento y no la suma. Si uno falla o no
+        termina en `timeout` segundos, el resto se devuelve igual con su error.
+        """
+        started = time.perf_counter()
+        pool = _dashboard_executor(workers)
+        # Cada tarea corre en una copia del contexto: ve la app y suma su tiempo de MongoDB a esta petición
+        futures = {
+            name: pool.submit(copy_context().run, _timed, name, getattr(reportsModel, method))
+            for name, method in DASHBOARD
+        }
+        wait(futures.values(), timeout=timeout)
+
+        reports = {}
+        for name, future in futures.items():
+            if future.done():
+                reports[name] = future.result()
+            else:
+                reports[name] = {"error": "Tiempo de espera agotado", "ms": round(timeout * 1000, 3)}
+        return reportsModel.dashboard_result(reports, started)
+
+    # Motor columnar (?engine=columnar): los mismos reportes calculados sobre las
+    # columnas en memoria de app/columnar.py, que se ponen al día antes de cada uno
+    @staticmethod
+    def columnar(method, *args):
+        with columnar_store.lock:
+            columnar_store.refresh(mongo.db)
+            return getattr(columnar_store, method)(*args)
+
+    @staticmethod
+    def columnar_timeseries(start, end, bucket, group_by=None):
+        series, names = reportsModel.columnar("sales_series", start, end, bucket, group_by)
+        return reportsModel.timeseries_result(start, end, bucket, group_by, series, names)
+
+    @staticmethod
+    def columnar_dashboard():
+        # Cada reporte tarda microsegundos: van uno tras otro, sin el pool de hilos
+        started = time.perf_counter()
+        with columnar_store.lock:
+            columnar_store.refresh(mongo.db)
+            reports = {name: _timed(name, getattr(columnar_store, method)) for name, method in DASHBOARD}
+        return reportsModel.dashboard_result(reports, started)
+
+    @staticmethod
+    def dashboard_result(reports, started):
+        errors = [name for name, entry in reports.items() if "error" in entry]
+        return {
+            "reports": reports,
+            "errors": errors,
+            "ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    # --- Pipelines ---
+
+    @staticmethod
+    def brands_with_sales_pipeline(from_rollups=False):
+        if from_rollups:
+            return rollups.BY_BRAND, [
+                { "$match": { "count": { "$gt": 0 } } },
+                {
+                    "$lookup": {
+                        "from": "brands",
+                        "localField": "_id",
+                        "foreignField": "_id",
+                        "as": "brand"
+                    }
+                },
+                { "$unwind": "$brand" },
+                {
+                    "$project": {
+                        "_id": { "$toString": "$brand._id" },
+                        "name": { "$ifNull": ["$brand.name", None] },
+                        "country": { "$ifNull": ["$brand.country", None] }
+                    }
+                }
+            ]
+        return "sales", [
+            # Productos distintos que tienen ventas
+            { "$group": { "_id": "$product_id" } },
             {
                 "$lookup": {
                     "from": "products",
                     "localField": "_id",
-                    "foreignField": "brand_id",
-                    "as": "products"
+                    "foreignField": "_id",
+                    "as": "product"
                 }
             },
-            { "$unwind": "$products" },
+            { "$unwind": "$product" },
+            { "$group": { "_id": "$product.brand_id" } },
             {
                 "$lookup": {
-                    "from": "sales",
-                    "localField": "products._id",
-                    "foreignField": "product_id",
-                    "as": "sales"
+                    "from": "brands",
+                    "localField": "_id",
+                    "foreignField": "_id",
+                    "as": "brand"
                 }
             },
-            { "$match": { "sales": { "$ne": [] } } },
+            { "$unwind": "$brand" },
             {
                 "$project": {
-                    "_id": { "$toString": "$_id" },
-                    "name": 1,
-                    "country": 1
+                    "_id": { "$toString": "$brand._id" },
+                    "name": { "$ifNull": ["$brand.name", None] },
+                    "country": { "$ifNull": ["$brand.country", None] }
                 }
-            },
-            { "$group": { "_id": "$_id", "name": { "$first": "$name" }, "country": { "$first": "$country" } } }
+            }
         ]
-        return list(mongo.db.brands.aggregate(pipeline))
 
-    # 2. Prendas vendidas y su cantidad restante en stock
     @staticmethod
-    def products_sold_and_stock():
-        pipeline = [
+    def products_sold_and_stock_pipeline(from_rollups=False, from_counters=False):
+        if from_counters:
+            # Con los contadores de app/stock.py es un recorrido de productos, sin $lookup
+            return "products", [
+                {
+                    "$project": {
+                        "_id": { "$toString": "$_id" },
+                        "name": 1,
+                        "stock": 1,
+                        "sold_quantity": { "$ifNull": ["$sold_quantity", 0] }
+                    }
+                }
+            ]
+        if from_rollups:
+            # El $lookup es por _id de la colección de totales (siempre indexado), uno por producto
+            return "products", [
+                {
+                    "$lookup": {
+                        "from": rollups.BY_PRODUCT,
+                        "localField": "_id",
+                        "foreignField": "_id",
+                        "as": "totals"
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": { "$toString": "$_id" },
+                        "name": 1,
+                        "stock": 1,
+                        "sold_quantity": { "$sum": "$totals.quantity" }
+                    }
+                }
+            ]
+        return "products", [
             {
                 "$lookup": {
                     "from": "sales",
                     "localField": "_id",
                     "foreignField": "product_id",
-                    "as": "sales"
+                    "pipeline": [
+                        { "$group": { "_id": None, "quantity": { "$sum": "$quantity" } } }
+                    ],
+                    "as": "sold"
                 }
             },
             {
@@ -53,91 +283,243 @@ class reportsModel:
                     "_id": { "$toString": "$_id" },
                     "name": 1,
                     "stock": 1,
-                    "sold_quantity": { "$sum": "$sales.quantity" }
+                    "sold_quantity": { "$sum": "$sold.quantity" }
                 }
             }
         ]
-        return list(mongo.db.products.aggregate(pipeline))
 
-    # 3. Top 5 marcas más vendidas
     @staticmethod
-    def top_5_brands():
-        pipeline = [
+    def top_5_brands_pipeline(from_rollups=False):
+        if from_rollups:
+            return rollups.BY_BRAND, [
+                { "$match": { "count": { "$gt": 0 } } },
+                { "$sort": { "quantity": -1 } },
+                {
+                    "$lookup": {
+                        "from": "brands",
+                        "localField": "_id",
+                        "foreignField": "_id",
+                        "as": "brand"
+                    }
+                },
+                { "$unwind": "$brand" },
+                { "$limit": reportsModel.TOP },
+                {
+                    "$project": {
+                        "_id": { "$toString": "$_id" },
+                        "brand_name": { "$ifNull": ["$brand.name", None] },
+                        "total_sales": "$quantity"
+                    }
+                }
+            ]
+        return "sales", [
+            { "$group": { "_id": "$product_id", "quantity": { "$sum": "$quantity" } } },
             {
                 "$lookup": {
                     "from": "products",
                     "localField": "_id",
-                    "foreignField": "brand_id",
-                    "as": "products"
+                    "foreignField": "_id",
+                    "as": "product"
                 }
             },
-            { "$unwind": "$products" },
+            { "$unwind": "$product" },
+            { "$group": { "_id": "$product.brand_id", "total_sales": { "$sum": "$quantity" } } },
+            { "$sort": { "total_sales": -1 } },
             {
                 "$lookup": {
-                    "from": "sales",
-                    "localField": "products._id",
-                    "foreignField": "product_id",
-                    "as": "sales"
+                    "from": "brands",
+                    "localField": "_id",
+                    "foreignField": "_id",
+                    "as": "brand"
                 }
             },
-            { "$unwind": "$sales" },
+            { "$unwind": "$brand" },
+            { "$limit": reportsModel.TOP },
             {
-                "$group": {
+                "$project": {
                     "_id": { "$toString": "$_id" },
-                    "brand_name": { "$first": "$name" },
-                    "total_sales": { "$sum": "$sales.quantity" }
+                    "brand_name": { "$ifNull": ["$brand.name", None] },
+                    "total_sales": 1
                 }
-            },
-            { "$sort": { "total_sales": -1 } },
-            { "$limit": 5 }
+            }
         ]
-        return list(mongo.db.brands.aggregate(pipeline))
 
-    # 4. Usuarios con más compras realizadas
     @staticmethod
-    def top_users():
-        pipeline = [
+    def top_users_pipeline(from_rollups=False):
+        if from_rollups:
+            return rollups.BY_USER, [
+                { "$match": { "count": { "$gt": 0 } } },
+                { "$sort": { "count": -1 } },
+                {
+                    "$lookup": {
+                        "from": "users",
+                        "localField": "_id",
+                        "foreignField": "_id",
+                        "as": "user"
+                    }
+                },
+                { "$unwind": "$user" },
+                { "$limit": reportsModel.TOP },
+                {
+                    "$project": {
+                        "_id": { "$toString": "$_id" },
+                        "username": "$user.username",
+                        "email": "$user.email",
+                        "total_purchases": "$count"
+                    }
+                }
+            ]
+        return "sales", [
+            { "$group": { "_id": "$user_id", "total_purchases": { "$sum": 1 } } },
+            { "$sort": { "total_purchases": -1 } },
             {
                 "$lookup": {
-                    "from": "sales",
+                    "from": "users",
                     "localField": "_id",
-                    "foreignField": "user_id",
-                    "as": "sales"
+                    "foreignField": "_id",
+                    "as": "user"
                 }
             },
+            { "$unwind": "$user" },
+            { "$limit": reportsModel.TOP },
             {
                 "$project": {
                     "_id": { "$toString": "$_id" },
-                    "username": 1,
-                    "email": 1,
-                    "total_purchases": { "$size": "$sales" }
+                    "username": "$user.username",
+                    "email": "$user.email",
+                    "total_purchases": 1
                 }
-            },
-            { "$sort": { "total_purchases": -1 } },
-            { "$limit": 5 }
+            }
         ]
-        return list(mongo.db.users.aggregate(pipeline))
 
-    # 5. Promedio de calificación por producto
     @staticmethod
-    def average_ratings():
-        pipeline = [
+    def users_without_purchases_query(top):
+        seen = [ObjectId(user["_id"]) for user in top]
+        return {"_id": {"$nin": seen}}, {"username": 1, "email": 1}
+
+    @staticmethod
+    def without_purchases(users):
+        # Con `_id` como texto, igual que las filas del $toString del pipeline
+        return [{**user, "_id": str(user["_id"]), "total_purchases": 0} for user in users]
+
+    @staticmethod
+    def average_ratings_pipeline():
+        return "products", [
             {
                 "$lookup": {
                     "from": "reviews",
                     "localField": "_id",
                     "foreignField": "product_id",
-                    "as": "reviews"
+                    "pipeline": [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "avg_rating": { "$avg": "$rating" },
+                                "total_reviews": { "$sum": 1 }
+                            }
+                        }
+                    ],
+                    "as": "ratings"
                 }
             },
             {
                 "$project": {
                     "_id": { "$toString": "$_id" },
                     "name": 1,
-                    "avg_rating": { "$avg": "$reviews.rating" },
-                    "total_reviews": { "$size": "$reviews" }
+                    "avg_rating": { "$avg": "$ratings.avg_rating" },
+                    "total_reviews": { "$sum": "$ratings.total_reviews" }
                 }
             },
             { "$sort": { "avg_rating": -1 } }
         ]
-        return list(mongo.db.products.aggregate(pipeline))
\ No newline at end of file
+
+    @staticmethod
+    def timeseries_can_use_rollups(start, end, group_by):
+        # Sin agrupar y con días completos alcanza con los totales diarios (un documento por día)
+        whole_days = start == start.replace(hour=0, minute=0, second=0, microsecond=0) \
+            and end == end.replace(hour=0, minute=0, second=0, microsecond=0)
+        return group_by is None and whole_days
+
+    @staticmethod
+    def timeseries_pipeline(start, end, bucket, group_by, from_rollups=False):
+        totals = {
+            "quantity": { "$sum": "$quantity" },
+            "total": { "$sum": "$total" },
+            "count": { "$sum": 1 }
+        }
+
+        if from_rollups:
+            return rollups.BY_DAY, [
+                { "$match": { "_id": { "$gte": start, "$lt": end } } },
+                {
+                    "$group": {
+                        "_id": { "bucket": date_trunc("$_id", bucket) },
+                        "quantity": { "$sum": "$quantity" },
+                        "total": { "$sum": "$total" },
+                        "count": { "$sum": "$count" }
+                    }
+                }
+            ]
+
+        # El rango sobre `sale_date` usa el índice sale_date_1
+        pipeline = [{ "$match": { "sale_date": { "$gte": start, "$lt": end } } }]
+        if group_by is None:
+            pipeline.append({ "$group": { "_id": { "bucket": date_trunc("$sale_date", bucket) }, **totals } })
+        elif group_by == "product":
+            pipeline.append({ "$group": { "_id": { "bucket": date_trunc("$sale_date", bucket), "key": "$product_id" }, **totals } })
+        else:
+            # Se agrupa por producto antes del $lookup, así hay un join por producto e intervalo y no por venta
+            pipeline += [
+                { "$group": { "_id": { "bucket": date_trunc("$sale_date", bucket), "product": "$product_id" }, **totals } },
+                {
+                    "$lookup": {
+                        "from": "products",
+                        "localField": "_id.product",
+                        "foreignField": "_id",
+                        "as": "product"
+                    }
+                },
+                { "$unwind": "$product" },
+                {
+                    "$group": {
+                        "_id": { "bucket": "$_id.bucket", "key": "$product.brand_id" },
+                        "quantity": { "$sum": "$quantity" },
+                        "total": { "$sum": "$total" },
+                        "count": { "$sum": "$count" }
+                    }
+                }
+            ]
+        return "sales", pipeline
+
+    @staticmethod
+    def timeseries_names_query(group_by, series):
+        collection = "products" if group_by == "product" else "brands"
+        keys = [key for key in series if key is not None]
+        return collection, {"_id": {"$in": keys}}
+
+    @staticmethod
+    def timeseries_result(start, end, bucket, group_by, series, names):
+        starts = bucket_starts(start, end, bucket)
+        if group_by is None:
+            zeros = {field: [0] * len(starts) for field in ("quantity", "total", "count")}
+            data = [{"_id": None, "name": None, **series.get(None, zeros)}]
+        else:
+            data = [
+                {"_id": str(key) if key is not None else None, "name": names.get(key), **values}
+                for key, values in series.items()
+            ]
+            data.sort(key=lambda item: sum(item["quantity"]), reverse=True)
+
+        return {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "bucket": bucket,
+            "group_by": group_by,
+            "buckets": [value.isoformat() for value in starts],
+            "series": data
+        }
+
+# Colecciones que leen los reportes del panel (para la ETag de /reports/dashboard)
+DASHBOARD_DEPENDS_ON = tuple(sorted({
+    collection for _, method in DASHBOARD for collection in getattr(reportsModel, method).depends_on
+}))
@@ -1,50 +1,119 @@
+import logging
 from bson.objectid import ObjectId
 from app.index import mongo
+from app import versions
+from app.signals import collection_changed
+from app.bulk import run_bulk
+from app.utils.pagination import paginate, page_sort
+from app.utils.streaming import open_cursor
+from app.utils.projection import build_projection
+from app.utils.query import sort_fields
+from app.utils.relations import coerce_ids, expand_relations, order_by_ids
+
+logger = logging.getLogger(__name__)
 
 class reviewsModel:
+    # Campos que se pueden pedir con ?fields=
+    FIELDS = ('product_id', 'user_id', 'rating', 'comment', 'review_date')
+    DEFAULT_PROJECTION = None
+    # Referencias que se pueden resolver con ?expand= (colección y campos que se traen)
+    RELATIONS = {
+        'product_id': ('products', {'name': 1, 'price': 1}),
+        'user_id': ('users', {'username': 1, 'email': 1}),
+    }
+    # Filtros de la query string (campo: tipo, ver app/utils/query.py) y campos de ?sort=
+    FILTERS = {'product_id': 'id', 'user_id': 'id', 'rating': 'number', 'review_date': 'date'}
+    SORTS = ('rating', 'review_date')
+    # ?q= usa el índice de texto sobre `comment` (ver app/indexes.py)
+    SEARCH = True
+
     @staticmethod
-    def get_all():
-        print(mongo.db.list_collection_names())
-        cursor = mongo.db.reviews.find()
-        reviews = []
-        for review in cursor:
-            review['_id'] = str(review['_id'])
-            reviews.append(review)
-        return reviews
+    def expand(docs, fields):
+        return expand_relations(mongo.db, docs, reviewsModel.RELATIONS, fields)
 
     @staticmethod
-    def get_by_id(review_id):
+    def get_all(fields=None, expand=None, query=None, sort=None):
+        # Consulta de diagnóstico (una ida y vuelta extra al servidor): solo con LOG_LEVEL=DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Colecciones: %s", mongo.db.list_collection_names())
+        cursor = mongo.db.reviews.find(query or {}, build_projection(fields, reviewsModel.DEFAULT_PROJECTION, expand))
+        if sort:
+            cursor = cursor.sort(page_sort(sort))
+        return reviewsModel.expand(list(cursor), expand)
+
+    @staticmethod
+    def get_page(limit, after=None, fields=None, expand=None, query=None, sort=None):
+        # Los campos de `sort` se proyectan siempre: el cursor de la página siguiente sale de ellos
+        projection = build_projection(fields, reviewsModel.DEFAULT_PROJECTION, (expand or []) + sort_fields(sort))
+        page = paginate(mongo.db.reviews, limit, after, query, projection, sort)
+        reviewsModel.expand(page['data'], expand)
+        return page
+
+    @staticmethod
+    def get_many(ids, fields=None, expand=None):
+        # Una sola consulta $in para toda la lista de ids
+        reviews = list(mongo.db.reviews.find({"_id": {"$in": ids}}, build_projection(fields, reviewsModel.DEFAULT_PROJECTION, expand)))
+        return reviewsModel.expand(order_by_ids(reviews, ids), expand)
+
+    @staticmethod
+    def stream(after=None, fields=None, expand=None, query=None, sort=None):
+        return open_cursor(mongo.db.reviews, after, build_projection(fields, reviewsModel.DEFAULT_PROJECTION, expand), query, sort)
+
+    @staticmethod
+    def get_by_id(review_id, fields=None, expand=None):
         try:
-            review = mongo.db.reviews.find_one({"_id": ObjectId(review_id)})
+            review = mongo.db.reviews.find_one(
+                {"_id": ObjectId(review_id)},
+                build_projection(fields, reviewsModel.DEFAULT_PROJECTION, expand)
+            )
             if review:
-                review['_id'] = str(review['_id'])
+                reviewsModel.expand([review], expand)
                 return review
         except:
             return None
 
+    @staticmethod
+    def _coerce_fields(data):
+        # Las referencias de RELATIONS se guardan como ObjectId (llegan del JSON como texto)
+        return coerce_ids(data, reviewsModel.RELATIONS)
+
     @staticmethod
     def create(data):
+        reviewsModel._coerce_fields(data)
         try:
             result = mongo.db.reviews.insert_one(data)
-            return str(result.inserted_id)
         except:
             return None
+        versions.bump(mongo.db, "reviews", insert=True)
+        collection_changed.send("reviews", op="insert")
+        return str(result.inserted_id)
 
     @staticmethod
     def update(review_id, data):
+        reviewsModel._coerce_fields(data)
         try:
             result = mongo.db.reviews.update_one(
                 {"_id": ObjectId(review_id)},
                 {"$set": data}
             )
-            return result.modified_count
         except:
             return -1
+        if result.modified_count:
+            versions.bump(mongo.db, "reviews")
+            collection_changed.send("reviews", op="update")
+        return result.modified_count
 
     @staticmethod
     def delete(review_id):
         try:
             result = mongo.db.reviews.delete_one({"_id": ObjectId(review_id)})
-            return result.deleted_count
         except:
-            return -1
\ No newline at end of file
+            return -1
+        if result.deleted_count:
+            versions.bump(mongo.db, "reviews")
+            collection_changed.send("reviews", op="delete")
+        return result.deleted_count
+
+    @staticmethod
+    def bulk(operations, ordered=True, chunk_size=500):
+        return run_bulk(mongo.db, "reviews", operations, ordered, chunk_size, prepare=reviewsModel._coerce_fields)
@@ -1,50 +1,190 @@
+import logging
 from bson.objectid import ObjectId
 from app.index import mongo
+from app import stock, versions
+from app.ingest import QueueFull, sales_queue
+from app.signals import collection_changed
+from app.bulk import run_bulk
+from app.rollups import apply_sale, update_sale
+from app.utils.pagination import paginate, page_sort
+from app.utils.streaming import open_cursor
+from app.utils.projection import build_projection
+from app.utils.query import sort_fields
+from app.utils.relations import coerce_ids, expand_relations, order_by_ids
+from app.utils.timeseries import to_datetime
+
+logger = logging.getLogger(__name__)
 
 class salesModel:
+    # Campos que se pueden pedir con ?fields=
+    FIELDS = ('product_id', 'user_id', 'sale_date', 'date', 'quantity', 'total')
+    DEFAULT_PROJECTION = None
+    # Referencias que se pueden resolver con ?expand= (colección y campos que se traen)
+    RELATIONS = {
+        'product_id': ('products', {'name': 1, 'price': 1}),
+        'user_id': ('users', {'username': 1, 'email': 1}),
+    }
+    # Filtros de la query string (campo: tipo, ver app/utils/query.py) y campos de ?sort=
+    FILTERS = {'product_id': 'id', 'user_id': 'id', 'sale_date': 'date', 'quantity': 'number', 'total': 'number'}
+    SORTS = ('sale_date', 'quantity', 'total')
+    SEARCH = False
+
+    @staticmethod
+    def _coerce_fields(data):
+        # Desde JSON `sale_date` llega como texto; se guarda como fecha para que los
+        # filtros por rango y los reportes por intervalo la encuentren. `product_id` y
+        # `user_id` se guardan como ObjectId antes de mover el stock (ver app/stock.py)
+        coerce_ids(data, salesModel.RELATIONS)
+        value = data.get('sale_date') if isinstance(data, dict) else None
+        if isinstance(value, str):
+            try:
+                data['sale_date'] = to_datetime(value)
+            except ValueError:
+                pass
+        return data
+
+    @staticmethod
+    def expand(docs, fields):
+        return expand_relations(mongo.db, docs, salesModel.RELATIONS, fields)
+
+    @staticmethod
+    def get_all(fields=None, expand=None, query=None, sort=None):
+        # Consulta de diagnóstico (una ida y vuelta extra al servidor): solo con LOG_LEVEL=DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Colecciones: %s", mongo.db.list_collection_names())
+        cursor = mongo.db.sales.find(query or {}, build_projection(fields, salesModel.DEFAULT_PROJECTION, expand))
+        if sort:
+            cursor = cursor.sort(page_sort(sort))
+        return salesModel.expand(list(cursor), expand)
+
+    @staticmethod
+    def get_page(limit, after=None, fields=None, expand=None, query=None, sort=None):
+        # Los campos de `sort` se proyectan siempre: el cursor de la página siguiente sale de ellos
+        projection = build_projection(fields, salesModel.DEFAULT_PROJECTION, (expand or []) + sort_fields(sort))
+        page = paginate(mongo.db.sales, limit, after, query, projection, sort)
+        salesModel.expand(page['data'], expand)
+        return page
+
     @staticmethod
-    def get_all():
-        print(mongo.db.list_collection_names())
-        cursor = mongo.db.sales.find()
-        sales = []
-        for sale in cursor:
-            sale['_id'] = str(sale['_id'])
-            sales.append(sale)
-        return sales
+    def get_many(ids, fields=None, expand=None):
+        # Una sola consulta $in para toda la lista de ids
+        sales = list(mongo.db.sales.find({"_id": {"$in": ids}}, build_projection(fields, salesModel.DEFAULT_PROJECTION, expand)))
+        return salesModel.expand(order_by_ids(sales, ids), expand)
 
     @staticmethod
-    def get_by_id(sale_id):
+    def stream(after=None, fields=None, expand=None, query=None, sort=None):
+        return open_cursor(mongo.db.sales, after, build_projection(fields, salesModel.DEFAULT_PROJECTION, expand), query, sort)
+
+    @staticmethod
+    def get_by_id(sale_id, fields=None, expand=None):
         try:
-            sale = mongo.db.sales.find_one({"_id": ObjectId(sale_id)})
+            sale = mongo.db.sales.find_one(
+                {"_id": ObjectId(sale_id)},
+                build_projection(fields, salesModel.DEFAULT_PROJECTION, expand)
+            )
             if sale:
-                sale['_id'] = str(sale['_id'])
+                salesModel.expand([sale], expand)
                 return sale
         except:
             return None
 
+    @staticmethod
+    def _stock_changed(changes):
+        # La venta movió `stock`/`sold_quantity` de estos productos
+        if changes:
+            versions.bump(mongo.db, stock.VERSION)
+            collection_changed.send(stock.VERSION, op="update")
+
     @staticmethod
     def create(data):
+        salesModel._coerce_fields(data)
+        # Sin producto válido y cantidad positiva no hay stock que reservar: InvalidSale (400)
+        stock.check_sale(data)
+        # Primero se descuenta el stock (falla con StockError si no alcanza) y luego se guarda la venta
+        changes = stock.deltas({}, data)
+        stock.reserve(mongo.db, changes)
         try:
             result = mongo.db.sales.insert_one(data)
-            return str(result.inserted_id)
         except:
+            stock.undo(mongo.db, changes)
             return None
+        apply_sale(mongo.db, data)
+        versions.bump(mongo.db, "sales", insert=True)
+        collection_changed.send("sales", op="insert")
+        salesModel._stock_changed(changes)
+        return str(result.inserted_id)
+
+    @staticmethod
+    def enqueue(data):
+        """
+        Como create, pero la venta se guarda en un lote de sales_queue. El stock se
+        descuenta ya (StockError si no alcanza, InvalidSale sin producto o cantidad).
+        Devuelve (_id, Future) o None si el cuerpo no es una venta; lanza QueueFull si
+        la cola está llena.
+        """
+        if not isinstance(data, dict):
+            return None
+        salesModel._coerce_fields(data)
+        # El _id se asigna al aceptarla: es lo que recibe el cliente con ack=queued
+        stock.check_sale(data)
+        data.setdefault("_id", ObjectId())
+        changes = stock.deltas({}, data)
+        stock.reserve(mongo.db, changes)
+        try:
+            future = sales_queue.submit(data, changes)
+        except QueueFull:
+            stock.undo(mongo.db, changes)
+            raise
+        return str(data["_id"]), future
 
     @staticmethod
     def update(sale_id, data):
+        salesModel._coerce_fields(data)
         try:
-            result = mongo.db.sales.update_one(
-                {"_id": ObjectId(sale_id)},
-                {"$set": data}
-            )
-            return result.modified_count
+            # Se necesita la venta anterior para restar sus totales y su stock
+            before = mongo.db.sales.find_one({"_id": ObjectId(sale_id)})
+        except:
+            return -1
+        if before is None or all(key in before and before[key] == value for key, value in data.items()):
+            return 0
+        # La venta como queda también tiene que poder mover stock (no se puede quitar el producto)
+        stock.check_sale({**before, **data})
+        changes = stock.deltas(before, {**before, **data})
+        stock.reserve(mongo.db, changes)
+        try:
+            # Solo si nadie cambió el producto o la cantidad desde la lectura
+            before = mongo.db.sales.find_one_and_update(stock.sale_filter(before), {"$set": data})
         except:
+            before = None
+        if before is None:
+            stock.undo(mongo.db, changes)
             return -1
+        stock.release(mongo.db, changes)
+        update_sale(mongo.db, before, {**before, **data})
+        versions.bump(mongo.db, "sales")
+        collection_changed.send("sales", op="update")
+        salesModel._stock_changed(changes)
+        return 1
 
     @staticmethod
     def delete(sale_id):
         try:
-            result = mongo.db.sales.delete_one({"_id": ObjectId(sale_id)})
-            return result.deleted_count
+            sale = mongo.db.sales.find_one_and_delete({"_id": ObjectId(sale_id)})
         except:
-            return -1
\ No newline at end of file
+            return -1
+        if sale is None:
+            return 0
+        changes = stock.deltas(sale, {})
+        stock.release(mongo.db, changes)
+        apply_sale(mongo.db, sale, -1)
+        versions.bump(mongo.db, "sales")
+        collection_changed.send("sales", op="delete")
+        salesModel._stock_changed(changes)
+        return 1
+
+    @staticmethod
+    def bulk(operations, ordered=True, chunk_size=500):
+        # Los insert van en bulk_write; update y delete pasan por update()/delete() para mover el stock exacto
+        return run_bulk(mongo.db, "sales", operations, ordered, chunk_size,
+                        prepare=salesModel._coerce_fields,
+                        single={"update": salesModel.update, "delete": salesModel.delete})
@@ -1,23 +1,70 @@
+import logging
 from bson.objectid import ObjectId
 from app.index import mongo
+from app import versions
+from app.signals import collection_changed
+from app.bulk import run_bulk
+from app.utils.pagination import paginate, page_sort
+from app.utils.streaming import open_cursor
+from app.utils.projection import build_projection
+from app.utils.query import sort_fields
+from app.utils.relations import expand_relations, order_by_ids
+
+logger = logging.getLogger(__name__)
 
 class usersModel:
+    # Campos que se pueden pedir con ?fields=
+    FIELDS = ('username', 'email', 'role', 'country', 'created_at')
+    # La contraseña nunca sale de la API
+    DEFAULT_PROJECTION = {"password": 0}
+    # Referencias que se pueden resolver con ?expand= (colección y campos que se traen)
+    RELATIONS = {}
+    # Filtros de la query string (campo: tipo, ver app/utils/query.py) y campos de ?sort=
+    FILTERS = {'role': 'string', 'country': 'string', 'created_at': 'date'}
+    SORTS = ('username', 'created_at')
+    SEARCH = False
+
+    @staticmethod
+    def expand(docs, fields):
+        return expand_relations(mongo.db, docs, usersModel.RELATIONS, fields)
+
+    @staticmethod
+    def get_all(fields=None, expand=None, query=None, sort=None):
+        # Consulta de diagnóstico (una ida y vuelta extra al servidor): solo con LOG_LEVEL=DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Colecciones: %s", mongo.db.list_collection_names())
+        cursor = mongo.db.users.find(query or {}, build_projection(fields, usersModel.DEFAULT_PROJECTION, expand))
+        if sort:
+            cursor = cursor.sort(page_sort(sort))
+        return usersModel.expand(list(cursor), expand)
+
+    @staticmethod
+    def get_page(limit, after=None, fields=None, expand=None, query=None, sort=None):
+        # Los campos de `sort` se proyectan siempre: el cursor de la página siguiente sale de ellos
+        projection = build_projection(fields, usersModel.DEFAULT_PROJECTION, (expand or []) + sort_fields(sort))
+        page = paginate(mongo.db.users, limit, after, query, projection, sort)
+        usersModel.expand(page['data'], expand)
+        return page
+
     @staticmethod
-    def get_all():
-        print(mongo.db.list_collection_names())
-        cursor = mongo.db.users.find()
-        users = []
-        for user in cursor:
-            user['_id'] = str(user['_id'])
-            users.append(user)
-        return users
+    def get_many(ids, fields=None, expand=None):
+        # Una sola consulta $in para toda la lista de ids
+        users = list(mongo.db.users.find({"_id": {"$in": ids}}, build_projection(fields, usersModel.DEFAULT_PROJECTION, expand)))
+        return usersModel.expand(order_by_ids(users, ids), expand)
 
     @staticmethod
-    def get_by_id(user_id):
+    def stream(after=None, fields=None, expand=None, query=None, sort=None):
+        return open_cursor(mongo.db.users, after, build_projection(fields, usersModel.DEFAULT_PROJECTION, expand), query, sort)
+
+    @staticmethod
+    def get_by_id(user_id, fields=None, expand=None):
         try:
-            user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+            user = mongo.db.users.find_one(
+                {"_id": ObjectId(user_id)},
+                build_projection(fields, usersModel.DEFAULT_PROJECTION, expand)
+            )
             if user:
-                user['_id'] = str(user['_id'])
+                usersModel.expand([user], expand)
                 return user
         except:
             return None
@@ -26,9 +73,11 @@ class usersModel:
     def create(data):
         try:
             result = mongo.db.users.insert_one(data)
-            return str(result.inserted_id)
         except:
             return None
+        versions.bump(mongo.db, "users", insert=True)
+        collection_changed.send("users", op="insert")
+        return str(result.inserted_id)
 
     @staticmethod
     def update(user_id, data):
@@ -37,14 +86,24 @@ class usersModel:
                 {"_id": ObjectId(user_id)},
                 {"$set": data}
             )
-            return result.modified_count
         except:
             return -1
+        if result.modified_count:
+            versions.bump(mongo.db, "users")
+            collection_changed.send("users", op="update")
+        return result.modified_count
 
     @staticmethod
     def delete(user_id):
         try:
             result = mongo.db.users.delete_one({"_id": ObjectId(user_id)})
-            return result.deleted_count
         except:
-            return -1
\ No newline at end of file
+            return -1
+        if result.deleted_count:
+            versions.bump(mongo.db, "users")
+            collection_changed.send("users", op="delete")
+        return result.deleted_count
+
+    @staticmethod
+    def bulk(operations, ordered=True, chunk_size=500):
+        return run_bulk(mongo.db, "users", operations, ordered, chunk_size)
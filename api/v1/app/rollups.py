@@ -0,0 +1,194 @@
+from datetime import datetime
+from pymongo import UpdateOne
+
+# Colecciones de totales de ventas que se mantienen con $inc en cada escritura de `sales`.
+# Cada documento es {_id: llave, quantity, total, count}. La llave es el valor tal cual
+# está guardado en la venta (igual que la igualdad de un $lookup), así los reportes
+# leídos desde aquí dan lo mismo que las agregaciones sobre `sales`.
+# rebuild() y verify() son los comandos rebuild-rollups y verify-rollups de clothing_db.py.
+BY_PRODUCT = "sales_by_product"
+BY_BRAND = "sales_by_brand"
+BY_USER = "sales_by_user"
+BY_DAY = "sales_by_day"
+META = "rollups_meta"
+
+def _amount(value):
+    # Igual que $sum: solo suma números, lo demás cuenta como 0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return 0
+
+def _day(value):
+    if isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return None
+
+def _inc(db, collection, key, quantity, total, count):
+    db[collection].update_one(
+        {"_id": key},
+        {"$inc": {"quantity": quantity, "total": total, "count": count}},
+        upsert=True
+    )
+
+def is_ready(db):
+    # Hasta que no se ejecute un rebuild los totales no están completos y los reportes usan `sales`
+    return db[META].find_one({"_id": "sales"}, {"_id": 1}) is not None
+
+def apply_sale(db, sale, sign=1):
+    """Suma (sign=1) o resta (sign=-1) una venta en todas las colecciones de totales."""
+    quantity = sign * _amount(sale.get("quantity"))
+    total = sign * _amount(sale.get("total"))
+    product_id = sale.get("product_id")
+
+    _inc(db, BY_PRODUCT, product_id, quantity, total, sign)
+    _inc(db, BY_USER, sale.get("user_id"), quantity, total, sign)
+
+    day = _day(sale.get("sale_date"))
+    if day is not None:
+        _inc(db, BY_DAY, day, quantity, total, sign)
+
+    product = db.products.find_one({"_id": product_id}, {"brand_id": 1}) if product_id is not None else None
+    if product and product.get("brand_id") is not None:
+        _inc(db, BY_BRAND, product["brand_id"], quantity, total, sign)
+
+# Campos de la venta que afectan los totales
+SALE_FIELDS = ("product_id", "user_id", "sale_date", "quantity", "total")
+
+def update_sale(db, before, after):
+    if all(before.get(field) == after.get(field) for field in SALE_FIELDS):
+        return
+    apply_sale(db, before, -1)
+    apply_sale(db, after, 1)
+
+def product_ids(sales):
+    # Productos de un lote de ventas, para buscar sus marcas con un solo $in
+    return list({sale.get("product_id") for sale in sales if sale.get("product_id") is not None})
+
+def batch_operations(sales, brands):
+    """
+    {colección: [UpdateOne]} con los totales de varias ventas ya sumados por llave:
+    un lote de ventas del mismo producto es un solo $inc. `brands` es {product_id: brand_id}.
+    """
+    totals = {BY_PRODUCT: {}, BY_USER: {}, BY_DAY: {}, BY_BRAND: {}}
+
+    def add(collection, key, quantity, total):
+        row = totals[collection].setdefault(key, [0, 0, 0])
+        row[0] += quantity
+        row[1] += total
+        row[2] += 1
+
+    for sale in sales:
+        quantity = _amount(sale.get("quantity"))
+        total = _amount(sale.get("total"))
+        product_id = sale.get("product_id")
+        add(BY_PRODUCT, product_id, quantity, total)
+        add(BY_USER, sale.get("user_id"), quantity, total)
+        day = _day(sale.get("sale_date"))
+        if day is not None:
+            add(BY_DAY, day, quantity, total)
+        if brands.get(product_id) is not None:
+            add(BY_BRAND, brands[product_id], quantity, total)
+
+    return {
+        collection: [
+            UpdateOne({"_id": key}, {"$inc": {"quantity": quantity, "total": total, "count": count}}, upsert=True)
+            for key, (quantity, total, count) in rows.items()
+        ]
+        for collection, rows in totals.items() if rows
+    }
+
+def apply_sales(db, sales):
+    """apply_sale de un lote de ventas nuevas, con un bulk_write por colección de totales."""
+    ids = product_ids(sales)
+    brands = {
+        product["_id"]: product.get("brand_id")
+        for product in db.products.find({"_id": {"$in": ids}}, {"brand_id": 1})
+    } if ids else {}
+    for collection, operations in batch_operations(sales, brands).items():
+        db[collection].bulk_write(operations, ordered=False)
+
+def move_product(db, product_id, old_brand_id, new_brand_id):
+    """
+    Pasa los totales de un producto de una marca a otra. Se usa al crear,
+    cambiar de marca o eliminar un producto (None = sin marca).
+    """
+    if old_brand_id == new_brand_id:
+        return
+    totals = db[BY_PRODUCT].find_one({"_id": product_id})
+    if not totals or not totals.get("count"):
+        return
+    if old_brand_id is not None:
+        _inc(db, BY_BRAND, old_brand_id, -totals["quantity"], -totals["total"], -totals["count"])
+    if new_brand_id is not None:
+        _inc(db, BY_BRAND, new_brand_id, totals["quantity"], totals["total"], totals["count"])
+
+def _group(key):
+    return {
+        "$group": {
+            "_id": key,
+            "quantity": {"$sum": "$quantity"},
+            "total": {"$sum": "$total"},
+            "count": {"$sum": 1}
+        }
+    }
+
+def _pipelines():
+    by_day = [
+        {"$match": {"sale_date": {"$type": "date"}}},
+        _group({"$dateTrunc": {"date": "$sale_date", "unit": "day"}})
+    ]
+    # Por marca se parte de los totales por producto (ya agrupados), no de cada venta
+    by_brand = [
+        {"$lookup": {"from": "products", "localField": "_id", "foreignField": "_id", "as": "product"}},
+        {"$unwind": "$product"},
+        {"$match": {"product.brand_id": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": "$product.brand_id",
+                "quantity": {"$sum": "$quantity"},
+                "total": {"$sum": "$total"},
+                "count": {"$sum": "$count"}
+            }
+        }
+    ]
+    return [
+        ("sales", BY_PRODUCT, [_group("$product_id")]),
+        ("sales", BY_USER, [_group("$user_id")]),
+        ("sales", BY_DAY, by_day),
+        (BY_PRODUCT, BY_BRAND, by_brand),
+    ]
+
+def rebuild(db):
+    """Recalcula todas las colecciones de totales desde `sales` ($out las reemplaza conservando sus índices)."""
+    for source, target, pipeline in _pipelines():
+        db[source].aggregate(pipeline + [{"$out": target}])
+    db[META].update_one({"_id": "sales"}, {"$set": {"built_at": datetime.utcnow()}}, upsert=True)
+
+def verify(db, tolerance=1e-6):
+    """
+    Compara los totales guardados con los recalculados directamente desde `sales`
+    (la marca se resuelve venta por venta, sin pasar por los totales por producto).
+    Devuelve [(colección, llave, guardado, esperado)] con las diferencias.
+    """
+    by_brand_from_sales = [
+        {"$lookup": {"from": "products", "localField": "product_id", "foreignField": "_id", "as": "product"}},
+        {"$unwind": "$product"},
+        {"$match": {"product.brand_id": {"$ne": None}}},
+        _group("$product.brand_id")
+    ]
+    checks = [(target, pipeline) for source, target, pipeline in _pipelines() if source == "sales"]
+    checks.append((BY_BRAND, by_brand_from_sales))
+
+    empty = {"quantity": 0, "total": 0, "count": 0}
+    mismatches = []
+    for target, pipeline in checks:
+        expected = {row["_id"]: row for row in db.sales.aggregate(pipeline)}
+        stored = {row["_id"]: row for row in db[target].find({"count": {"$ne": 0}})}
+        for key in set(expected) | set(stored):
+            have = stored.get(key, empty)
+            want = expected.get(key, empty)
+            if (have["count"] != want["count"]
+                    or abs(have["quantity"] - want["quantity"]) > tolerance
+                    or abs(have["total"] - want["total"]) > tolerance):
+                mismatches.append((target, key, have, want))
+    return mismatches
@@ -0,0 +1,7 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Se emite después de cada escritura exitosa en una colección.
+# sender: nombre de la colección; op: "insert" | "update" | "delete"
+collection_changed = _signals.signal("collection-changed")
@@ -0,0 +1,154 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from app.rollups import META, _amount
+
+# Contadores de cada producto: `stock` (unidades disponibles) y `sold_quantity`
+# (unidades vendidas). Las ventas los mueven en un solo update_one con $inc, y
+# cuando se resta stock el filtro exige que alcance: dos ventas simultáneas de la
+# última unidad no pueden guardarse las dos. stock + sold_quantity no cambia con las ventas.
+# backfill() y verify() son los comandos backfill-stock y verify-stock de clothing_db.py.
+
+# Productos por bulk_write en el backfill
+BACKFILL_BATCH = 1000
+
+# Versión de app/versions.py (y aviso de collection_changed) de los contadores: una
+# venta la sube a ella y no a la de products, así los reportes, el motor columnar y
+# la exportación que solo leen nombres y marcas no se invalidan con cada venta
+VERSION = "stock"
+
+class StockError(Exception):
+    """La venta pide más unidades de las que quedan en stock (o es de un producto que no existe)."""
+
+    def __init__(self, product_id, quantity, message=None):
+        super().__init__(message or f"Stock insuficiente para el producto {product_id} (se piden {quantity})")
+        self.product_id = product_id
+        self.quantity = quantity
+
+class InvalidSale(ValueError):
+    """La venta no dice qué producto vende o cuántas unidades: sin eso no se puede reservar stock."""
+
+def check_sale(sale):
+    """
+    Exige lo que necesita reserve(): un `product_id` ObjectId (ya convertido por
+    coerce_ids) y una cantidad positiva. Sin esto deltas() no da nada que reservar
+    y la venta se guardaría sin descontar stock. Que el producto exista lo comprueba
+    move() al reservar (StockError).
+    """
+    if not isinstance(sale, dict):
+        raise InvalidSale("La venta debe ser un objeto")
+    product_id = sale.get("product_id")
+    if product_id is None:
+        raise InvalidSale("Falta 'product_id'")
+    if not isinstance(product_id, ObjectId):
+        raise InvalidSale(f"'product_id' inválido: '{product_id}'")
+    quantity = sale.get("quantity")
+    if isinstance(quantity, bool) or not isinstance(quantity, (int, float)) or not quantity > 0:
+        raise InvalidSale("'quantity' debe ser un número mayor que 0")
+
+def is_ready(db):
+    # Hasta el primer backfill `sold_quantity` no está completo y el reporte de stock suma `sales`
+    return db[META].find_one({"_id": "stock"}, {"_id": 1}) is not None
+
+def deltas(before, after):
+    """
+    Unidades por producto que vende (+) o devuelve (-) el paso de la venta `before`
+    a `after`. Una venta nueva es deltas({}, venta) y una eliminada deltas(venta, {}).
+    """
+    changes = {}
+    for sale, sign in ((before, -1), (after, 1)):
+        if not isinstance(sale, dict) or sale.get("product_id") is None:
+            continue
+        product_id = sale["product_id"]
+        changes[product_id] = changes.get(product_id, 0) + sign * _amount(sale.get("quantity"))
+    return {product_id: quantity for product_id, quantity in changes.items() if quantity}
+
+def sale_filter(sale):
+    # La venta tal como se leyó: si otra petición le cambió el producto o la cantidad, no coincide
+    return {"_id": sale["_id"], "product_id": sale.get("product_id"), "quantity": sale.get("quantity")}
+
+def _move_query(product_id, quantity):
+    query = {"_id": product_id}
+    if quantity > 0:
+        query["stock"] = {"$gte": quantity}
+    return query
+
+def _move_update(quantity):
+    return {"$inc": {"stock": -quantity, "sold_quantity": quantity}}
+
+def not_found(product_id, quantity):
+    return StockError(product_id, quantity, f"El producto {product_id} no existe")
+
+def move(db, product_id, quantity):
+    """
+    Vende `quantity` unidades del producto (negativo las devuelve). Lanza StockError si
+    no le alcanza el stock o si el producto no existe. Una devolución a un producto que
+    ya no existe no se toca: la venta se está borrando o cambiando de producto.
+    """
+    result = db.products.update_one(_move_query(product_id, quantity), _move_update(quantity))
+    if result.matched_count == 0 and quantity > 0:
+        if not db.products.count_documents({"_id": product_id}, limit=1):
+            raise not_found(product_id, quantity)
+        raise StockError(product_id, quantity)
+
+def reserve(db, changes):
+    """Aplica las ventas (+) de `changes` antes de escribir la venta; si una no alcanza deshace las anteriores."""
+    done = []
+    try:
+        for product_id, quantity in changes.items():
+            if quantity > 0:
+                move(db, product_id, quantity)
+                done.append((product_id, quantity))
+    except StockError:
+        for product_id, quantity in done:
+            move(db, product_id, -quantity)
+        raise
+
+def undo(db, changes):
+    """Deshace reserve() cuando la venta no se pudo escribir."""
+    for product_id, quantity in changes.items():
+        if quantity > 0:
+            move(db, product_id, -quantity)
+
+def release(db, changes):
+    """Aplica las devoluciones (-) de `changes`, ya con la venta escrita."""
+    for product_id, quantity in changes.items():
+        if quantity < 0:
+            move(db, product_id, quantity)
+
+def _sold_by_product(db):
+    return {
+        row["_id"]: row["quantity"]
+        for row in db.sales.aggregate([{"$group": {"_id": "$product_id", "quantity": {"$sum": "$quantity"}}}])
+        if row["_id"] is not None
+    }
+
+def backfill(db, subtract_sold=False):
+    """
+    Calcula `sold_quantity` de todos los productos desde `sales` y marca los contadores
+    como listos. `stock` ya son las unidades disponibles y no se toca, salvo con
+    `subtract_sold` para datos cargados con el stock inicial (se le restan las ventas;
+    solo una vez). Conviene ejecutarlo sin ventas entrando, igual que rollups.rebuild.
+    """
+    sold = _sold_by_product(db)
+    db.products.update_many({}, {"$set": {"sold_quantity": 0}})
+    ops = []
+    for product_id, quantity in sold.items():
+        update = {"$set": {"sold_quantity": quantity}}
+        if subtract_sold:
+            update["$inc"] = {"stock": -quantity}
+        ops.append(UpdateOne({"_id": product_id}, update))
+    for start in range(0, len(ops), BACKFILL_BATCH):
+        db.products.bulk_write(ops[start:start + BACKFILL_BATCH], ordered=False)
+    db[META].update_one({"_id": "stock"}, {"$set": {"built_at": datetime.utcnow()}}, upsert=True)
+
+def verify(db, tolerance=1e-6):
+    """Compara `sold_quantity` de cada producto con `sales`. Devuelve [(producto, guardado, esperado)]."""
+    sold = _sold_by_product(db)
+    mismatches = []
+    for product in db.products.find({}, {"sold_quantity": 1}):
+        stored = product.get("sold_quantity", 0)
+        expected = sold.get(product["_id"], 0)
+        if abs(stored - expected) > tolerance:
+            mismatches.append((product["_id"], stored, expected))
+    return mismatches
@@ -0,0 +1,128 @@
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from app.signals import collection_changed
+
+class ReportCache:
+    """
+    Caché en memoria para resultados de reportes: expira por TTL, tiene tamaño
+    máximo con desalojo LRU y cada entrada recuerda de qué colecciones depende
+    para invalidar solo esas cuando hay una escritura.
+    """
+
+    def __init__(self, ttl=60, max_size=128):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def configure(self, ttl, max_size):
+        with self._lock:
+            self.ttl = ttl
+            self.max_size = max_size
+            self._entries.clear()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value, _ = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key, value, depends_on):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, frozenset(depends_on))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, collection):
+        with self._lock:
+            stale = [key for key, (_, _, deps) in self._entries.items() if collection in deps]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ttl": self.ttl,
+                "max_size": self.max_size,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+report_cache = ReportCache()
+
+def cached_report(depends_on, read_versions):
+    """
+    Guarda en `report_cache` el resultado del reporte; `depends_on` son las colecciones
+    que lee. La llave lleva sus versiones (de `read_versions`, la misma lectura que hace
+    la ETag): un resultado calculado con versiones anteriores, p. ej. antes de una
+    escritura de otro proceso, nunca se sirve con la ETag nueva.
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            # Versión async (app/aio): la misma caché, pero se espera el reporte
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not report_cache.enabled:
+                    return await fn(*args, **kwargs)
+                current = await read_versions(depends_on)
+                key = (fn.__name__, args, tuple(sorted(kwargs.items())), tuple(sorted(current.items())))
+                found, value = report_cache.get(key)
+                if found:
+                    return value
+                value = await fn(*args, **kwargs)
+                report_cache.set(key, value, depends_on)
+                return value
+            async_wrapper.depends_on = tuple(depends_on)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not report_cache.enabled:
+                return fn(*args, **kwargs)
+            current = read_versions(depends_on)
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())), tuple(sorted(current.items())))
+            found, value = report_cache.get(key)
+            if found:
+                return value
+            value = fn(*args, **kwargs)
+            report_cache.set(key, value, depends_on)
+            return value
+        wrapper.depends_on = tuple(depends_on)
+        return wrapper
+    return decorator
+
+@collection_changed.connect
+def _invalidate_reports(collection, **kwargs):
+    report_cache.invalidate(collection)
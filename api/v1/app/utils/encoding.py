@@ -0,0 +1,52 @@
+import json
+from datetime import date, datetime
+from bson import json_util
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from flask.json.provider import JSONProvider
+
+# orjson es opcional (pip install orjson): serializa bastante más rápido que el
+# módulo json. Sin él se usa json con las mismas conversiones y la misma salida.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    # ObjectId como texto, en `_id` y en las referencias (brand_id, product_id, user_id)
+    if isinstance(value, ObjectId):
+        return str(value)
+    # Fechas en ISO 8601; las que devuelve pymongo están en UTC
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    # Decimal128 como texto para no perder precisión
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    # Otros tipos BSON (Binary, Regex, ...) como los deja bson.json_util
+    return json_util.default(value, json_util.RELAXED_JSON_OPTIONS)
+
+class BSONJSONProvider(JSONProvider):
+    """
+    Proveedor JSON de la API (reemplaza al de Flask-PyMongo). Serializa directamente
+    los tipos de MongoDB, así los modelos devuelven los documentos tal como vienen
+    del cursor, sin convertir `_id` documento por documento.
+
+    El JSON de las peticiones se sigue leyendo con bson.json_util: un cliente puede
+    mandar {"$oid": "..."} o {"$date": "..."} para guardar un ObjectId o una fecha.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode()
+
+    def dumps_bytes(self, obj):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def loads(self, s, **kwargs):
+        return json_util.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Los bytes van directo a la respuesta, sin pasar por str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype="application/json")
@@ -0,0 +1,67 @@
+import hashlib
+from functools import wraps
+from flask import current_app, make_response, request
+from app import versions
+from app.index import mongo
+from app.utils.relations import parse_expand
+
+def dependencies(args, depends_on, relations=None):
+    """Colecciones de las que depende la respuesta: las de la ruta más las pedidas en ?expand=."""
+    names = set(depends_on)
+    if relations:
+        try:
+            fields = parse_expand(args, relations) or ()
+        except ValueError:
+            # La ruta responde 400 y esa respuesta no lleva ETag
+            fields = ()
+        names.update(relations[field][0] for field in fields)
+    return sorted(names)
+
+def make_etag(request, current):
+    # Misma URL y mismas versiones, misma ETag. Accept separa la respuesta JSON del stream NDJSON
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(request.full_path.encode())
+    digest.update(request.headers.get("Accept", "").encode())
+    for name in sorted(current):
+        epoch, version = current[name]
+        digest.update(f"|{name}:{epoch}:{version}".encode())
+    return digest.hexdigest()
+
+def not_modified(request, tag, response_class):
+    """Respuesta 304 si el cliente ya tiene esta versión (If-None-Match), si no None."""
+    if not request.if_none_match.contains_weak(tag):
+        return None
+    response = response_class("", status=304)
+    response.set_etag(tag, weak=True)
+    response.cache_control.no_cache = True
+    return response
+
+def tag_response(response, tag):
+    # Solo las respuestas 200; una ruta puede excluir la suya con Cache-Control: no-store
+    if response.status_code != 200 or response.cache_control.no_store:
+        return response
+    # Débil: el contenido es equivalente, no idéntico byte a byte (p. ej. los tiempos del panel)
+    response.set_etag(tag, weak=True)
+    # El cliente puede guardar la respuesta pero debe revalidarla siempre con If-None-Match
+    response.cache_control.no_cache = True
+    return response
+
+def conditional(depends_on, relations=None):
+    """
+    GET condicional: la ETag sale de las versiones de las colecciones `depends_on`
+    (y de las relaciones de ?expand=). Si coincide con If-None-Match responde 304
+    sin ejecutar la ruta, es decir, sin consultar las colecciones.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Las versiones se leen antes que los datos: si hay una escritura en medio,
+            # la ETag queda vieja y el próximo GET recibe la respuesta completa
+            current = versions.current(mongo.db, dependencies(request.args, depends_on, relations))
+            tag = make_etag(request, current)
+            response = not_modified(request, tag, current_app.response_class)
+            if response is not None:
+                return response
+            return tag_response(make_response(fn(*args, **kwargs)), tag)
+        return wrapper
+    return decorator
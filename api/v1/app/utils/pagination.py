@@ -0,0 +1,115 @@
+import base64
+from bson import json_util
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+def wants_page(args):
+    # Solo se pagina cuando el cliente lo pide, así GET /<coleccion> sigue devolviendo la lista completa
+    return 'limit' in args or 'after' in args
+
+def parse_page_args(args, sort=None):
+    """
+    Lee `limit` y `after` de la query string. Lanza ValueError si no son válidos.
+    Sin `sort`, `after` es el `_id` del último documento; con `sort`, es el
+    `next_cursor` de la página anterior y debe corresponder al mismo orden.
+    """
+    raw_limit = args.get('limit')
+    if raw_limit in (None, ''):
+        limit = DEFAULT_LIMIT
+    else:
+        try:
+            limit = int(raw_limit)
+        except ValueError:
+            raise ValueError("Parámetro 'limit' inválido")
+        if limit < 1 or limit > MAX_LIMIT:
+            raise ValueError(f"'limit' debe estar entre 1 y {MAX_LIMIT}")
+
+    after = args.get('after') or None
+    if after is not None:
+        after = parse_cursor(after, sort)
+
+    return limit, after
+
+def encode_cursor(doc, sort):
+    # Los valores de orden del último documento (con su `_id`), en JSON extendido para no perder ObjectId ni fechas
+    values = [doc.get(field) for field, _ in sort] + [doc['_id']]
+    data = json_util.dumps({"sort": [list(item) for item in sort], "values": values})
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+def parse_cursor(raw, sort=None):
+    if not sort:
+        try:
+            return ObjectId(raw)
+        except (InvalidId, TypeError):
+            raise ValueError("Parámetro 'after' inválido")
+
+    try:
+        data = json_util.loads(base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)))
+        cursor_sort = [(field, direction) for field, direction in data["sort"]]
+        values = data["values"]
+    except Exception:
+        raise ValueError("Parámetro 'after' inválido")
+    if cursor_sort != list(sort) or len(values) != len(sort) + 1:
+        raise ValueError("El cursor 'after' no corresponde al orden pedido en 'sort'")
+    return values
+
+def paginate(collection, limit, after=None, query=None, projection=None, sort=None):
+    """
+    Paginación por keyset: en vez de saltar documentos con skip(), busca a partir
+    del último documento entregado (su `_id`, o sus valores de `sort` más el `_id`),
+    así el costo de cada página es el mismo sin importar qué tan profunda sea.
+    """
+    # Se pide un documento extra solo para saber si hay otra página
+    cursor = collection.find(page_query(after, query, sort), projection).sort(page_sort(sort)).limit(limit + 1)
+    return page_result(list(cursor), limit, sort)
+
+def page_sort(sort=None):
+    # `_id` al final desempata: el orden es total y ninguna página repite ni salta documentos.
+    # Va en el sentido del último campo, así ?sort=-campo recorre al revés el índice (campo, _id)
+    return list(sort or ()) + [('_id', _id_direction(sort))]
+
+def _id_direction(sort):
+    return sort[-1][1] if sort else 1
+
+def page_query(after, query=None, sort=None):
+    query = dict(query or {})
+    if after is None:
+        return query
+    if not sort:
+        query['_id'] = {"$gt": after}
+        return query
+
+    # Documentos que van después de `after` en el orden (f1, f2, ..., _id):
+    # f1 más allá de v1, o f1 = v1 y f2 más allá de v2, ..., o todos iguales y _id más allá
+    *values, last_id = after
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        beyond = _beyond(field, direction, values[i])
+        if beyond is not None:
+            branches.append({**_equal(sort[:i], values), **beyond})
+    branches.append({**_equal(sort, values), '_id': {"$gt" if _id_direction(sort) == 1 else "$lt": last_id}})
+    query.setdefault('$and', []).append({'$or': branches})
+    return query
+
+def _equal(sort, values):
+    return {field: value for (field, _), value in zip(sort, values)}
+
+def _beyond(field, direction, value):
+    # Los nulos (o campos ausentes) van primero en orden ascendente y al final en
+    # descendente, y $gt/$lt nunca los encuentran: se tratan aparte
+    if value is None:
+        return {field: {"$ne": None}} if direction == 1 else None
+    if direction == 1:
+        return {field: {"$gt": value}}
+    return {'$or': [{field: {"$lt": value}}, {field: None}]}
+
+def page_result(docs, limit, sort=None):
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort) if sort else str(docs[-1]['_id'])
+
+    return {"data": docs, "next_cursor": next_cursor}
@@ -0,0 +1,29 @@
+def parse_fields(args, allowed):
+    """
+    Convierte `?fields=name,price,stock` en una lista de campos validada contra
+    la lista permitida de la colección. Devuelve None si no se pidió `fields`.
+    """
+    raw = args.get('fields')
+    if not raw:
+        return None
+
+    fields = []
+    for field in raw.split(','):
+        field = field.strip()
+        if not field or field == '_id':
+            continue
+        if field not in allowed:
+            raise ValueError(f"Campo no permitido: '{field}'")
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+def build_projection(fields, default=None, required=None):
+    # Con `fields` se proyecta solo lo pedido (`_id` siempre viene); sin él se usa la proyección por defecto del modelo
+    if fields:
+        projection = {field: 1 for field in fields}
+        # Campos que se necesitan aunque no se pidan, p. ej. las llaves de ?expand=
+        for field in required or ():
+            projection[field] = 1
+        return projection
+    return dict(default) if default else None
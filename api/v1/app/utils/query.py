@@ -0,0 +1,130 @@
+import math
+from datetime import timedelta
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from app.utils.timeseries import parse_date
+
+# Parámetros de las rutas GET que no son filtros
+RESERVED = ('id', 'ids', 'fields', 'expand', 'limit', 'after', 'stream', 'sort', 'q')
+
+# Sufijos de los filtros según el tipo del campo y su operador ('' es el campo tal cual)
+OPERATORS = {
+    'id': {'': '$in'},
+    'string': {'': '$in'},
+    'number': {'': '$eq', '_gte': '$gte', '_gt': '$gt', '_lte': '$lte', '_lt': '$lt'},
+    'date': {'_from': '$gte', '_to': '$lte'},
+}
+
+MAX_SORT_FIELDS = 3
+MAX_SEARCH_LENGTH = 200
+# Valores por filtro de igualdad (?category=a,b,c)
+MAX_VALUES = 100
+
+def _filter_params(filters):
+    # {parámetro: (campo, tipo, operador)}, p. ej. price_gte -> ('price', 'number', '$gte')
+    params = {}
+    for field, kind in filters.items():
+        for suffix, operator in OPERATORS[kind].items():
+            params[field + suffix] = (field, kind, operator)
+    return params
+
+def _parse_value(kind, name, raw):
+    if kind == 'id':
+        try:
+            return ObjectId(raw)
+        except (InvalidId, TypeError):
+            raise ValueError(f"Id inválido en '{name}': '{raw}'")
+    if kind == 'number':
+        try:
+            value = float(raw)
+        except ValueError:
+            value = math.nan
+        if not math.isfinite(value):
+            raise ValueError(f"Parámetro '{name}' inválido, debe ser un número")
+        return value
+    return raw
+
+def parse_filters(args, filters, search=False):
+    """
+    Convierte la query string en un filtro de MongoDB usando la lista de filtros
+    permitidos del modelo ({campo: tipo}):
+
+        ?brand_id=<id>,<id>  ?category=shoes  ?price_gte=50&price_lt=100
+        ?sale_date_from=2025-01-01&sale_date_to=2025-01-31  ?q=air max
+
+    `q` busca con el índice de texto de la colección (solo si `search`). Cualquier
+    otro parámetro que no sea un filtro permitido ni uno de RESERVED es un error.
+    """
+    params = _filter_params(filters)
+    query = {}
+    for name in args:
+        if name in RESERVED:
+            continue
+        if name not in params:
+            raise ValueError(f"Filtro no permitido: '{name}'")
+        field, kind, operator = params[name]
+        raw = args.get(name)
+
+        if operator == '$in':
+            values = [_parse_value(kind, name, value.strip()) for value in raw.split(',') if value.strip()]
+            if not values:
+                raise ValueError(f"Parámetro '{name}' vacío")
+            if len(values) > MAX_VALUES:
+                raise ValueError(f"Máximo {MAX_VALUES} valores en '{name}'")
+            condition = {'$in': values} if len(values) > 1 else {'$eq': values[0]}
+        elif kind == 'date':
+            value = parse_date(raw, name)
+            # Igual que `to` en los reportes: una fecha sola incluye el día completo
+            if operator == '$lte' and len(raw) == 10:
+                condition = {'$lt': value + timedelta(days=1)}
+            else:
+                condition = {operator: value}
+        else:
+            condition = {operator: _parse_value(kind, name, raw)}
+
+        query.setdefault(field, {}).update(condition)
+
+    text = (args.get('q') or '').strip()
+    if text:
+        if not search:
+            raise ValueError("Esta colección no admite búsqueda con 'q'")
+        if len(text) > MAX_SEARCH_LENGTH:
+            raise ValueError(f"'q' no puede tener más de {MAX_SEARCH_LENGTH} caracteres")
+        query['$text'] = {'$search': text}
+
+    # {campo: {'$eq': v}} -> {campo: v}, que es como se escribe normalmente
+    return {
+        field: condition['$eq'] if isinstance(condition, dict) and list(condition) == ['$eq'] else condition
+        for field, condition in query.items()
+    }
+
+def parse_sort(args, allowed):
+    """
+    Lee `?sort=-price,name` como [(campo, dirección)] validado contra los campos
+    ordenables del modelo. Devuelve None si no se pidió.
+    """
+    raw = args.get('sort')
+    if not raw:
+        return None
+
+    sort = []
+    for item in raw.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        direction = -1 if item.startswith('-') else 1
+        field = item.lstrip('+-')
+        if field not in allowed:
+            raise ValueError(f"No se puede ordenar por '{field}'")
+        if any(field == existing for existing, _ in sort):
+            raise ValueError(f"Campo repetido en 'sort': '{field}'")
+        sort.append((field, direction))
+
+    if not sort:
+        raise ValueError("Parámetro 'sort' vacío")
+    if len(sort) > MAX_SORT_FIELDS:
+        raise ValueError(f"Máximo {MAX_SORT_FIELDS} campos en 'sort'")
+    return sort
+
+def sort_fields(sort):
+    return [field for field, _ in sort or ()]
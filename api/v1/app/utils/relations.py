@@ -0,0 +1,113 @@
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from app.utils.pagination import MAX_LIMIT
+
+def parse_ids(args):
+    """Lee `?ids=a,b,c` como lista de ObjectId. Devuelve None si no se pidió."""
+    raw = args.get('ids')
+    if raw is None:
+        return None
+
+    ids = []
+    for value in raw.split(','):
+        value = value.strip()
+        if not value:
+            continue
+        try:
+            oid = ObjectId(value)
+        except InvalidId:
+            raise ValueError(f"Id inválido: '{value}'")
+        if oid not in ids:
+            ids.append(oid)
+
+    if not ids:
+        raise ValueError("Parámetro 'ids' vacío")
+    if len(ids) > MAX_LIMIT:
+        raise ValueError(f"Máximo {MAX_LIMIT} ids por consulta")
+    return ids
+
+def parse_expand(args, relations):
+    raw = args.get('expand')
+    if not raw:
+        return None
+
+    fields = []
+    for field in raw.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in relations:
+            raise ValueError(f"Relación no expandible: '{field}'")
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+def expanded_key(field):
+    # product_id -> product
+    return field[:-3] if field.endswith('_id') else field
+
+def _as_object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+def coerce_ids(data, fields):
+    """
+    Las referencias (`fields`, p. ej. las llaves de RELATIONS) llegan del JSON como
+    texto; se guardan como ObjectId, igual que el _id al que apuntan, para que los
+    filtros por id, los reportes y el stock las encuentren.
+    """
+    if not isinstance(data, dict):
+        return data
+    for field in fields:
+        value = data.get(field)
+        if isinstance(value, str):
+            oid = _as_object_id(value)
+            if oid is not None:
+                data[field] = oid
+    return data
+
+def expand_relations(db, docs, relations, fields):
+    """
+    Resuelve las referencias pedidas en `fields` con una sola consulta `$in`
+    por relación (no una por documento) y agrega el documento relacionado
+    junto a la llave, p. ej. `product_id` -> `product`.
+    """
+    if not fields or not docs:
+        return docs
+
+    for field in fields:
+        collection, projection = relations[field]
+        ids = relation_ids(docs, field)
+
+        related = {}
+        if ids:
+            for rel in db[collection].find({"_id": {"$in": ids}}, projection):
+                related[str(rel['_id'])] = rel
+
+        attach_related(docs, field, related)
+
+    return docs
+
+def relation_ids(docs, field):
+    # Ids distintos (y válidos) de la referencia `field` en los documentos
+    ids = set()
+    for doc in docs:
+        oid = _as_object_id(doc.get(field))
+        if oid is not None:
+            ids.add(oid)
+    return list(ids)
+
+def attach_related(docs, field, related):
+    key = expanded_key(field)
+    for doc in docs:
+        value = doc.get(field)
+        doc[key] = related.get(str(value)) if value is not None else None
+
+def order_by_ids(docs, ids):
+    # Devuelve los documentos en el mismo orden en que se pidieron los ids
+    by_id = {doc['_id']: doc for doc in docs}
+    return [by_id[oid] for oid in ids if oid in by_id]
@@ -0,0 +1,47 @@
+from flask import Response, current_app, stream_with_context
+from app.utils.pagination import page_query, page_sort
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Documentos por lote: es el batch_size del cursor y también cuántas líneas se juntan por chunk HTTP
+STREAM_BATCH_SIZE = 1000
+
+def wants_stream(request):
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def open_cursor(collection, after=None, projection=None, query=None, sort=None):
+    # Orden por `_id` (salvo ?sort=) para que un cliente pueda retomar un stream cortado con ?after=<último _id>
+    cursor = collection.find(page_query(after, query, sort), projection).sort(page_sort(sort))
+    return cursor.batch_size(STREAM_BATCH_SIZE)
+
+def stream_ndjson(cursor, transform=None):
+    """
+    Responde un documento JSON por línea mientras se recorre el cursor,
+    así la memoria usada no depende del tamaño de la colección.
+    `transform` recibe cada lote antes de serializarlo (p. ej. para ?expand=).
+    """
+    dumps = current_app.json.dumps_bytes
+
+    def encode(batch):
+        if transform:
+            transform(batch)
+        return b'\n'.join(dumps(doc) for doc in batch) + b'\n'
+
+    def generate():
+        try:
+            batch = []
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    yield encode(batch)
+                    batch = []
+            if batch:
+                yield encode(batch)
+        finally:
+            # Si el cliente se desconecta, Werkzeug cierra el generador y aquí se libera el cursor en el servidor
+            cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
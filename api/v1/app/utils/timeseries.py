@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+
+BUCKETS = ('day', 'week', 'month')
+GROUP_BY = ('product', 'brand')
+# Límite de puntos por serie, para que un rango enorme no genere millones de ceros
+MAX_BUCKETS = 1000
+
+def to_datetime(value):
+    """
+    Convierte `YYYY-MM-DD` o una fecha ISO (con `Z` u offset) a datetime en UTC sin
+    zona, que es como pymongo devuelve las fechas guardadas. Lanza ValueError.
+    """
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    result = datetime.fromisoformat(value)
+    if result.tzinfo is not None:
+        result = result.astimezone(timezone.utc).replace(tzinfo=None)
+    return result
+
+def parse_date(value, name):
+    """Lee un parámetro de fecha de la query string. Lanza ValueError si no es válido."""
+    try:
+        return to_datetime(value)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Parámetro '{name}' inválido, use YYYY-MM-DD")
+
+def parse_timeseries_args(args):
+    """
+    Lee `from`, `to`, `bucket` y `group_by`. El rango es [from, to]: si `to` es
+    solo una fecha incluye el día completo. Devuelve (start, end, bucket, group_by)
+    con `end` exclusivo.
+    """
+    raw_from = args.get('from')
+    raw_to = args.get('to')
+    if not raw_from or not raw_to:
+        raise ValueError("Los parámetros 'from' y 'to' son obligatorios")
+
+    start = parse_date(raw_from, 'from')
+    end = parse_date(raw_to, 'to')
+    if len(raw_to) == 10:
+        end += timedelta(days=1)
+    if end <= start:
+        raise ValueError("'to' debe ser posterior a 'from'")
+
+    bucket = args.get('bucket') or 'day'
+    if bucket not in BUCKETS:
+        raise ValueError(f"'bucket' debe ser uno de: {', '.join(BUCKETS)}")
+
+    group_by = args.get('group_by') or None
+    if group_by is not None and group_by not in GROUP_BY:
+        raise ValueError(f"'group_by' debe ser uno de: {', '.join(GROUP_BY)}")
+
+    if len(bucket_starts(start, end, bucket)) > MAX_BUCKETS:
+        raise ValueError(f"El rango no puede tener más de {MAX_BUCKETS} intervalos")
+
+    return start, end, bucket, group_by
+
+def truncate(value, bucket):
+    # Igual que $dateTrunc (UTC, semanas que empiezan el lunes)
+    day = datetime(value.year, value.month, value.day)
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(value, bucket):
+    if bucket == 'week':
+        return value + timedelta(days=7)
+    if bucket == 'month':
+        return value.replace(year=value.year + value.month // 12, month=value.month % 12 + 1)
+    return value + timedelta(days=1)
+
+def bucket_starts(start, end, bucket):
+    """Inicio de cada intervalo que toca el rango [start, end)."""
+    starts = []
+    current = truncate(start, bucket)
+    while current < end and len(starts) <= MAX_BUCKETS:
+        starts.append(current)
+        current = next_bucket(current, bucket)
+    return starts
+
+def date_trunc(field, bucket):
+    spec = {"date": field, "unit": bucket}
+    if bucket == 'week':
+        spec["startOfWeek"] = "monday"
+    return {"$dateTrunc": spec}
+
+def densify(rows, starts):
+    """
+    Convierte filas {_id: {bucket, key}, quantity, total, count} en series densas:
+    {key: {"quantity": [...], "total": [...], "count": [...]}} alineadas con `starts`,
+    con 0 en los intervalos sin ventas.
+    """
+    position = {start: i for i, start in enumerate(starts)}
+    series = {}
+    for row in rows:
+        i = position.get(row['_id']['bucket'])
+        if i is None:
+            continue
+        key = row['_id'].get('key')
+        if key not in series:
+            series[key] = {field: [0] * len(starts) for field in ('quantity', 'total', 'count')}
+        for field in ('quantity', 'total', 'count'):
+            series[key][field][i] += row[field]
+    return series
@@ -0,0 +1,93 @@
+import threading
+import time
+from bson.objectid import ObjectId
+from app.signals import collection_changed
+
+# Contador de versión por colección: {_id: colección, version, epoch}. Cada escritura
+# de los modelos (y de database/clothing_db.py) hace $inc de `version`; `epoch` se fija
+# al crear el documento, así un contador que vuelve a empezar (p. ej. si se borra esta
+# colección) no repite versiones ya vistas. Las ETags de las rutas GET salen de aquí.
+# `inserts` cuenta cuántas de esas versiones solo agregaron documentos: si entre dos
+# lecturas subió lo mismo que `version`, basta con leer lo nuevo (ver app/columnar.py).
+# VersionMirror guarda en cada proceso las últimas versiones leídas (ETAG_VERSIONS_TTL).
+VERSIONS = "collection_versions"
+
+def increments(insert=False):
+    return {"version": 1, "inserts": 1} if insert else {"version": 1}
+
+def bump(db, collection, insert=False):
+    db[VERSIONS].update_one(
+        {"_id": collection},
+        {"$inc": increments(insert), "$setOnInsert": {"epoch": ObjectId()}},
+        upsert=True
+    )
+
+def read_result(docs, names):
+    # Una colección sin escrituras todavía no tiene documento: versión 0
+    found = {doc["_id"]: (str(doc.get("epoch")), doc.get("version", 0)) for doc in docs}
+    return {name: found.get(name, (None, 0)) for name in names}
+
+def read(db, names):
+    return read_result(db[VERSIONS].find({"_id": {"$in": list(names)}}), names)
+
+class VersionMirror:
+    """
+    Copia en memoria (por proceso) de las versiones leídas, para no consultar
+    MongoDB en cada GET. Las escrituras de este proceso la invalidan al momento;
+    las de otros procesos se ven cuando vence el TTL (0 lo desactiva).
+    """
+
+    def __init__(self, ttl=1):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Cambia con cada invalidación: una lectura que empezó antes no debe guardarse
+        self._generation = 0
+
+    def configure(self, ttl):
+        with self._lock:
+            self.ttl = ttl
+            self._entries.clear()
+
+    def get(self, names):
+        """Devuelve (versiones en memoria, colecciones que faltan, generación)."""
+        now = time.monotonic()
+        values, missing = {}, []
+        with self._lock:
+            for name in names:
+                entry = self._entries.get(name)
+                if entry is not None and entry[0] > now:
+                    values[name] = entry[1]
+                else:
+                    missing.append(name)
+            return values, missing, self._generation
+
+    def put(self, values, generation):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            expires_at = time.monotonic() + self.ttl
+            for name, value in values.items():
+                self._entries[name] = (expires_at, value)
+
+    def invalidate(self, collection):
+        with self._lock:
+            self._entries.pop(collection, None)
+            self._generation += 1
+
+version_mirror = VersionMirror()
+
+def current(db, names):
+    """Versiones actuales de `names`: de la copia en memoria y, las que falten, de MongoDB."""
+    values, missing, generation = version_mirror.get(names)
+    if missing:
+        loaded = read(db, missing)
+        version_mirror.put(loaded, generation)
+        values.update(loaded)
+    return values
+
+@collection_changed.connect
+def _invalidate_versions(collection, **kwargs):
+    version_mirror.invalidate(collection)
@@ -0,0 +1,40 @@
+"""
+App ASGI: las mismas rutas que `create_app()` servidas por Quart sobre
+AsyncMongoClient (ver app/aio). Cada worker atiende todas sus peticiones
+en un solo event loop.
+
+    python api/v1/asgi.py
+    python api/v1/asgi.py --workers 4 --bind 0.0.0.0:8000
+    cd api/v1 && hypercorn asgi:app --workers 4 --bind 0.0.0.0:8000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.aio.index import create_asgi_app
+
+app = create_asgi_app()
+
+def main():
+    from hypercorn.config import Config
+    from hypercorn.run import run
+
+    parser = argparse.ArgumentParser(description="Servidor ASGI de la API (hypercorn).")
+    parser.add_argument("--bind", default=os.getenv("ASGI_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}"),
+                        help="Dirección (por defecto ASGI_BIND o 0.0.0.0:$PORT).")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Procesos, cada uno con su event loop y su AsyncMongoClient (por defecto WEB_CONCURRENCY o 1).")
+    args = parser.parse_args()
+
+    config = Config()
+    config.bind = [args.bind]
+    config.workers = args.workers
+    config.keep_alive_timeout = float(os.getenv("ASGI_KEEPALIVE", "5"))
+    # Cada worker importa este archivo y crea su propia app (y su propio cliente)
+    config.application_path = f"{os.path.abspath(__file__)}:app"
+    run(config)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Benchmark de la API: siembra la base a varias escalas y recorre todas las rutas
+registradas en `create_app()` (CRUD de las cinco colecciones y los reportes) con
+el cliente de pruebas de Flask. Mide latencia p50/p95/p99 y rendimiento por ruta.
+
+    python api/v1/benchmarks/bench_api.py --sizes 1000 10000 100000 --output actual.json
+    python api/v1/benchmarks/bench_api.py --compare base.json --threshold 0.2
+
+Por defecto usa la base `--db` del servidor de MONGO_URI (la borra y la vuelve a
+sembrar). Con `--backend mongomock` corre todo en memoria; las etapas que mongomock
+no implementa se reportan como errores de la ruta, no detienen el benchmark.
+
+Con `--compare` sale con código 1 si algún reporte es más lento que la base
+(según `--metric`) por más del `--threshold` indicado.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "..", "database"))
+
+os.environ.setdefault("MONGO_INDEX_CHECK", "off")
+
+import generator
+
+PREFIX = "/clothing/api/v1"
+COLLECTIONS = ("brands", "products", "users", "sales", "reviews")
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms")
+
+def percentile(values, fraction):
+    # Rango más cercano sobre los valores ordenados
+    if not values:
+        return None
+    index = max(0, math.ceil(fraction * len(values)) - 1)
+    return values[index]
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+def payload(collection, rng, counts, seed):
+    """Documento nuevo para POST; las referencias apuntan a documentos sembrados."""
+    ref = lambda kind: str(generator.object_id(kind, seed, rng.randrange(counts[kind])))
+    if collection == "brands":
+        return {"name": f"Bench {rng.random()}", "country": "USA"}
+    if collection == "products":
+        return {"name": f"Bench {rng.random()}", "brand_id": ref("brands"), "price": 99.9, "stock": 10}
+    if collection == "users":
+        return {"username": f"bench{rng.random()}", "email": "bench@example.com", "password": "x", "role": "customer"}
+    if collection == "sales":
+        return {"product_id": ref("products"), "user_id": ref("users"), "sale_date": "2025-07-10", "quantity": 2, "total": 199.8}
+    return {"product_id": ref("products"), "user_id": ref("users"), "rating": 4, "comment": "bench"}
+
+# Operaciones de cada petición a /<colección>/bulk: inserts nuevos, y updates y deletes
+# de documentos creados por peticiones anteriores (la primera solo inserta)
+BULK_INSERTS = 10
+BULK_UPDATES = 5
+BULK_DELETES = 5
+
+def bulk_body(collection, rng, counts, seed, created):
+    body = [{"op": "insert", "data": payload(collection, rng, counts, seed)} for _ in range(BULK_INSERTS)]
+    ids = created[collection]
+    if ids:
+        body += [{"op": "update", "id": rng.choice(ids), "data": {"bench": rng.random()}} for _ in range(BULK_UPDATES)]
+    body += [{"op": "delete", "id": ids.pop()} for _ in range(min(BULK_DELETES, len(ids)))]
+    return body
+
+def scenarios(counts, seed, rng):
+    """
+    [(nombre, método, ruta, función que arma la petición)]. Los POST (también los de /bulk)
+    guardan los ids creados para que los PUT, DELETE y las operaciones de /bulk trabajen
+    sobre esos documentos y no sobre los sembrados.
+    """
+    created = {collection: [] for collection in COLLECTIONS}
+    # Si los POST fallaron no hay qué modificar ni eliminar: se usa un id inexistente y cuenta como error
+    missing = "000000000000000000000000"
+    plan = []
+    # Listado completo sin paginar solo en las colecciones chicas (en ventas sería medir el tamaño de la respuesta)
+    for collection in ("brands", "products"):
+        plan.append((f"{collection}.all", "GET", f"{PREFIX}/{collection}", lambda: {}))
+    for collection in COLLECTIONS:
+        path = f"{PREFIX}/{collection}"
+        existing = lambda c=collection: str(generator.object_id(c, seed, rng.randrange(counts[c])))
+        plan += [
+            (f"{collection}.page", "GET", path, lambda: {"query_string": {"limit": 50}}),
+            (f"{collection}.by_id", "GET", path, lambda e=existing: {"query_string": {"id": e()}}),
+            (f"{collection}.ids", "GET", path,
+             lambda e=existing: {"query_string": {"ids": ",".join(e() for _ in range(20))}}),
+            (f"{collection}.create", "POST", path, lambda c=collection: {"json": payload(c, rng, counts, seed)}),
+            (f"{collection}.update", "PUT", path,
+             lambda c=collection: {"query_string": {"id": rng.choice(created[c]) if created[c] else missing}, "json": {"bench": rng.random()}}),
+            (f"{collection}.delete", "DELETE", path,
+             lambda c=collection: {"query_string": {"id": created[c].pop() if created[c] else missing}}),
+        ]
+        for name, ordered in (("bulk", "true"), ("bulk_unordered", "false")):
+            plan.append((f"{collection}.{name}", "POST", f"{path}/bulk",
+                         lambda c=collection, o=ordered: {"query_string": {"ordered": o},
+                                                          "json": bulk_body(c, rng, counts, seed, created)}))
+    reports = {
+        "brands-with-sales": None,
+        "products-stock": None,
+        "top-brands": None,
+        "top-users": None,
+        "product-ratings": None,
+        "sales-timeseries": {"from": "2025-01-01", "to": "2025-12-31", "bucket": "week", "group_by": "brand"},
+        "dashboard": None,
+        "cache-stats": None,
+    }
+    for name, query in reports.items():
+        plan.append((f"reports.{name}", "GET", f"{PREFIX}/reports/{name}", lambda q=query: {"query_string": q or {}}))
+    plan.append(("metrics", "GET", "/metrics", lambda: {}))
+    return plan, created
+
+def run_scenario(client, method, path, build, requests, created, name):
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        options = build()
+        begin = time.perf_counter()
+        response = client.open(path, method=method, **options)
+        latencies.append(time.perf_counter() - begin)
+        body = response.get_json(silent=True) if method == "POST" else None
+        body = body if isinstance(body, dict) else {}
+        # /bulk responde 200 aunque fallen operaciones: cuentan como error de la petición
+        if response.status_code >= 400 or body.get("failed"):
+            errors += 1
+        if method != "POST" or response.status_code >= 400:
+            continue
+        collection = name.split(".")[0]
+        if "results" in body:
+            created[collection] += [item["inserted_id"] for item in body["results"] if item["status"] == 201]
+        else:
+            created[collection].append(body["inserted_id"])
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+def uncovered_routes(app, plan):
+    # Rutas registradas que el plan no recorre, para que una ruta nueva no quede fuera sin aviso
+    covered = {(method, path) for _, method, path, _ in plan}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == "static":
+            continue
+        for method in rule.methods - {"HEAD", "OPTIONS"}:
+            if (method, rule.rule) not in covered:
+                missing.append(f"{method} {rule.rule}")
+    return sorted(missing)
+
+def seed_database(db, counts, seed, backend):
+    from app.indexes import create_indexes
+    from app import rollups, stock
+
+    for collection in generator.FACTORIES:
+        db[collection].drop()
+    db[rollups.META].drop()
+
+    if backend == "mongod":
+        generator.load(os.getenv("MONGO_URI"), db.name, counts, seed=seed, report=None)
+    else:
+        generator.load_into(db, counts, seed=seed, report=None)
+
+    create_indexes(db)
+    # mongomock no implementa todas las etapas ni el `sort` que pymongo pasa a UpdateOne en
+    # bulk_write; sin totales ni contadores de stock los reportes usan `sales` directamente
+    for name, build in (("contadores de stock", stock.backfill), ("totales de ventas", rollups.rebuild)):
+        try:
+            build(db)
+        except Exception as e:
+            if backend != "mongomock":
+                raise
+            print(f"   (sin {name}: {e})")
+
+def run(args):
+    if args.backend == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--backend mongomock requiere 'pip install mongomock'")
+        os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/" + args.db)
+
+    if not args.cache:
+        os.environ["REPORTS_CACHE_TTL"] = "0"
+
+    from app.index import create_app, mongo
+    app = create_app()
+    if args.backend == "mongomock":
+        mongo.cx = mongomock.MongoClient()
+    mongo.db = mongo.cx[args.db]
+    client = app.test_client()
+
+    results = {
+        "meta": {
+            "backend": args.backend,
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "requests": args.requests,
+            "report_requests": args.report_requests,
+            "cache": args.cache,
+        },
+        "sizes": {},
+    }
+
+    for size in args.sizes:
+        counts = generator.scale(size)
+        print(f"\n== {size} ventas: sembrando...")
+        seed_database(mongo.db, counts, args.seed, args.backend)
+
+        rng = random.Random(args.seed)
+        plan, created = scenarios(counts, args.seed, rng)
+        for route in uncovered_routes(app, plan):
+            print(f"   (ruta sin escenario: {route})")
+
+        rows = {}
+        print(f"{'ruta':<28}{'n':>6}{'err':>5}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>10}")
+        for name, method, path, build in plan:
+            requests = args.report_requests if name.startswith("reports.") else args.requests
+            # Una petición de calentamiento (sin medir) para que la primera no incluya inicializaciones
+            if not name.endswith((".create", ".update", ".delete", ".bulk", ".bulk_unordered")):
+                client.open(path, method=method, **build())
+            row = run_scenario(client, method, path, build, requests, created, name)
+            rows[name] = row
+            print(f"{name:<28}{row['requests']:>6}{row['errors']:>5}"
+                  f"{row['p50_ms']:>8.1f}ms{row['p95_ms']:>8.1f}ms{row['p99_ms']:>8.1f}ms{row['rps']:>10.1f}")
+        results["sizes"][str(size)] = rows
+
+    mongo.cx.drop_database(args.db)
+    return results
+
+def compare(baseline, current, threshold, metric, scope):
+    """Devuelve [(escala, ruta, base, actual, cambio)] de las rutas más lentas que la base."""
+    regressions = []
+    print(f"\n{'escala':<10}{'ruta':<28}{'base':>12}{'actual':>12}{'cambio':>10}")
+    for size, rows in current["sizes"].items():
+        for name, row in rows.items():
+            if scope == "reports" and not name.startswith("reports."):
+                continue
+            base_row = baseline.get("sizes", {}).get(size, {}).get(name, {})
+            before = base_row.get(metric)
+            after = row.get(metric)
+            if not before or after is None:
+                continue
+            # Una ruta que falla responde rápido: su latencia no se compara
+            if row.get("errors") or base_row.get("errors"):
+                print(f"{size:<10}{name:<28}{'(con errores, no se compara)':>34}")
+                continue
+            change = after / before - 1
+            flag = " <-" if change > threshold else ""
+            print(f"{size:<10}{name:<28}{before:>10.1f}ms{after:>10.1f}ms{change:>+9.0%}{flag}")
+            if change > threshold:
+                regressions.append((size, name, before, after, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia de todas las rutas de la API.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Cantidades de ventas a sembrar.")
+    parser.add_argument("--backend", choices=("mongod", "mongomock"), default="mongod",
+                        help="mongod: servidor de MONGO_URI | mongomock: en memoria, sin servidor.")
+    parser.add_argument("--db", default="clothing_bench", help="Base de datos de pruebas (se borra).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por ruta CRUD.")
+    parser.add_argument("--report-requests", type=int, default=20, help="Peticiones por reporte.")
+    parser.add_argument("--cache", action="store_true", help="Deja activa la caché de reportes (por defecto se mide sin caché).")
+    parser.add_argument("--output", help="Guarda los resultados en este archivo JSON.")
+    parser.add_argument("--input", help="No ejecuta el benchmark: usa resultados guardados (para comparar dos corridas).")
+    parser.add_argument("--compare", help="Resultados base (JSON) contra los que comparar.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Aumento tolerado antes de fallar (0.2 = 20%%).")
+    parser.add_argument("--metric", choices=METRICS, default="p95_ms", help="Métrica a comparar.")
+    parser.add_argument("--scope", choices=("reports", "all"), default="reports", help="Rutas que pueden fallar la comparación.")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            results = json.load(f)
+    else:
+        results = run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold, args.metric, args.scope)
+        if regressions:
+            print(f"\n{len(regressions)} rutas más lentas que la base por más de {args.threshold:.0%} ({args.metric}).")
+            sys.exit(1)
+        print("\nSin regresiones.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Compara la API de Flask (gunicorn, serve.py) con la app ASGI (hypercorn, asgi.py)
+con muchas peticiones concurrentes de reportes y listados.
+
+    python api/v1/benchmarks/bench_async.py --concurrency 10 100 1000 --requests 5000
+    python api/v1/benchmarks/bench_async.py --workers 1 --threads 8 --output async.json
+
+Levanta los dos servidores contra la base de MONGO_URI tal cual está (para datos
+a escala primero `python database/clothing_db.py seed --sales 100000`). Para cada
+nivel de concurrencia abre esa cantidad de conexiones keep-alive que piden las
+rutas en ronda hasta completar `--requests`. Los dos servidores usan los mismos
+procesos (`--workers`); la app de Flask además `--threads` hilos por proceso.
+
+Necesita un mongod: AsyncMongoClient no funciona con mongomock.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bench_api import PREFIX, summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API = os.path.join(HERE, "..")
+
+PATHS = [
+    "/reports/brands-with-sales",
+    "/reports/top-brands",
+    "/reports/top-users",
+    "/reports/product-ratings",
+    "/reports/sales-timeseries?from=2025-01-01&to=2025-12-31&bucket=week",
+    "/reports/dashboard",
+    "/brands",
+    "/products?limit=50",
+    "/sales?limit=50&expand=product_id",
+    "/users?limit=50",
+]
+
+def server_command(kind, port, args):
+    bind = f"127.0.0.1:{port}"
+    if kind == "flask":
+        return [sys.executable, os.path.join(API, "serve.py"), "--bind", bind,
+                "--workers", str(args.workers), "--threads", str(args.threads)]
+    return [sys.executable, os.path.join(API, "asgi.py"), "--bind", bind, "--workers", str(args.workers)]
+
+def start_server(kind, port, args):
+    env = dict(os.environ)
+    # Sin log de acceso (serían miles de líneas) y, salvo --cache, sin caché de reportes
+    env["LOG_SAMPLE_RATE"] = "0"
+    env.setdefault("MONGO_INDEX_CHECK", "off")
+    if not args.cache:
+        env["REPORTS_CACHE_TTL"] = "0"
+    process = subprocess.Popen(server_command(kind, port, args), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor {kind} terminó al arrancar (código {process.returncode})")
+        try:
+            status = asyncio.run(fetch_once("127.0.0.1", port, "/metrics"))
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"El servidor {kind} no respondió en 30 s")
+
+async def read_response(reader):
+    """Lee una respuesta HTTP/1.1 (Content-Length o chunked) y devuelve el código de estado."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("conexión cerrada")
+    status = int(status_line.split()[1])
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status
+
+async def fetch_once(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        return await read_response(reader)
+    finally:
+        writer.close()
+
+async def client(host, port, paths, offset, budget, latencies, errors):
+    """Una conexión keep-alive: pide las rutas en ronda mientras queden peticiones en `budget`."""
+    reader = writer = None
+    i = offset
+    while budget[0] > 0:
+        budget[0] -= 1
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET {PREFIX}{path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            status = await read_response(reader)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            errors[0] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        latencies.append(time.perf_counter() - started)
+        if status >= 400:
+            errors[0] += 1
+    if writer is not None:
+        writer.close()
+
+async def load(port, concurrency, requests, paths):
+    latencies, errors, budget = [], [0], [requests]
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client("127.0.0.1", port, paths, i, budget, latencies, errors) for i in range(concurrency)
+    ))
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+def run(args):
+    results = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workers": args.workers,
+            "threads": args.threads,
+            "requests": args.requests,
+            "cache": args.cache,
+            "paths": PATHS,
+        },
+        "servers": {},
+    }
+
+    print(f"{'servidor':<10}{'conc.':>7}{'n':>8}{'err':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>10}")
+    for kind, port in (("flask", args.port), ("asgi", args.port + 1)):
+        process = start_server(kind, port, args)
+        rows = {}
+        try:
+            # Calentamiento (sin medir): abre conexiones del pool y carga el código de cada ruta
+            asyncio.run(load(port, min(10, max(args.concurrency)), len(PATHS) * 10, PATHS))
+            for concurrency in args.concurrency:
+                row = asyncio.run(load(port, concurrency, args.requests, PATHS))
+                rows[str(concurrency)] = row
+                print(f"{kind:<10}{concurrency:>7}{row['requests']:>8}{row['errors']:>7}"
+                      + "".join(f"{row[m]:>8.1f}ms" if row[m] is not None else f"{'-':>10}" for m in ("p50_ms", "p95_ms", "p99_ms"))
+                      + f"{row['rps'] or 0:>10.1f}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        results["servers"][kind] = rows
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Flask (gunicorn) contra ASGI (hypercorn) con muchas peticiones concurrentes.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 1000], help="Conexiones simultáneas.")
+    parser.add_argument("--requests", type=int, default=5000, help="Peticiones por nivel de concurrencia.")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos de cada servidor.")
+    parser.add_argument("--threads", type=int, default=8, help="Hilos por proceso de la app de Flask.")
+    parser.add_argument("--port", type=int, default=8700, help="Puerto de Flask; la app ASGI usa el siguiente.")
+    parser.add_argument("--cache", action="store_true", help="Deja activa la caché de reportes (por defecto se mide sin caché).")
+    parser.add_argument("--output", help="Guarda los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Compara los reportes de `reportsModel` contra los pipelines originales
+(lookup de arreglos completos) sobre un dataset sembrado, y mide los tiempos.
+
+Usa la base indicada en --db del servidor de MONGO_URI (la borra y la vuelve a sembrar):
+
+    python api/v1/benchmarks/compare_reports.py --sizes 10000 100000 1000000
+
+Con NumPy instalado compara también el motor columnar (?engine=columnar).
+
+Sale con código 1 si algún reporte no coincide.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ["REPORTS_CACHE_TTL"] = "0"
+os.environ["MONGO_INDEX_CHECK"] = "off"
+
+from bson.objectid import ObjectId
+from app.index import create_app, mongo
+from app.indexes import create_indexes
+from app.models.reports import reportsModel
+from app import columnar, rollups, stock
+
+# Pipelines tal como estaban antes de reescribir los reportes: (colección, pipeline)
+LEGACY = {
+    "brands_with_sales": ("brands", [
+        {"$lookup": {"from": "products", "localField": "_id", "foreignField": "brand_id", "as": "products"}},
+        {"$unwind": "$products"},
+        {"$lookup": {"from": "sales", "localField": "products._id", "foreignField": "product_id", "as": "sales"}},
+        {"$match": {"sales": {"$ne": []}}},
+        {"$project": {"_id": {"$toString": "$_id"}, "name": 1, "country": 1}},
+        {"$group": {"_id": "$_id", "name": {"$first": "$name"}, "country": {"$first": "$country"}}}
+    ]),
+    "products_sold_and_stock": ("products", [
+        {"$lookup": {"from": "sales", "localField": "_id", "foreignField": "product_id", "as": "sales"}},
+        {"$project": {"_id": {"$toString": "$_id"}, "name": 1, "stock": 1, "sold_quantity": {"$sum": "$sales.quantity"}}}
+    ]),
+    "top_5_brands": ("brands", [
+        {"$lookup": {"from": "products", "localField": "_id", "foreignField": "brand_id", "as": "products"}},
+        {"$unwind": "$products"},
+        {"$lookup": {"from": "sales", "localField": "products._id", "foreignField": "product_id", "as": "sales"}},
+        {"$unwind": "$sales"},
+        {"$group": {"_id": {"$toString": "$_id"}, "brand_name": {"$first": "$name"}, "total_sales": {"$sum": "$sales.quantity"}}},
+        {"$sort": {"total_sales": -1}},
+        {"$limit": 5}
+    ]),
+    "top_users": ("users", [
+        {"$lookup": {"from": "sales", "localField": "_id", "foreignField": "user_id", "as": "sales"}},
+        {"$project": {"_id": {"$toString": "$_id"}, "username": 1, "email": 1, "total_purchases": {"$size": "$sales"}}},
+        {"$sort": {"total_purchases": -1}},
+        {"$limit": 5}
+    ]),
+    "average_ratings": ("products", [
+        {"$lookup": {"from": "reviews", "localField": "_id", "foreignField": "product_id", "as": "reviews"}},
+        {"$project": {"_id": {"$toString": "$_id"}, "name": 1, "avg_rating": {"$avg": "$reviews.rating"}, "total_reviews": {"$size": "$reviews"}}},
+        {"$sort": {"avg_rating": -1}}
+    ]),
+}
+
+# Reportes con $limit: el orden entre empates no está definido, se comparan por valor
+RANKED = {"top_5_brands": "total_sales", "top_users": "total_purchases"}
+
+def seed(db, sales_count, seed_value, chunk=10000):
+    rng = random.Random(seed_value)
+    brands = [{"_id": ObjectId(), "name": f"Brand {i}", "country": rng.choice(["USA", "Germany", "Japan"])} for i in range(50)]
+    products = [
+        {"_id": ObjectId(), "name": f"Product {i}", "brand_id": rng.choice(brands)["_id"],
+         "price": round(rng.uniform(10, 200), 2), "stock": rng.randint(0, 500)}
+        for i in range(max(100, sales_count // 100))
+    ]
+    users = [
+        {"_id": ObjectId(), "username": f"user{i}", "email": f"user{i}@example.com", "role": "customer"}
+        for i in range(max(100, sales_count // 50))
+    ]
+    db.brands.insert_many(brands)
+    db.products.insert_many(products)
+    db.users.insert_many(users)
+
+    start = datetime(2025, 1, 1)
+    reviews = [
+        {"product_id": rng.choice(products)["_id"], "user_id": rng.choice(users)["_id"],
+         "rating": rng.randint(1, 5), "review_date": start + timedelta(days=rng.randint(0, 364))}
+        for _ in range(max(10, sales_count // 10))
+    ]
+    for i in range(0, len(reviews), chunk):
+        db.reviews.insert_many(reviews[i:i + chunk], ordered=False)
+
+    batch = []
+    for _ in range(sales_count):
+        product = rng.choice(products)
+        quantity = rng.randint(1, 5)
+        batch.append({
+            "product_id": product["_id"], "user_id": rng.choice(users)["_id"],
+            "sale_date": start + timedelta(days=rng.randint(0, 364)),
+            "quantity": quantity, "total": round(quantity * product["price"], 2)
+        })
+        if len(batch) == chunk:
+            db.sales.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.sales.insert_many(batch, ordered=False)
+
+def _close(a, b):
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+def _same_doc(a, b):
+    return a.keys() == b.keys() and all(_close(a[key], b[key]) for key in a)
+
+def same_result(name, expected, actual):
+    if name in RANKED:
+        key = RANKED[name]
+        if len(expected) != len(actual):
+            return False
+        if not all(_close(e[key], a[key]) for e, a in zip(expected, actual)):
+            return False
+        # Fuera del último valor (donde puede haber empates) los documentos deben ser los mismos
+        cutoff = expected[-1][key] if expected else None
+        strict_e = sorted((d for d in expected if d[key] != cutoff), key=lambda d: d["_id"])
+        strict_a = sorted((d for d in actual if d[key] != cutoff), key=lambda d: d["_id"])
+        return len(strict_e) == len(strict_a) and all(_same_doc(e, a) for e, a in zip(strict_e, strict_a))
+
+    expected = sorted(expected, key=lambda d: d["_id"])
+    actual = sorted(actual, key=lambda d: d["_id"])
+    return len(expected) == len(actual) and all(_same_doc(e, a) for e, a in zip(expected, actual))
+
+def timed(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def columnar_reports(db):
+    # Las columnas se cargan una vez (una base recién sembrada no tiene versiones); se mide solo el reporte
+    store = columnar.ColumnarStore()
+    started = time.perf_counter()
+    store.refresh(db)
+    print(f"columnar: {store.tables['sales'].size} ventas cargadas en {time.perf_counter() - started:.1f}s")
+    return store
+
+def compare(db, repeat):
+    """Devuelve [(reporte, modo, coincide, segundos_original, segundos_nuevo)]."""
+    rows = []
+    modes = [("pipeline", lambda: db[rollups.META].delete_many({})),
+             ("rollups", lambda: rollups.rebuild(db)),
+             ("stock", lambda: stock.backfill(db))]
+    if columnar.available():
+        modes.append(("columnar", lambda: columnar_reports(db)))
+    for mode, prepare in modes:
+        store = prepare()
+        for name, (collection, pipeline) in LEGACY.items():
+            expected, legacy_time = timed(lambda: list(db[collection].aggregate(pipeline)), repeat)
+            report = getattr(store, name) if mode == "columnar" else getattr(reportsModel, name)
+            actual, new_time = timed(report, repeat)
+            rows.append((name, mode, same_result(name, expected, actual), legacy_time, new_time))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara y mide los reportes contra los pipelines originales.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="Cantidades de ventas a sembrar.")
+    parser.add_argument("--db", default="clothing_bench", help="Base de datos de pruebas (se borra).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Ejecuciones por reporte (se toma la mejor).")
+    args = parser.parse_args()
+
+    create_app()
+    db = mongo.cx[args.db]
+    mongo.db = db
+
+    ok = True
+    for size in args.sizes:
+        mongo.cx.drop_database(args.db)
+        print(f"\n== {size} ventas: sembrando...")
+        seed(db, size, args.seed)
+        create_indexes(db)
+
+        print(f"{'reporte':<26}{'modo':<10}{'igual':<7}{'original':>12}{'nuevo':>12}{'speedup':>10}")
+        for name, mode, same, legacy_time, new_time in compare(db, args.repeat):
+            ok = ok and same
+            speedup = legacy_time / new_time if new_time else float("inf")
+            print(f"{name:<26}{mode:<10}{'sí' if same else 'NO':<7}{legacy_time * 1000:>10.1f}ms{new_time * 1000:>10.1f}ms{speedup:>9.1f}x")
+
+    mongo.cx.drop_database(args.db)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Servidor de producción: corre `create_app()` bajo gunicorn con varios procesos
+(workers) y hilos por proceso.
+
+    python api/v1/serve.py
+    python api/v1/serve.py --workers 8 --threads 4 --bind 0.0.0.0:8000
+
+Cada worker llama a `create_app()` después del fork (sin preload), así cada
+proceso tiene su propio MongoClient y su propio pool. Antes de aceptar
+peticiones, cada worker abre sus conexiones (ver `warm_up` en app/index.py).
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from gunicorn.app.base import BaseApplication
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def post_worker_init(worker):
+    # Se ejecuta en cada worker, ya con la app cargada y antes de su primer request
+    from app.index import warm_up
+    connections = int(os.getenv("MONGO_MIN_POOL_SIZE") or 0) or worker.cfg.threads
+    timeout = float(os.getenv("MONGO_WARMUP_TIMEOUT", "10"))
+
+    # Con un límite de tiempo: si MongoDB no responde el worker arranca igual (y gunicorn no lo mata por inactivo)
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        executor.submit(warm_up, connections).result(timeout=timeout)
+        worker.log.info("Worker %s: %d conexiones a MongoDB listas", worker.pid, connections)
+    except Exception as e:
+        worker.log.warning("Worker %s: no se pudo precalentar MongoDB: %s", worker.pid, e or type(e).__name__)
+    finally:
+        executor.shutdown(wait=False)
+
+def worker_exit(server, worker):
+    # Apagado ordenado del worker: guarda las ventas que quedan en la cola (SALES_QUEUE=on)
+    from app.ingest import sales_queue
+    sales_queue.stop()
+
+def options_from_env():
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+    return {
+        "bind": os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}"),
+        # Un proceso por núcleo; los hilos cubren la espera de E/S contra MongoDB
+        "workers": int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        "threads": threads,
+        "timeout": int(os.getenv("GUNICORN_TIMEOUT", "30")),
+        "graceful_timeout": int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30")),
+        "keepalive": int(os.getenv("GUNICORN_KEEPALIVE", "5")),
+        "accesslog": os.getenv("GUNICORN_ACCESSLOG") or None,
+    }
+
+class Server(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None:
+                self.cfg.set(key, value)
+        # La app (y su MongoClient) se crea en cada worker, nunca en el proceso maestro
+        self.cfg.set("preload_app", False)
+        self.cfg.set("worker_class", "gthread" if self.cfg.threads > 1 else "sync")
+        self.cfg.set("post_worker_init", post_worker_init)
+        self.cfg.set("worker_exit", worker_exit)
+
+    def load(self):
+        from app.index import create_app
+        return create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de producción de la API (gunicorn).")
+    parser.add_argument("--bind", help="Dirección (por defecto GUNICORN_BIND o 0.0.0.0:$PORT).")
+    parser.add_argument("--workers", type=int, help="Procesos (por defecto WEB_CONCURRENCY o uno por núcleo).")
+    parser.add_argument("--threads", type=int, help="Hilos por proceso (por defecto GUNICORN_THREADS o 4).")
+    args = parser.parse_args()
+
+    options = options_from_env()
+    options.update({key: value for key, value in vars(args).items() if value is not None})
+    Server(options).run()
+
+if __name__ == "__main__":
+    main()
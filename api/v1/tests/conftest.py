@@ -0,0 +1,53 @@
+"""
+Fixtures de las pruebas. Las que no necesitan un mongod corren sobre mongomock (en
+memoria); sin `pip install mongomock` se saltean.
+
+    cd api/v1 && python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/clothing_test")
+os.environ.setdefault("MONGO_INDEX_CHECK", "off")
+# Sin caché de reportes y con las versiones leídas en cada GET: cada prueba ve sus escrituras
+os.environ.setdefault("REPORTS_CACHE_TTL", "0")
+os.environ.setdefault("ETAG_VERSIONS_TTL", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+PREFIX = "/clothing/api/v1"
+
+@pytest.fixture(scope="session")
+def app():
+    from app.index import create_app
+    return create_app()
+
+def _accept_update_sort(mongomock):
+    # pymongo 4.9+ pasa `sort` a UpdateOne dentro de bulk_write y mongomock no lo acepta;
+    # los bulk_write de la API no ordenan, así que se descarta
+    builder = mongomock.collection.BulkOperationBuilder
+    if getattr(builder.add_update, "accepts_sort", False):
+        return
+    add_update = builder.add_update
+
+    def patched(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+    patched.accepts_sort = True
+    builder.add_update = patched
+
+@pytest.fixture
+def db(app):
+    """Una base mongomock vacía por prueba, puesta en `mongo` como lo hace bench_api.py."""
+    mongomock = pytest.importorskip("mongomock")
+    _accept_update_sort(mongomock)
+    from app.index import mongo
+    mongo.cx = mongomock.MongoClient()
+    mongo.db = mongo.cx["clothing_test"]
+    yield mongo.db
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
@@ -0,0 +1,58 @@
+"""POST /<colección>/bulk (app/bulk.py)."""
+import pytest
+from bson.objectid import ObjectId
+
+from conftest import PREFIX
+
+@pytest.fixture
+def writes(monkeypatch, db):
+    """Cada bulk_write de la petición: la lista de tipos de operación que lleva."""
+    batches = []
+    collection = type(db.brands)
+    bulk_write = collection.bulk_write
+
+    def recording(self, requests, *args, **kwargs):
+        batches.append([type(request).__name__ for request in requests])
+        return bulk_write(self, requests, *args, **kwargs)
+    monkeypatch.setattr(collection, "bulk_write", recording)
+    return batches
+
+@pytest.mark.parametrize("ordered", ["true", "false"])
+def test_delete_then_insert_same_id(client, db, writes, ordered):
+    brand_id = db.brands.insert_one({"name": "Nike", "country": "USA"}).inserted_id
+    body = [
+        {"op": "delete", "id": str(brand_id)},
+        {"op": "insert", "data": {"_id": str(brand_id), "name": "Nike", "country": "Japan"}},
+    ]
+    response = client.post(f"{PREFIX}/brands/bulk?ordered={ordered}", json=body)
+    assert [item["status"] for item in response.get_json()["results"]] == [200, 201]
+    assert db.brands.find_one({"_id": brand_id})["country"] == "Japan"
+    if ordered == "false":
+        # Sin orden MongoDB haría el insert antes que el delete: van en bulk_write distintos
+        assert writes == [["DeleteOne"], ["InsertOne"]]
+    else:
+        assert writes == [["DeleteOne", "InsertOne"]]
+
+def test_unordered_keeps_independent_operations_together(client, db, writes):
+    ids = [db.brands.insert_one({"name": f"Marca {i}"}).inserted_id for i in range(2)]
+    body = [
+        {"op": "update", "id": str(ids[0]), "data": {"country": "USA"}},
+        {"op": "delete", "id": str(ids[1])},
+        {"op": "insert", "data": {"name": "Nueva"}},
+    ]
+    response = client.post(f"{PREFIX}/brands/bulk?ordered=false", json=body)
+    assert response.get_json()["failed"] == 0
+    assert writes == [["UpdateOne", "DeleteOne", "InsertOne"]]
+
+def test_unordered_update_then_insert_same_id(client, db, writes):
+    brand_id = ObjectId()
+    db.brands.insert_one({"_id": brand_id, "name": "Adidas"})
+    body = [
+        {"op": "update", "id": str(brand_id), "data": {"country": "Germany"}},
+        {"op": "insert", "data": {"_id": str(brand_id), "name": "Duplicada"}},
+    ]
+    response = client.post(f"{PREFIX}/brands/bulk?ordered=false", json=body)
+    statuses = [item["status"] for item in response.get_json()["results"]]
+    assert statuses == [200, 400]
+    assert db.brands.find_one({"_id": brand_id}) == {"_id": brand_id, "name": "Adidas", "country": "Germany"}
+    assert writes == [["UpdateOne"], ["InsertOne"]]
@@ -0,0 +1,52 @@
+"""
+Los reportes reescritos deben dar lo mismo que los pipelines originales
+(benchmarks/compare_reports.py). Necesita un mongod: usa MONGO_URI (o
+mongodb://localhost:27017) y se saltea si no hay servidor.
+
+    cd api/v1 && python -m pytest -q tests -s
+"""
+import os
+import sys
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/clothing_test")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+import compare_reports
+from app.index import create_app, mongo
+from app.indexes import create_indexes
+
+DB_NAME = "clothing_compare_test"
+SALES = 5000
+
+def mongod_available():
+    client = MongoClient(os.environ["MONGO_URI"], serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+pytestmark = pytest.mark.skipif(not mongod_available(), reason="No hay un mongod en MONGO_URI")
+
+@pytest.fixture(scope="module")
+def db():
+    create_app()
+    database = mongo.cx[DB_NAME]
+    mongo.db = database
+    mongo.cx.drop_database(DB_NAME)
+    compare_reports.seed(database, SALES, 42)
+    create_indexes(database)
+    yield database
+    mongo.cx.drop_database(DB_NAME)
+
+def test_reports_match_legacy_pipelines(db):
+    rows = compare_reports.compare(db, repeat=1)
+    for name, mode, same, legacy_time, new_time in rows:
+        print(f"{name:<26}{mode:<10}{legacy_time * 1000:>10.1f}ms{new_time * 1000:>10.1f}ms")
+    assert [(name, mode) for name, mode, same, _, _ in rows if not same] == []
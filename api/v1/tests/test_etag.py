@@ -0,0 +1,64 @@
+"""ETags y GET condicionales (app/utils/etag.py)."""
+from werkzeug.datastructures import MultiDict
+
+from app.utils.etag import dependencies
+from conftest import PREFIX
+
+RELATIONS = {"brand_id": ("brands", {"name": 1})}
+
+def test_dependencies_add_expanded_collections():
+    assert dependencies(MultiDict(), ("products",), RELATIONS) == ["products"]
+    assert dependencies(MultiDict({"expand": "brand_id"}), ("products",), RELATIONS) == ["brands", "products"]
+    # Un ?expand= inválido responde 400, sin ETag: no suma colecciones
+    assert dependencies(MultiDict({"expand": "user_id"}), ("products",), RELATIONS) == ["products"]
+
+def get(client, path, tag=None, **kwargs):
+    headers = kwargs.pop("headers", {})
+    if tag:
+        headers["If-None-Match"] = tag
+    return client.get(f"{PREFIX}{path}", headers=headers, **kwargs)
+
+def test_weak_etag_and_304(client, db):
+    db.brands.insert_one({"name": "Nike"})
+    first = get(client, "/brands")
+    tag = first.headers["ETag"]
+    assert first.status_code == 200 and tag.startswith('W/"')
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    again = get(client, "/brands", tag)
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == tag
+
+def test_write_changes_the_etag(client, db):
+    tag = get(client, "/brands").headers["ETag"]
+    client.post(f"{PREFIX}/brands", json={"name": "Puma"})
+    response = get(client, "/brands", tag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+    assert [doc["name"] for doc in response.get_json()] == ["Puma"]
+
+def test_etag_depends_on_the_url_and_accept(client, db):
+    tags = {
+        get(client, "/brands").headers["ETag"],
+        get(client, "/brands", query_string={"limit": 1}).headers["ETag"],
+        get(client, "/brands", headers={"Accept": "application/x-ndjson"}).headers["ETag"],
+    }
+    assert len(tags) == 3
+
+def test_expand_ties_the_etag_to_the_related_collection(client, db):
+    brand_id = db.brands.insert_one({"name": "Nike"}).inserted_id
+    db.products.insert_one({"name": "Air Max", "brand_id": brand_id})
+    plain = get(client, "/products").headers["ETag"]
+    expanded = get(client, "/products", query_string={"expand": "brand_id"}).headers["ETag"]
+
+    client.put(f"{PREFIX}/brands?id={brand_id}", json={"name": "Nike Inc."})
+    assert get(client, "/products", plain).status_code == 304
+    response = get(client, "/products", expanded, query_string={"expand": "brand_id"})
+    assert response.status_code == 200
+    assert response.get_json()[0]["brand"]["name"] == "Nike Inc."
+
+def test_errors_carry_no_etag(client, db):
+    response = get(client, "/brands", query_string={"sort": "password"})
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
@@ -0,0 +1,118 @@
+"""Paginación por keyset de app/utils/pagination.py."""
+from datetime import datetime
+
+import pytest
+from bson.objectid import ObjectId
+from werkzeug.datastructures import MultiDict
+
+from app.utils.pagination import (
+    DEFAULT_LIMIT, MAX_LIMIT, encode_cursor, page_query, page_sort, paginate, parse_cursor, parse_page_args, wants_page
+)
+from conftest import PREFIX
+
+def test_wants_page_only_with_limit_or_after():
+    assert not wants_page(MultiDict())
+    assert wants_page(MultiDict({"limit": "10"}))
+    assert wants_page(MultiDict({"after": str(ObjectId())}))
+
+def test_parse_page_args_defaults():
+    assert parse_page_args(MultiDict()) == (DEFAULT_LIMIT, None)
+    assert parse_page_args(MultiDict({"limit": ""})) == (DEFAULT_LIMIT, None)
+
+@pytest.mark.parametrize("limit", ["0", "-1", str(MAX_LIMIT + 1), "diez", "1.5"])
+def test_parse_page_args_rejects_bad_limit(limit):
+    with pytest.raises(ValueError):
+        parse_page_args(MultiDict({"limit": limit}))
+
+def test_after_without_sort_is_an_object_id():
+    oid = ObjectId()
+    assert parse_page_args(MultiDict({"after": str(oid)})) == (DEFAULT_LIMIT, oid)
+
+@pytest.mark.parametrize("after", ["123", "no-es-un-id", "zzzzzzzzzzzzzzzzzzzzzzzz"])
+def test_malformed_after_without_sort(after):
+    with pytest.raises(ValueError, match="after"):
+        parse_page_args(MultiDict({"after": after}))
+
+def test_cursor_round_trip_keeps_types():
+    sort = [("sale_date", -1), ("total", 1)]
+    doc = {"_id": ObjectId(), "sale_date": datetime(2025, 7, 10, 12, 30), "total": 19.9}
+    assert parse_cursor(encode_cursor(doc, sort), sort) == [doc["sale_date"], 19.9, doc["_id"]]
+
+def test_cursor_with_missing_sort_value():
+    sort = [("name", 1)]
+    doc = {"_id": ObjectId()}
+    assert parse_cursor(encode_cursor(doc, sort), sort) == [None, doc["_id"]]
+
+@pytest.mark.parametrize("raw", ["%%%", "bm8tanNvbg", encode_cursor({"_id": ObjectId()}, [])])
+def test_malformed_cursor_with_sort(raw):
+    with pytest.raises(ValueError):
+        parse_cursor(raw, [("name", 1)])
+
+def test_cursor_from_another_sort_is_rejected():
+    raw = encode_cursor({"_id": ObjectId(), "name": "a"}, [("name", 1)])
+    with pytest.raises(ValueError, match="orden"):
+        parse_cursor(raw, [("name", -1)])
+
+def test_page_sort_follows_last_direction():
+    assert page_sort() == [("_id", 1)]
+    assert page_sort([("price", -1)]) == [("price", -1), ("_id", -1)]
+    assert page_sort([("price", -1), ("name", 1)]) == [("price", -1), ("name", 1), ("_id", 1)]
+
+def test_page_query_keeps_filters():
+    oid = ObjectId()
+    assert page_query(None, {"country": "USA"}) == {"country": "USA"}
+    assert page_query(oid, {"country": "USA"}) == {"country": "USA", "_id": {"$gt": oid}}
+
+def walk(collection, sort, limit=2, query=None):
+    """Todas las páginas: (ids en orden, cantidad de páginas)."""
+    ids, after, pages = [], None, 0
+    while True:
+        page = paginate(collection, limit, after, query, None, sort)
+        pages += 1
+        ids += [doc["_id"] for doc in page["data"]]
+        if page["next_cursor"] is None:
+            return ids, pages
+        after = parse_cursor(page["next_cursor"], sort)
+
+@pytest.fixture
+def brands(db):
+    docs = [
+        {"name": "Nike", "founded": 1964},
+        {"name": "Adidas", "founded": 1949},
+        {"name": "Puma", "founded": 1948},
+        {"name": "Asics", "founded": 1949},
+        {"name": "Vans"},
+        {"name": "Reebok", "founded": None},
+        {"name": "Fila", "founded": 1911},
+    ]
+    db.brands.insert_many(docs)
+    return db.brands
+
+@pytest.mark.parametrize("sort", [None, [("founded", 1)], [("founded", -1)], [("founded", -1), ("name", 1)]],
+                         ids=["_id", "asc", "desc", "dos-campos"])
+def test_pages_cover_every_document_once(brands, sort):
+    expected = [doc["_id"] for doc in brands.find({}).sort(page_sort(sort))]
+    ids, pages = walk(brands, sort)
+    assert ids == expected
+    assert pages == 4
+
+def test_pages_respect_filters(brands):
+    ids, _ = walk(brands, [("founded", 1)], query={"founded": {"$gte": 1949}})
+    assert [brands.find_one({"_id": i})["name"] for i in ids] == ["Adidas", "Asics", "Nike"]
+
+def test_route_pages_with_next_cursor(client, brands):
+    names = []
+    query = {"limit": 3, "sort": "-founded"}
+    while True:
+        body = client.get(f"{PREFIX}/brands", query_string=query).get_json()
+        names += [doc["name"] for doc in body["data"]]
+        if body["next_cursor"] is None:
+            break
+        query["after"] = body["next_cursor"]
+    assert len(names) == 7 and len(set(names)) == 7
+    assert names[0] == "Nike"
+
+def test_route_rejects_malformed_after(client, brands):
+    response = client.get(f"{PREFIX}/brands", query_string={"limit": 2, "after": "xyz", "sort": "name"})
+    assert response.status_code == 400
+    assert "after" in response.get_json()["error"]
@@ -0,0 +1,95 @@
+"""Filtros, orden y proyección de la query string (app/utils/query.py y projection.py)."""
+from datetime import datetime
+
+import pytest
+from bson.objectid import ObjectId
+from werkzeug.datastructures import MultiDict
+
+from app.utils.projection import build_projection, parse_fields
+from app.utils.query import MAX_SORT_FIELDS, MAX_VALUES, parse_filters, parse_sort
+from conftest import PREFIX
+
+FILTERS = {'brand_id': 'id', 'category': 'string', 'price': 'number', 'sale_date': 'date'}
+
+def filters(**args):
+    return parse_filters(MultiDict(args), FILTERS, search=True)
+
+def test_equality_and_lists():
+    oid = ObjectId()
+    assert filters(category="shoes") == {"category": "shoes"}
+    assert filters(category="shoes, shirts") == {"category": {"$in": ["shoes", "shirts"]}}
+    assert filters(brand_id=str(oid)) == {"brand_id": oid}
+
+def test_number_range_operators_combine():
+    assert filters(price_gte="50", price_lt="100") == {"price": {"$gte": 50.0, "$lt": 100.0}}
+    assert filters(price="9.5") == {"price": 9.5}
+
+def test_date_range_includes_the_whole_last_day():
+    query = filters(sale_date_from="2025-01-01", sale_date_to="2025-01-31")
+    assert query == {"sale_date": {"$gte": datetime(2025, 1, 1), "$lt": datetime(2025, 2, 1)}}
+
+def test_reserved_params_are_not_filters():
+    assert filters(limit="10", after="x", fields="name", sort="price", expand="brand_id") == {}
+
+def test_text_search():
+    assert filters(q="  air max ") == {"$text": {"$search": "air max"}}
+    with pytest.raises(ValueError, match="búsqueda"):
+        parse_filters(MultiDict({"q": "air"}), FILTERS, search=False)
+    with pytest.raises(ValueError):
+        filters(q="x" * 201)
+
+@pytest.mark.parametrize("args", [
+    {"color": "red"},
+    {"price_from": "1"},
+    {"sale_date": "2025-01-01"},
+    {"brand_id": "no-es-un-id"},
+    {"price_gte": "barato"},
+    {"price": "nan"},
+    {"price_lt": "inf"},
+    {"category": " , "},
+    {"category": ",".join(str(i) for i in range(MAX_VALUES + 1))},
+    {"sale_date_from": "10/07/2025"},
+], ids=["desconocido", "operador-de-otro-tipo", "fecha-sin-operador", "id", "numero", "nan", "inf",
+        "lista-vacia", "demasiados-valores", "fecha"])
+def test_invalid_filters(args):
+    with pytest.raises(ValueError):
+        filters(**args)
+
+def test_sort_directions():
+    assert parse_sort(MultiDict({"sort": "-price,name"}), ("price", "name")) == [("price", -1), ("name", 1)]
+    assert parse_sort(MultiDict({"sort": "+price"}), ("price",)) == [("price", 1)]
+    assert parse_sort(MultiDict(), ("price",)) is None
+
+@pytest.mark.parametrize("raw", ["stock", "price,-price", ",", ",".join("abcd"[:MAX_SORT_FIELDS + 1])])
+def test_invalid_sort(raw):
+    with pytest.raises(ValueError):
+        parse_sort(MultiDict({"sort": raw}), ("price", "name", "a", "b", "c", "d"))
+
+def test_fields_allow_list():
+    allowed = ("name", "price")
+    assert parse_fields(MultiDict({"fields": "name, _id,name,price"}), allowed) == ["name", "price"]
+    assert parse_fields(MultiDict(), allowed) is None
+    with pytest.raises(ValueError, match="password"):
+        parse_fields(MultiDict({"fields": "name,password"}), allowed)
+
+def test_build_projection():
+    assert build_projection(["name"], required=["brand_id"]) == {"name": 1, "brand_id": 1}
+    assert build_projection(None, {"password": 0}) == {"password": 0}
+    assert build_projection(None) is None
+
+def test_route_filters_and_sorts(client, db):
+    db.products.insert_many([
+        {"name": "A", "category": "shoes", "price": 50},
+        {"name": "B", "category": "shoes", "price": 120},
+        {"name": "C", "category": "shirts", "price": 80},
+    ])
+    query = {"category": "shoes,shirts", "price_lt": 100, "sort": "-price", "fields": "name"}
+    response = client.get(f"{PREFIX}/products", query_string=query)
+    assert [doc["name"] for doc in response.get_json()] == ["C", "A"]
+    assert set(response.get_json()[0]) == {"_id", "name"}
+
+@pytest.mark.parametrize("query", [{"color": "red"}, {"sort": "category"}, {"fields": "password"}, {"price_gte": "x"}])
+def test_route_rejects_bad_query(client, db, query):
+    response = client.get(f"{PREFIX}/products", query_string=query)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
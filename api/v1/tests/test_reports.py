@@ -0,0 +1,21 @@
+"""Reportes de app/models/reports.py que corren sobre mongomock."""
+from bson.objectid import ObjectId
+
+def test_top_users_padding_has_the_same_shape(app, db):
+    from app.models.reports import reportsModel
+
+    users = [{"_id": ObjectId(), "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(4)]
+    db.users.insert_many(users)
+    db.sales.insert_many([
+        {"product_id": ObjectId(), "user_id": users[0]["_id"], "quantity": 1},
+        {"product_id": ObjectId(), "user_id": users[0]["_id"], "quantity": 2},
+        {"product_id": ObjectId(), "user_id": users[1]["_id"], "quantity": 1},
+    ])
+    with app.app_context():
+        rows = reportsModel.top_users()
+    assert [row["total_purchases"] for row in rows] == [2, 1, 0, 0]
+    assert [row["_id"] for row in rows[:2]] == [str(users[0]["_id"]), str(users[1]["_id"])]
+    # Los usuarios sin compras completan el top 5 con `_id` como texto, igual que los compradores
+    assert {row["_id"] for row in rows[2:]} == {str(users[2]["_id"]), str(users[3]["_id"])}
+    assert all(set(row) == {"_id", "username", "email", "total_purchases"} for row in rows)
+    assert all(isinstance(row["_id"], str) for row in rows)
@@ -0,0 +1,88 @@
+"""Una venta solo se guarda si reserva stock de un producto que existe (app/stock.py)."""
+import pytest
+from bson.objectid import ObjectId
+
+from conftest import PREFIX
+
+@pytest.fixture
+def product(db):
+    product_id = db.products.insert_one({"name": "Air Max", "price": 100, "stock": 3, "sold_quantity": 0}).inserted_id
+    return product_id
+
+def stock_of(db, product_id):
+    doc = db.products.find_one({"_id": product_id})
+    return doc["stock"], doc["sold_quantity"]
+
+def test_create_reserves_stock(client, db, product):
+    response = client.post(f"{PREFIX}/sales", json={"product_id": str(product), "quantity": 2, "total": 200})
+    assert response.status_code == 201
+    sale = db.sales.find_one({"_id": ObjectId(response.get_json()["inserted_id"])})
+    assert sale["product_id"] == product
+    assert stock_of(db, product) == (1, 2)
+
+def test_create_over_stock_is_rejected(client, db, product):
+    response = client.post(f"{PREFIX}/sales", json={"product_id": str(product), "quantity": 4})
+    assert response.status_code == 409
+    assert db.sales.count_documents({}) == 0
+    assert stock_of(db, product) == (3, 0)
+
+@pytest.mark.parametrize("body", [
+    {"quantity": 1},
+    {"product_id": None, "quantity": 1},
+    {"product_id": "no-es-un-id", "quantity": 1},
+    {"product_id": 12, "quantity": 1},
+], ids=["sin-producto", "producto-null", "id-mal-formado", "id-numerico"])
+def test_create_without_valid_product_is_rejected(client, db, product, body):
+    response = client.post(f"{PREFIX}/sales", json=body)
+    assert response.status_code == 400
+    assert "product_id" in response.get_json()["error"]
+    assert db.sales.count_documents({}) == 0
+
+@pytest.mark.parametrize("quantity", [None, 0, -1, "2", True], ids=["sin-cantidad", "cero", "negativa", "texto", "bool"])
+def test_create_without_positive_quantity_is_rejected(client, db, product, quantity):
+    body = {"product_id": str(product)}
+    if quantity is not None:
+        body["quantity"] = quantity
+    response = client.post(f"{PREFIX}/sales", json=body)
+    assert response.status_code == 400
+    assert db.sales.count_documents({}) == 0
+    assert stock_of(db, product) == (3, 0)
+
+def test_create_for_missing_product_is_rejected(client, db, product):
+    response = client.post(f"{PREFIX}/sales", json={"product_id": str(ObjectId()), "quantity": 1})
+    assert response.status_code == 409
+    assert "no existe" in response.get_json()["error"]
+    assert db.sales.count_documents({}) == 0
+
+def test_enqueue_requires_valid_product(app, db, product):
+    from app.models.sales import salesModel
+    from app.stock import InvalidSale, StockError
+
+    with app.app_context():
+        with pytest.raises(InvalidSale):
+            salesModel.enqueue({"quantity": 1})
+        with pytest.raises(InvalidSale):
+            salesModel.enqueue({"product_id": "no-es-un-id", "quantity": 1})
+        with pytest.raises(StockError):
+            salesModel.enqueue({"product_id": str(ObjectId()), "quantity": 1})
+    assert stock_of(db, product) == (3, 0)
+
+def test_update_cannot_drop_the_product(client, db, product):
+    sale_id = client.post(f"{PREFIX}/sales", json={"product_id": str(product), "quantity": 1}).get_json()["inserted_id"]
+    response = client.put(f"{PREFIX}/sales?id={sale_id}", json={"product_id": None})
+    assert response.status_code == 400
+    assert db.sales.find_one({"_id": ObjectId(sale_id)})["product_id"] == product
+    assert stock_of(db, product) == (2, 1)
+
+def test_bulk_insert_requires_valid_product(client, db, product):
+    body = [
+        {"op": "insert", "data": {"product_id": str(product), "quantity": 1}},
+        {"op": "insert", "data": {"quantity": 1}},
+        {"op": "insert", "data": {"product_id": "no-es-un-id", "quantity": 1}},
+        {"op": "insert", "data": {"product_id": str(ObjectId()), "quantity": 1}},
+    ]
+    response = client.post(f"{PREFIX}/sales/bulk?ordered=false", json=body)
+    assert response.status_code == 200
+    assert [item["status"] for item in response.get_json()["results"]] == [201, 400, 400, 409]
+    assert db.sales.count_documents({}) == 1
+    assert stock_of(db, product) == (2, 1)
@@ -1,5 +1,9 @@
 import os
-from datetime import datetime
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
 from dotenv import load_dotenv
@@ -11,6 +15,17 @@ load_dotenv()
 # URI de conexión desde .env
 MONGO_URI = os.getenv("MONGO_URI")
 
+# La definición de índices vive en la API (api/v1/app/indexes.py) para que ambos usen la misma
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api", "v1"))
+from app.indexes import create_indexes, missing_indexes
+from app.logs import configure_logging
+from app import rollups, stock, versions
+import generator
+import snapshot
+from results import BrandSales, DateSales, ProductStock, days_between, parse_date
+
+logger = logging.getLogger("clothing_db")
+
 class ClothingStoreDB:
     def __init__(self):
         self.client = None
@@ -33,49 +48,179 @@ class ClothingStoreDB:
             print("\033[93m[!] Desconectado de la base de datos.\033[0m")
 
     # --- CRUD BÁSICO ---
+    # Los documentos y filtros completos solo se registran con LOG_LEVEL=DEBUG.
+    # Las ventas y la marca de los productos mueven los totales de ventas (rollups) con el
+    # mismo $inc que la API, así los reportes que los leen siguen coincidiendo con `sales`
     def insert_one(self, collection_name, document):
-        print(f"\nInsertando un documento en '{collection_name}'...")
         col = self.db[collection_name]
         result = col.insert_one(document)
-        print(f"Documento insertado con _id: {result.inserted_id}")
+        if collection_name == "sales":
+            rollups.apply_sale(self.db, document)
+        versions.bump(self.db, collection_name, insert=True)
+        logger.info("Documento insertado en '%s' con _id: %s", collection_name, result.inserted_id)
+        logger.debug("Documento: %s", document)
+        return result.inserted_id
 
     def insert_many(self, collection_name, documents):
-        print(f"\nInsertando varios documentos en '{collection_name}'...")
         col = self.db[collection_name]
         result = col.insert_many(documents)
-        print(f"Documentos insertados con _id's: {result.inserted_ids}")
+        if collection_name == "sales":
+            rollups.apply_sales(self.db, documents)
+        versions.bump(self.db, collection_name, insert=True)
+        logger.info("%d documentos insertados en '%s'", len(result.inserted_ids), collection_name)
+        logger.debug("_id's: %s", result.inserted_ids)
+        return result.inserted_ids
+
+    def _move_rollups(self, collection_name, before, after):
+        # `after` es None si el documento se eliminó
+        if collection_name == "sales":
+            if after is None:
+                rollups.apply_sale(self.db, before, -1)
+            else:
+                rollups.update_sale(self.db, before, after)
+        elif collection_name == "products":
+            new_brand = after.get("brand_id") if after is not None else None
+            if before.get("brand_id") != new_brand:
+                rollups.move_product(self.db, before["_id"], before.get("brand_id"), new_brand)
 
     def update_one(self, collection_name, filter_doc, update_doc):
-        print(f"\nActualizando documento en '{collection_name}' con filtro: {filter_doc} ...")
         col = self.db[collection_name]
-        result = col.update_one(filter_doc, {'$set': update_doc})
-        print(f"Documentos modificados: {result.modified_count}")
+        if collection_name in ("sales", "products"):
+            # Se necesita el documento anterior para restar sus totales
+            before = col.find_one_and_update(filter_doc, {'$set': update_doc})
+            modified = int(before is not None and any(
+                key not in before or before[key] != value for key, value in update_doc.items()
+            ))
+            if modified:
+                self._move_rollups(collection_name, before, {**before, **update_doc})
+        else:
+            modified = col.update_one(filter_doc, {'$set': update_doc}).modified_count
+        if modified:
+            versions.bump(self.db, collection_name)
+        logger.info("Documentos modificados en '%s': %d", collection_name, modified)
+        logger.debug("Filtro: %s | Cambios: %s", filter_doc, update_doc)
+        return modified
 
     def delete_one(self, collection_name, filter_doc):
-        print(f"\nEliminando documento en '{collection_name}' con filtro: {filter_doc} ...")
         col = self.db[collection_name]
-        result = col.delete_one(filter_doc)
-        print(f"Documentos eliminados: {result.deleted_count}")
+        if collection_name in ("sales", "products"):
+            before = col.find_one_and_delete(filter_doc)
+            deleted = int(before is not None)
+            if deleted:
+                self._move_rollups(collection_name, before, None)
+        else:
+            deleted = col.delete_one(filter_doc).deleted_count
+        if deleted:
+            versions.bump(self.db, collection_name)
+        logger.info("Documentos eliminados en '%s': %d", collection_name, deleted)
+        logger.debug("Filtro: %s", filter_doc)
+        return deleted
+
+    # --- ÍNDICES ---
+    def create_indexes(self):
+        missing = missing_indexes(self.db)
+        print(f"\nCreando índices ({len(missing)} faltantes)...")
+        created = create_indexes(self.db)
+        for collection, names in created.items():
+            print(f"{collection}: {', '.join(names)}")
+
+    # --- TOTALES DE VENTAS (ROLLUPS) ---
+    def rebuild_rollups(self):
+        print("\nRecalculando colecciones de totales de ventas desde 'sales'...")
+        rollups.rebuild(self.db)
+        return self.verify_rollups()
+
+    def verify_rollups(self):
+        print("\nVerificando totales de ventas contra 'sales'...")
+        mismatches = rollups.verify(self.db)
+        if not mismatches:
+            print("\033[92m[+] Los totales coinciden con las ventas.\033[0m")
+            return True
+        print(f"\033[91m[-] {len(mismatches)} diferencias encontradas:\033[0m")
+        for collection, key, stored, expected in mismatches[:20]:
+            print(f"{collection} {key}: guardado={stored} esperado={expected}")
+        return False
+
+    # --- CONTADORES DE STOCK ---
+    def backfill_stock(self, subtract_sold=False):
+        print("\nCalculando 'sold_quantity' de los productos desde 'sales'...")
+        stock.backfill(self.db, subtract_sold)
+        versions.bump(self.db, stock.VERSION)
+        return self.verify_stock()
+
+    def verify_stock(self):
+        print("\nVerificando 'sold_quantity' de los productos contra 'sales'...")
+        mismatches = stock.verify(self.db)
+        if not mismatches:
+            print("\033[92m[+] Las unidades vendidas coinciden con las ventas.\033[0m")
+            return True
+        print(f"\033[91m[-] {len(mismatches)} diferencias encontradas:\033[0m")
+        for product_id, stored, expected in mismatches[:20]:
+            print(f"products {product_id}: guardado={stored} esperado={expected}")
+        return False
+
+    # --- DATOS SINTÉTICOS ---
+    def seed(self, counts, drop=False, **options):
+        if drop:
+            print("\nEliminando colecciones existentes...")
+            for collection in generator.FACTORIES:
+                self.db[collection].drop()
+            self.db[rollups.META].drop()
+
+        total = sum(counts.values())
+        print(f"\nGenerando {total} documentos en '{self.db.name}' (semilla {options.get('seed', 42)})...")
+        started = time.perf_counter()
+        stats = generator.load(MONGO_URI, self.db.name, counts, **options)
+        elapsed = time.perf_counter() - started
+        inserted = sum(count for count, _ in stats.values())
+        print(f"{'total':<10}{inserted:>12} docs {elapsed:>9.1f}s {inserted / elapsed if elapsed else 0:>12.0f} docs/s")
+        # Las ETags de la API cambian para las colecciones recién cargadas
+        for collection in generator.FACTORIES:
+            versions.bump(self.db, collection)
+
+        # Con los datos cargados se crean los índices y se recalculan los totales de ventas
+        # y las unidades vendidas de cada producto (el stock generado ya es el disponible)
+        self.create_indexes()
+        rollups_ok = self.rebuild_rollups()
+        return self.backfill_stock() and rollups_ok
+
+    # --- EXPORTACIÓN DE VENTAS (ARCHIVOS EN COLUMNAS) ---
+    def export_sales(self, directory, lag=snapshot.EXPORT_LAG, full=False):
+        print(f"\nExportando ventas a '{directory}'...")
+        started = time.perf_counter()
+        stats = snapshot.export_sales(self.db, directory, lag, full)
+        elapsed = time.perf_counter() - started
+        print(f"{stats['mode']}: {stats['exported']} ventas nuevas, {stats['rows']} en total "
+              f"(hasta _id {stats['checkpoint']}) en {elapsed:.1f}s")
+        return stats
 
     # --- CONSULTAS ESPECÍFICAS ---
-    
+    # Devuelven los tipos de results.py; main() es quien las imprime
+
     # i. Obtener la cantidad vendida de prendas por fecha y filtrarla con una fecha específica
     def get_sold_quantity_by_date(self, date_str):
-        print("\n[Consulta] Cantidad vendida de prendas en fecha específica:", date_str)
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        return self.get_sold_quantity_by_dates([date_str])[0]
+
+    # Varias fechas (o un rango) en una sola agregación, en el orden pedido y con 0 si no hubo ventas
+    def get_sold_quantity_by_dates(self, date_strs):
+        return self._sold_quantity_on([parse_date(date_str) for date_str in date_strs])
+
+    def get_sold_quantity_by_date_range(self, start_str, end_str):
+        return self._sold_quantity_on(days_between(start_str, end_str))
+
+    def _sold_quantity_on(self, dates):
         pipeline = [
-            {"$match": {"sale_date": date_obj}},
-            {"$group": {"_id": "$sale_date", "total_sold": {"$sum": "$quantity"}}}
+            {"$match": {"sale_date": {"$in": list(set(dates))}}},
+            {"$group": {"_id": "$sale_date", "total_sold": {"$sum": "$quantity"}, "sales": {"$sum": 1}}}
+        ]
+        found = {doc["_id"]: doc for doc in self.db.sales.aggregate(pipeline)} if dates else {}
+        return [
+            DateSales(date, found[date]["total_sold"], found[date]["sales"]) if date in found else DateSales(date, 0, 0)
+            for date in dates
         ]
-        result = list(self.db.sales.aggregate(pipeline))
-        if result:
-            print(f"Fecha: {result[0]['_id'].strftime('%Y-%m-%d')} - Total prendas vendidas: {result[0]['total_sold']}")
-        else:
-            print("No se encontraron ventas para esa fecha.")
 
     # ii. Obtener la lista de todas las marcas que tienen al menos una venta
     def get_brands_with_sales(self):
-        print("\n[Consulta] Lista de marcas con al menos una venta")
         pipeline = [
             {
                 "$lookup": {
@@ -107,48 +252,30 @@ class ClothingStoreDB:
                 }
             }
         ]
-        results = list(self.db.sales.aggregate(pipeline))
-        if results:
-            for b in results:
-                print(f"- {b['brand_name']}")
-        else:
-            print("No hay marcas con ventas registradas.")
+        return [b.get("brand_name") for b in self.db.sales.aggregate(pipeline)]
 
     # iii. Obtener prendas vendidas y su cantidad restante en stock
     def get_sold_products_and_stock(self):
-        print("\n[Consulta] Prendas vendidas y su cantidad restante en stock")
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$product_id",
-                    "total_sold": {"$sum": "$quantity"}
-                }
-            },
-            {
-                "$lookup": {
-                    "from": "products",
-                    "localField": "_id",
-                    "foreignField": "_id",
-                    "as": "product_info"
-                }
-            },
-            {"$unwind": "$product_info"},
-            {
-                "$project": {
-                    "product_name": "$product_info.name",
-                    "total_sold": 1,
-                    "stock": "$product_info.stock",
-                    "remaining_stock": {"$subtract": ["$product_info.stock", "$total_sold"]}
-                }
-            }
+        # Los productos con al menos una venta, como el $group de `sales` original (también
+        # los que suman 0 unidades). distinct usa el índice de `product_id` de `sales`
+        sold_ids = [product_id for product_id in self.db.sales.distinct("product_id") if product_id is not None]
+        # Las ventas mantienen `stock` y `sold_quantity` en cada producto (ver backfill_stock)
+        if stock.is_ready(self.db):
+            projection = {"name": 1, "stock": 1, "sold_quantity": 1}
+            return [
+                ProductStock(item["_id"], item.get("name"), item.get("sold_quantity", 0), item.get("stock"))
+                for item in self.db.products.find({"_id": {"$in": sold_ids}}, projection)
+            ]
+        # Hasta el primer backfill `sold_quantity` no está completo: se suma desde `sales`, como en la API
+        pipeline = [{"$group": {"_id": "$product_id", "total_sold": {"$sum": "$quantity"}}}]
+        sold = {row["_id"]: row["total_sold"] for row in self.db.sales.aggregate(pipeline)}
+        return [
+            ProductStock(item["_id"], item.get("name"), sold[item["_id"]], item.get("stock"))
+            for item in self.db.products.find({"_id": {"$in": sold_ids}}, {"name": 1, "stock": 1})
         ]
-        results = list(self.db.sales.aggregate(pipeline))
-        for item in results:
-            print(f"{item['product_name']}: Vendidas={item['total_sold']}, Stock restante={item['remaining_stock']}")
 
     # iv. Obtener listado de las 5 marcas más vendidas y su cantidad de ventas
     def get_top_5_brands_by_sales(self):
-        print("\n[Consulta] Las 5 marcas más vendidas y su cantidad de ventas")
         pipeline = [
             {
                 "$lookup": {
@@ -184,9 +311,7 @@ class ClothingStoreDB:
             {"$sort": {"total_sales": -1}},
             {"$limit": 5}
         ]
-        results = list(self.db.sales.aggregate(pipeline))
-        for r in results:
-            print(f"{r['brand_name']}: {r['total_sales']} ventas")
+        return [BrandSales(r.get("brand_name"), r["total_sales"]) for r in self.db.sales.aggregate(pipeline)]
 
 # Datos iniciales para insertar (ejemplo con ids simulados para referencia)
 
@@ -240,11 +365,43 @@ def initial_data():
     return brands, products, reviews, sales, users
 
 
+def print_queries(source, date_str):
+    """Imprime las consultas de `source`: un ClothingStoreDB o un snapshot.SalesSnapshot."""
+    print("\n[Consulta] Cantidad vendida de prendas en fecha específica:", date_str)
+    day = source.get_sold_quantity_by_date(date_str)
+    if day.sales:
+        print(f"Fecha: {day.date.strftime('%Y-%m-%d')} - Total prendas vendidas: {day.total_sold}")
+    else:
+        print("No se encontraron ventas para esa fecha.")
+
+    print("\n[Consulta] Lista de marcas con al menos una venta")
+    brands = source.get_brands_with_sales()
+    if brands:
+        for name in brands:
+            print(f"- {name}")
+    else:
+        print("No hay marcas con ventas registradas.")
+
+    print("\n[Consulta] Prendas vendidas y su cantidad restante en stock")
+    for item in source.get_sold_products_and_stock():
+        print(f"{item.name}: Vendidas={item.sold_quantity}, Stock restante={item.stock}")
+
+    print("\n[Consulta] Las 5 marcas más vendidas y su cantidad de ventas")
+    for brand in source.get_top_5_brands_by_sales():
+        print(f"{brand.brand_name}: {brand.total_sales} ventas")
+
+
 def main():
     store_db = ClothingStoreDB()
     store_db.connect()
 
     brands, products, reviews, sales, users = initial_data()
+    # El stock de los datos de ejemplo es el inicial: se guarda ya sin sus ventas. Así cada
+    # ejecución descuenta solo las ventas que agrega, no otra vez las de ejecuciones anteriores
+    for sale in sales:
+        for product in products:
+            if product["_id"] == sale["product_id"]:
+                product["stock"] -= sale["quantity"]
 
     # Insertar datos iniciales
     store_db.insert_many("brands", brands)
@@ -252,6 +409,7 @@ def main():
     store_db.insert_many("users", users)
     store_db.insert_many("reviews", reviews)
     store_db.insert_many("sales", sales)
+    store_db.backfill_stock()
 
     # Ejemplos CRUD:
     # Insertar un nuevo usuario
@@ -265,13 +423,143 @@ def main():
     store_db.delete_one("users", {"username": "ana05"})
 
     # Consultas:
-    store_db.get_sold_quantity_by_date("2025-07-10")
-    store_db.get_brands_with_sales()
-    store_db.get_sold_products_and_stock()
-    store_db.get_top_5_brands_by_sales()
+    print_queries(store_db, "2025-07-10")
 
     store_db.disconnect()
 
 
+def run_create_indexes(args):
+    store_db = ClothingStoreDB()
+    store_db.connect()
+    store_db.create_indexes()
+    store_db.disconnect()
+
+
+def run_rebuild_rollups(args):
+    store_db = ClothingStoreDB()
+    store_db.connect()
+    ok = store_db.rebuild_rollups()
+    store_db.disconnect()
+    sys.exit(0 if ok else 1)
+
+
+def run_verify_rollups(args):
+    store_db = ClothingStoreDB()
+    store_db.connect()
+    ok = store_db.verify_rollups()
+    store_db.disconnect()
+    sys.exit(0 if ok else 1)
+
+
+def run_backfill_stock(args):
+    store_db = ClothingStoreDB()
+    store_db.connect()
+    ok = store_db.backfill_stock(subtract_sold=args.subtract_sold)
+    store_db.disconnect()
+    sys.exit(0 if ok else 1)
+
+
+def run_verify_stock(args):
+    store_db = ClothingStoreDB()
+    store_db.connect()
+    ok = store_db.verify_stock()
+    store_db.disconnect()
+    sys.exit(0 if ok else 1)
+
+
+def run_seed(args):
+    counts = generator.scale(args.sales, args.brands, args.products, args.users, args.reviews)
+    store_db = ClothingStoreDB()
+    store_db.connect()
+    ok = store_db.seed(
+        counts,
+        drop=args.drop,
+        seed=args.seed,
+        zipf=args.zipf,
+        start=datetime.strptime(args.start, "%Y-%m-%d"),
+        days=args.days,
+        chunk=args.chunk,
+        workers=args.workers
+    )
+    store_db.disconnect()
+    sys.exit(0 if ok else 1)
+
+
+def run_export_sales(args):
+    if not snapshot.available():
+        print("\033[91m[-] La exportación de ventas necesita numpy: pip install numpy\033[0m")
+        sys.exit(1)
+    store_db = ClothingStoreDB()
+    store_db.connect()
+    store_db.export_sales(args.dir, timedelta(seconds=args.lag), args.full)
+    store_db.disconnect()
+
+
+def run_snapshot_queries(args):
+    # Sin conexión: las consultas se responden con los archivos de export-sales
+    try:
+        reader = snapshot.SalesSnapshot(args.dir)
+    except (RuntimeError, FileNotFoundError) as e:
+        print(f"\033[91m[-] {e}\033[0m")
+        sys.exit(1)
+    print(f"[+] Exportación de '{args.dir}': {reader.rows} ventas, del {reader.manifest['exported_at']}")
+
+    print_queries(reader, args.date)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Utilidades de la base de datos clothing_store_db.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("create-indexes", help="Crea los índices declarados en segundo plano (idempotente).")
+    subparsers.add_parser("rebuild-rollups", help="Recalcula desde cero los totales de ventas y los verifica.")
+    subparsers.add_parser("verify-rollups", help="Compara los totales de ventas guardados con 'sales'.")
+    backfill = subparsers.add_parser("backfill-stock", help="Calcula 'sold_quantity' de cada producto desde 'sales' y lo verifica.")
+    backfill.add_argument("--subtract-sold", action="store_true", help="El 'stock' guardado es el inicial: le resta las ventas (una sola vez).")
+    subparsers.add_parser("verify-stock", help="Compara 'sold_quantity' de los productos con 'sales'.")
+
+    seed = subparsers.add_parser("seed", help="Genera y carga datos sintéticos a escala (deterministas por semilla).")
+    seed.add_argument("--sales", type=int, default=100000, help="Cantidad de ventas (por defecto 100000).")
+    seed.add_argument("--brands", type=int, help="Cantidad de marcas (por defecto 50).")
+    seed.add_argument("--products", type=int, help="Cantidad de productos (por defecto ventas / 200, mínimo 100).")
+    seed.add_argument("--users", type=int, help="Cantidad de usuarios (por defecto ventas / 20, mínimo 100).")
+    seed.add_argument("--reviews", type=int, help="Cantidad de reseñas (por defecto ventas / 10).")
+    seed.add_argument("--seed", type=int, default=42, help="Semilla; la misma semilla genera los mismos documentos.")
+    seed.add_argument("--zipf", type=float, default=1.1, help="Exponente Zipf de la popularidad de productos y usuarios.")
+    seed.add_argument("--start", default="2025-01-01", help="Primera fecha de ventas y reseñas (YYYY-MM-DD).")
+    seed.add_argument("--days", type=int, default=365, help="Días que abarcan las ventas y reseñas.")
+    seed.add_argument("--chunk", type=int, default=1000, help="Documentos por insert_many.")
+    seed.add_argument("--workers", type=int, help="Procesos de carga (por defecto, uno por CPU).")
+    seed.add_argument("--drop", action="store_true", help="Elimina las colecciones antes de cargar.")
+
+    export = subparsers.add_parser("export-sales", help="Agrega las ventas nuevas a archivos en columnas para consultas sin conexión.")
+    export.add_argument("--dir", default="sales_snapshot", help="Carpeta de la exportación (por defecto sales_snapshot).")
+    export.add_argument("--lag", type=int, default=int(snapshot.EXPORT_LAG.total_seconds()),
+                        help="Segundos de margen: no se exportan ventas con _id más nuevo que esto (por defecto 60).")
+    export.add_argument("--full", action="store_true", help="Exporta todas las ventas de nuevo.")
+    queries = subparsers.add_parser("snapshot-queries", help="Ejecuta las consultas sobre una exportación, sin conectarse a MongoDB.")
+    queries.add_argument("--dir", default="sales_snapshot", help="Carpeta de la exportación (por defecto sales_snapshot).")
+    queries.add_argument("--date", default="2025-07-10", help="Fecha de la consulta de cantidad vendida (YYYY-MM-DD).")
+
+    commands = {
+        "create-indexes": run_create_indexes,
+        "rebuild-rollups": run_rebuild_rollups,
+        "verify-rollups": run_verify_rollups,
+        "backfill-stock": run_backfill_stock,
+        "verify-stock": run_verify_stock,
+        "seed": run_seed,
+        "export-sales": run_export_sales,
+        "snapshot-queries": run_snapshot_queries,
+    }
+
+    args = parser.parse_args()
+    configure_logging(os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_FORMAT", "text"))
+    if args.command in commands:
+        commands[args.command](args)
+    else:
+        # Sin comando: carga los datos de ejemplo y ejecuta las consultas, como siempre
+        main()
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
\ No newline at end of file
@@ -0,0 +1,193 @@
+import random
+import struct
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from bson.objectid import ObjectId
+
+# Generador de datos sintéticos a escala. Todos los documentos se derivan de
+# (semilla, colección, índice): los _id se calculan sin consultar la base, así
+# cada proceso genera su parte sin compartir listas y las referencias siempre existen.
+
+# Cantidad de documentos que genera cada tarea. Fijo para que el resultado no dependa
+# de la cantidad de procesos ni del tamaño de los lotes de insert_many.
+BLOCK_SIZE = 10000
+
+# Prefijo de cada colección dentro del _id
+KINDS = {"brands": 1, "products": 2, "users": 3, "reviews": 4, "sales": 5}
+
+# Marca de tiempo de los _id: desde 2025-01-01, un segundo más cada IDS_PER_SECOND
+# documentos. Son iguales en cada ejecución y crecen con el índice, como los de inserts
+# reales: la lectura de lo nuevo de app/columnar.py, que repasa los _id de los últimos
+# segundos, no vuelve a recorrer toda la colección
+ID_TIMESTAMP = 1735689600
+IDS_PER_SECOND = 100
+
+COUNTRIES = ["USA", "Germany", "Japan", "Italy", "Spain", "France", "UK", "Mexico"]
+GARMENTS = ["Camiseta", "Pantalón", "Zapatilla", "Chaqueta", "Sudadera", "Short", "Gorra", "Calcetines"]
+COMMENTS = ["Excelente calidad", "Muy cómodo", "Buen diseño", "Me encantó", "Buena durabilidad", "Talla pequeña", "No lo recomiendo"]
+RATING_WEIGHTS = [5, 8, 17, 35, 35]
+QUANTITY_WEIGHTS = [50, 25, 12, 8, 5]
+
+def object_id(kind, seed, index):
+    # 4 bytes de tiempo + 1 de colección + 3 de semilla + 4 de índice
+    timestamp = ID_TIMESTAMP + index // IDS_PER_SECOND
+    return ObjectId(struct.pack(">IB3sI", timestamp, KINDS[kind], (seed & 0xFFFFFF).to_bytes(3, "big"), index))
+
+def scale(sales, brands=None, products=None, users=None, reviews=None):
+    """Cantidades por colección; las que no se indican se derivan de la cantidad de ventas."""
+    return {
+        "brands": brands or 50,
+        "products": products or max(100, sales // 200),
+        "users": users or max(100, sales // 20),
+        "reviews": reviews if reviews is not None else sales // 10,
+        "sales": sales,
+    }
+
+def zipf_weights(count, exponent, rng):
+    """
+    Pesos acumulados de una distribución Zipf (el de rango r pesa 1/r^s). Los rangos
+    se reparten al azar entre los índices para que los populares no sean los primeros.
+    """
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(accumulate(1.0 / rank ** exponent for rank in ranks))
+
+def pick(rng, cum_weights):
+    return bisect(cum_weights, rng.random() * cum_weights[-1])
+
+def build_state(config):
+    """Datos compartidos por todos los bloques: precios y pesos de popularidad."""
+    seed = config["seed"]
+    counts = config["counts"]
+    return {
+        "config": config,
+        "prices": _prices(seed, counts["products"]),
+        "product_weights": zipf_weights(counts["products"], config["zipf"], random.Random(f"{seed}:product-rank")),
+        "user_weights": zipf_weights(counts["users"], config["zipf"], random.Random(f"{seed}:user-rank")),
+    }
+
+# --- Estado de cada proceso (se arma una vez en el inicializador) ---
+_worker = {}
+
+def _init_worker(uri, db_name, config):
+    # Cada proceso abre su propio cliente: un MongoClient no se puede compartir entre procesos
+    _worker["client"] = MongoClient(uri)
+    _worker["db"] = _worker["client"][db_name]
+    _worker.update(build_state(config))
+
+def _prices(seed, count):
+    rng = random.Random(f"{seed}:prices")
+    return [round(rng.uniform(10, 250), 2) for _ in range(count)]
+
+def _brand(rng, seed, i, state):
+    return {"_id": object_id("brands", seed, i), "name": f"Brand {i}", "country": rng.choice(COUNTRIES)}
+
+def _product(rng, seed, i, state):
+    brand = rng.randrange(state["config"]["counts"]["brands"])
+    return {
+        "_id": object_id("products", seed, i),
+        "name": f"{rng.choice(GARMENTS)} {i}",
+        "brand_id": object_id("brands", seed, brand),
+        "price": state["prices"][i],
+        "stock": rng.randint(0, 500),
+    }
+
+def _user(rng, seed, i, state):
+    start = state["config"]["start"]
+    return {
+        "_id": object_id("users", seed, i),
+        "username": f"user{i}",
+        "email": f"user{i}@example.com",
+        "password": f"pass{i}",
+        "role": "admin" if i == 0 else "customer",
+        "created_at": start - timedelta(days=rng.randint(0, 365)),
+    }
+
+def _review(rng, seed, i, state):
+    config = state["config"]
+    return {
+        "_id": object_id("reviews", seed, i),
+        "product_id": object_id("products", seed, pick(rng, state["product_weights"])),
+        "user_id": object_id("users", seed, pick(rng, state["user_weights"])),
+        "rating": rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+        "comment": rng.choice(COMMENTS),
+        "review_date": config["start"] + timedelta(seconds=rng.randrange(config["days"] * 86400)),
+    }
+
+def _sale(rng, seed, i, state):
+    config = state["config"]
+    product = pick(rng, state["product_weights"])
+    quantity = rng.choices(range(1, 6), QUANTITY_WEIGHTS)[0]
+    return {
+        "_id": object_id("sales", seed, i),
+        "product_id": object_id("products", seed, product),
+        "user_id": object_id("users", seed, pick(rng, state["user_weights"])),
+        "sale_date": config["start"] + timedelta(seconds=rng.randrange(config["days"] * 86400)),
+        "quantity": quantity,
+        "total": round(quantity * state["prices"][product], 2),
+    }
+
+FACTORIES = {"brands": _brand, "products": _product, "users": _user, "reviews": _review, "sales": _sale}
+
+def generate_block(collection, block, state):
+    """Documentos del bloque `block` de la colección (determinista)."""
+    seed = state["config"]["seed"]
+    rng = random.Random(f"{seed}:{collection}:{block}")
+    first = block * BLOCK_SIZE
+    last = min(first + BLOCK_SIZE, state["config"]["counts"][collection])
+    factory = FACTORIES[collection]
+    return [factory(rng, seed, i, state) for i in range(first, last)]
+
+def insert_block(db, collection, block, state):
+    docs = generate_block(collection, block, state)
+    chunk = state["config"]["chunk"]
+    inserted = 0
+    for i in range(0, len(docs), chunk):
+        try:
+            inserted += len(db[collection].insert_many(docs[i:i + chunk], ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Con ordered=False el resto del lote se inserta igual; los duplicados (ejecuciones previas) se cuentan aparte
+            inserted += e.details.get("nInserted", 0)
+    return inserted
+
+def _load_block(collection, block):
+    return collection, insert_block(_worker["db"], collection, block, _worker)
+
+def _blocks(counts, collection):
+    return range(-(-counts[collection] // BLOCK_SIZE))
+
+def load(uri, db_name, counts, seed=42, zipf=1.1, start=datetime(2025, 1, 1), days=365,
+         chunk=1000, workers=None, report=print):
+    """
+    Genera y carga todas las colecciones repartiendo bloques entre un pool de procesos.
+    Devuelve {colección: (insertados, segundos)}.
+    """
+    config = {"seed": seed, "counts": counts, "zipf": zipf, "start": start, "days": days, "chunk": chunk}
+    stats = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(uri, db_name, config)) as pool:
+        for collection in FACTORIES:
+            started = time.perf_counter()
+            futures = [pool.submit(_load_block, collection, block) for block in _blocks(counts, collection)]
+            inserted = sum(future.result()[1] for future in as_completed(futures))
+            stats[collection] = _report(collection, inserted, time.perf_counter() - started, report)
+    return stats
+
+def load_into(db, counts, seed=42, zipf=1.1, start=datetime(2025, 1, 1), days=365, chunk=1000, report=print):
+    """Igual que load() pero en este proceso y sobre una base ya abierta (genera los mismos documentos)."""
+    state = build_state({"seed": seed, "counts": counts, "zipf": zipf, "start": start, "days": days, "chunk": chunk})
+    stats = {}
+    for collection in FACTORIES:
+        started = time.perf_counter()
+        inserted = sum(insert_block(db, collection, block, state) for block in _blocks(counts, collection))
+        stats[collection] = _report(collection, inserted, time.perf_counter() - started, report)
+    return stats
+
+def _report(collection, inserted, elapsed, report):
+    if report:
+        report(f"{collection:<10}{inserted:>12} docs {elapsed:>9.1f}s {inserted / elapsed if elapsed else 0:>12.0f} docs/s")
+    return inserted, elapsed
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from bson.objectid import ObjectId
+
+# Resultados de las consultas de ClothingStoreDB (clothing_db.py) y de SalesSnapshot
+# (snapshot.py): las dos devuelven los mismos tipos, así un proceso por lotes puede
+# usar una u otra sin cambiar nada más.
+
+class DateSales(NamedTuple):
+    date: datetime
+    total_sold: float
+    # Cantidad de ventas de la fecha (0 si no hubo)
+    sales: int
+
+class ProductStock(NamedTuple):
+    product_id: ObjectId
+    name: Optional[str]
+    sold_quantity: float
+    stock: Optional[float]
+
+class BrandSales(NamedTuple):
+    brand_name: Optional[str]
+    total_sales: float
+
+def parse_date(date_str):
+    return datetime.strptime(date_str, "%Y-%m-%d")
+
+def days_between(start_str, end_str):
+    """Los días de un rango YYYY-MM-DD, ambos extremos incluidos."""
+    start, end = parse_date(start_str), parse_date(end_str)
+    if end < start:
+        raise ValueError(f"La fecha final ({end_str}) es anterior a la inicial ({start_str})")
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
@@ -0,0 +1,337 @@
+import glob
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from bson import json_util
+from bson.objectid import ObjectId
+from app.columnar import BATCH, Codes, _fit, _number, _top, batches, only_inserts, version_state
+from app.rollups import _amount
+from app.versions import VERSIONS
+from results import BrandSales, DateSales, ProductStock, days_between, parse_date
+
+# NumPy es opcional (pip install numpy): solo lo necesitan la exportación y el lector
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Exportación de `sales` a archivos en columnas para reportes sin conexión. Cada columna
+# es un arreglo de ancho fijo (little-endian) en su propio archivo, que el lector abre con
+# np.memmap: abrir una exportación no lee las ventas, solo los productos y las marcas.
+#
+#   manifest.json                filas, último _id exportado, versiones leídas y tipos de cada columna
+#   products.json, brands.json   el _id de cada código de las columnas product y brand, y los documentos
+#   users.json                   el _id de cada código de la columna user (el lector lo lee si se pide)
+#   sales-<gen>.<columna>.bin
+#
+# Cada exportación sigue desde el último _id exportado hasta EXPORT_LAG antes de ahora:
+# una venta puede guardarse después de otra con un _id mayor (la cola de app/ingest.py,
+# /bulk), y con ese margen igual entra en la próxima. Como en app/columnar.py, si desde la
+# exportación anterior `sales` tuvo algo más que inserts (ver app/versions.py), o si
+# quedaron ventas sin exportar, se exporta completa en una generación nueva. manifest.json
+# se reemplaza al final: una exportación interrumpida no cambia lo que ve el lector.
+
+logger = logging.getLogger("clothing_db")
+
+MANIFEST = "manifest.json"
+DIMENSIONS = ("products", "brands", "users")
+
+COLUMNS = {"product": "<i4", "brand": "<i4", "user": "<i4", "sale_date": "<i8", "quantity": "<f8", "total": "<f8"}
+FIELDS = {
+    "sales": {"product_id": 1, "user_id": 1, "sale_date": 1, "quantity": 1, "total": 1},
+    "products": {"name": 1, "stock": 1, "brand_id": 1},
+    "brands": {"name": 1, "country": 1},
+}
+WATCHED = ("sales", "products", "brands")
+
+EXPORT_LAG = timedelta(seconds=60)
+
+EPOCH = datetime(1970, 1, 1)
+# `sale_date` en milisegundos desde 1970 (la precisión de una fecha BSON); sin fecha, este valor
+NO_DATE = -2 ** 63
+
+def available():
+    return np is not None
+
+def epoch_ms(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None)
+        delta = value - EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+    return NO_DATE
+
+def column_path(directory, generation, name):
+    return os.path.join(directory, f"sales-{generation}.{name}.bin")
+
+def dimension_path(directory, name):
+    return os.path.join(directory, f"{name}.json")
+
+def _write_json(path, text):
+    # Se escribe al lado y se reemplaza: quien lee ve el archivo anterior o el nuevo, nunca uno a medias
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def read_dimension(directory, name):
+    path = dimension_path(directory, name)
+    if not os.path.exists(path):
+        return {"keys": [], "docs": []}
+    with open(path, encoding="utf-8") as f:
+        return json_util.loads(f.read())
+
+class Dimensions:
+    """Los códigos de las columnas product, brand y user, y los productos y marcas (en su orden natural)."""
+
+    def __init__(self):
+        self.codes = {name: Codes() for name in DIMENSIONS}
+        self.docs = {"products": [], "brands": []}
+
+    @classmethod
+    def load(cls, directory):
+        dimensions = cls()
+        for name, codes in dimensions.codes.items():
+            data = read_dimension(directory, name)
+            for value in data["keys"]:
+                codes.encode(value)
+            if name in dimensions.docs:
+                dimensions.docs[name] = [(code, doc) for code, doc in data["docs"]]
+        return dimensions
+
+    def save(self, directory):
+        for name, codes in self.codes.items():
+            data = {"keys": codes.values}
+            if name in self.docs:
+                data["docs"] = [[code, doc] for code, doc in self.docs[name]]
+            _write_json(dimension_path(directory, name), json_util.dumps(data))
+
+    def refresh(self, db):
+        # Las marcas primero: así sus códigos no dependen de los brand_id de los productos
+        for name in ("brands", "products"):
+            self.docs[name] = [(self.codes[name].encode(doc["_id"]), doc) for doc in db[name].find({}, FIELDS[name])]
+
+    def product_brand(self):
+        """Código de la marca de cada producto existente; -1 si el producto no existe."""
+        brand = np.full(len(self.codes["products"]), -1, np.int32)
+        for code, doc in self.docs["products"]:
+            brand[code] = self.codes["brands"].encode(doc.get("brand_id"))
+        return brand
+
+def export_sales(db, directory, lag=EXPORT_LAG, full=False):
+    """
+    Agrega a `directory` las ventas nuevas desde la exportación anterior (o todas, con
+    `full` o si hace falta). Devuelve {mode, rows, exported, checkpoint, generation}.
+    """
+    if not available():
+        raise RuntimeError("La exportación de ventas necesita numpy: pip install numpy")
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+
+    # Las versiones se leen antes que las ventas: lo que cambie mientras tanto se ve en la próxima
+    found = {doc["_id"]: doc for doc in db[VERSIONS].find({"_id": {"$in": list(WATCHED)}})}
+    states = {name: list(version_state(found.get(name))) for name in WATCHED}
+    cutoff = ObjectId.from_datetime(datetime.now(timezone.utc) - lag)
+
+    incremental = manifest is not None and not full and only_inserts(manifest["versions"]["sales"], states["sales"])
+    if incremental:
+        generation, rows, checkpoint = manifest["generation"], manifest["rows"], manifest["checkpoint"]
+        integral = manifest["integral"]
+    else:
+        generation, rows, checkpoint = (manifest["generation"] + 1 if manifest else 1), 0, None
+        integral = {"quantity": True, "total": True}
+    # Los códigos se conservan también en una generación nueva: las columnas anteriores
+    # siguen valiendo con los JSON nuevos hasta que se reemplaza manifest.json
+    dimensions = Dimensions.load(directory)
+    # La marca de cada producto con la que se escribieron las filas ya exportadas
+    exported_brand = dimensions.product_brand()
+    dimensions.refresh(db)
+
+    # Lo que quedó de una exportación interrumpida (filas que no llegaron al manifest) se descarta
+    for name, dtype in COLUMNS.items():
+        with open(column_path(directory, generation, name), "ab") as f:
+            f.truncate(rows * np.dtype(dtype).itemsize)
+
+    query = {"_id": {"$lt": cutoff}}
+    if checkpoint is not None:
+        query["_id"]["$gt"] = ObjectId(checkpoint)
+    # Si al terminar hay menos filas que ventas hasta el corte, faltó alguna: se exporta completa
+    expected = db.sales.count_documents({"_id": {"$lt": cutoff}})
+    exported = 0
+    product_brand = dimensions.product_brand()
+    cursor = db.sales.find(query, FIELDS["sales"]).sort("_id", 1).batch_size(BATCH)
+    for batch in batches(cursor):
+        chunk = _encode(dimensions, batch, integral)
+        # Los productos que no existen (códigos nuevos de este lote) no tienen marca
+        chunk["brand"] = _fit(product_brand, len(dimensions.codes["products"]), -1)[chunk["product"]]
+        for name, dtype in COLUMNS.items():
+            with open(column_path(directory, generation, name), "ab") as f:
+                np.asarray(chunk[name], dtype).tofile(f)
+        rows += len(batch)
+        exported += len(batch)
+        checkpoint = str(batch[-1]["_id"])
+
+    if incremental and rows < expected:
+        logger.warning("Exportación de ventas: faltan %d ventas anteriores al corte, se exporta completa",
+                       expected - rows)
+        return export_sales(db, directory, lag, full=True)
+    if rows < expected:
+        logger.warning("Exportación de ventas: %d ventas sin _id de tipo ObjectId no se exportaron", expected - rows)
+
+    # Si algún producto cambió de marca (o apareció uno que ya tenía ventas), la marca de
+    # las filas ya exportadas se recalcula; otros cambios de products no la tocan
+    product_brand = _fit(product_brand, len(dimensions.codes["products"]), -1)
+    if incremental and rows > exported and not np.array_equal(_fit(exported_brand, len(product_brand), -1), product_brand):
+        _rewrite_brands(directory, generation, rows, product_brand)
+
+    dimensions.save(directory)
+    _write_json(os.path.join(directory, MANIFEST), json.dumps({
+        "generation": generation,
+        "rows": rows,
+        "checkpoint": checkpoint,
+        "columns": COLUMNS,
+        "integral": integral,
+        "versions": states,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+    }, indent=2))
+    if not incremental:
+        for path in glob.glob(os.path.join(directory, "sales-*.bin")):
+            if not os.path.basename(path).startswith(f"sales-{generation}."):
+                os.remove(path)
+    return {
+        "mode": "incremental" if incremental else "full",
+        "rows": rows,
+        "exported": exported,
+        "checkpoint": checkpoint,
+        "generation": generation,
+    }
+
+def _encode(dimensions, docs, integral):
+    products, users = dimensions.codes["products"], dimensions.codes["users"]
+    quantities = [_amount(doc.get("quantity")) for doc in docs]
+    totals = [_amount(doc.get("total")) for doc in docs]
+    integral["quantity"] = integral["quantity"] and all(isinstance(v, int) for v in quantities)
+    integral["total"] = integral["total"] and all(isinstance(v, int) for v in totals)
+    return {
+        "product": np.array([products.encode(doc.get("product_id")) for doc in docs], np.int32),
+        "user": np.array([users.encode(doc.get("user_id")) for doc in docs], np.int32),
+        "sale_date": np.array([epoch_ms(doc.get("sale_date")) for doc in docs], np.int64),
+        "quantity": np.array(quantities, np.float64),
+        "total": np.array(totals, np.float64),
+    }
+
+def _rewrite_brands(directory, generation, rows, product_brand):
+    product = np.fromfile(column_path(directory, generation, "product"), COLUMNS["product"], count=rows)
+    brand = product_brand[product]
+    path = column_path(directory, generation, "brand")
+    with open(path + ".tmp", "wb") as f:
+        np.asarray(brand, COLUMNS["brand"]).tofile(f)
+    os.replace(path + ".tmp", path)
+
+class SalesSnapshot:
+    """
+    Lector de una exportación. Responde las consultas de ClothingStoreDB (con los mismos
+    tipos de results.py) con las columnas en memoria mapeada, sin conectarse a MongoDB.
+    """
+
+    def __init__(self, directory):
+        if not available():
+            raise RuntimeError("El lector de exportaciones necesita numpy: pip install numpy")
+        manifest = read_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"No hay una exportación de ventas en '{directory}'")
+        self.manifest = manifest
+        self.rows = manifest["rows"]
+        self.integral = manifest["integral"]
+        self.columns = {
+            name: np.memmap(column_path(directory, manifest["generation"], name), dtype, mode="r", shape=(self.rows,))
+            if self.rows else np.empty(0, dtype)
+            for name, dtype in manifest["columns"].items()
+        }
+        self.directory = directory
+        self._keys = {}
+        self.docs = {}
+        for name in ("products", "brands"):
+            data = read_dimension(directory, name)
+            self._keys[name] = data["keys"]
+            self.docs[name] = [(code, doc) for code, doc in data["docs"]]
+
+    def keys(self, name):
+        """El _id de cada código de una columna (products, brands o users), para análisis propios."""
+        if name not in self._keys:
+            self._keys[name] = read_dimension(self.directory, name)["keys"]
+        return self._keys[name]
+
+    def _brands_with_sales(self):
+        # Como los $unwind del pipeline: solo ventas de productos y marcas que existen
+        brand = self.columns["brand"]
+        existing = brand >= 0
+        n_brands = len(self.keys("brands"))
+        sales = np.bincount(brand[existing], minlength=n_brands)
+        quantity = np.bincount(brand[existing], weights=self.columns["quantity"][existing], minlength=n_brands)
+        brands = np.array([code for code, _ in self.docs["brands"]], np.int64)
+        return brands[sales[brands] > 0], quantity
+
+    def get_sold_quantity_by_date(self, date_str):
+        return self.get_sold_quantity_by_dates([date_str])[0]
+
+    def get_sold_quantity_by_dates(self, date_strs):
+        return self._sold_quantity_on([parse_date(date_str) for date_str in date_strs])
+
+    def get_sold_quantity_by_date_range(self, start_str, end_str):
+        return self._sold_quantity_on(days_between(start_str, end_str))
+
+    def _sold_quantity_on(self, dates):
+        # Como el $match por igualdad: solo cuentan las ventas con esa fecha exacta (a las 00:00)
+        targets = np.unique(np.array([epoch_ms(date) for date in dates], np.int64))
+        sale_date = self.columns["sale_date"]
+        if len(targets) == 1:
+            hit = sale_date == targets[0]
+            position = np.zeros(int(hit.sum()), np.int64)
+        elif len(targets):
+            # Fecha pedida de cada venta: la posición donde iría entre las pedidas, si es igual
+            position = np.minimum(np.searchsorted(targets, sale_date), len(targets) - 1)
+            hit = targets[position] == sale_date
+            position = position[hit]
+        else:
+            hit, position = np.zeros(len(sale_date), bool), np.zeros(0, np.int64)
+        quantity = np.bincount(position, weights=self.columns["quantity"][hit], minlength=len(targets)).tolist()
+        sales = np.bincount(position, minlength=len(targets)).tolist()
+        index = {value: i for i, value in enumerate(targets.tolist())}
+        result = []
+        for date in dates:
+            i = index[epoch_ms(date)]
+            result.append(DateSales(date, _number(quantity[i], self.integral["quantity"]) if sales[i] else 0, sales[i]))
+        return result
+
+    def get_brands_with_sales(self):
+        brands, _ = self._brands_with_sales()
+        docs = dict(self.docs["brands"])
+        return [docs[code].get("name") for code in brands.tolist()]
+
+    def get_sold_products_and_stock(self):
+        n_products = len(self.keys("products"))
+        sold = np.bincount(self.columns["product"], weights=self.columns["quantity"], minlength=n_products).tolist()
+        # Con al menos una venta, aunque sumen 0 unidades (igual que ClothingStoreDB)
+        sales = np.bincount(self.columns["product"], minlength=n_products).tolist()
+        return [
+            ProductStock(doc["_id"], doc.get("name"), _number(sold[code], self.integral["quantity"]), doc.get("stock"))
+            for code, doc in self.docs["products"] if sales[code] > 0
+        ]
+
+    def get_top_5_brands_by_sales(self, top=5):
+        brands, quantity = self._brands_with_sales()
+        brands = _top(brands, quantity[brands], top)
+        docs = dict(self.docs["brands"])
+        return [
+            BrandSales(docs[code].get("name"), _number(total, self.integral["quantity"]))
+            for code, total in zip(brands.tolist(), quantity[brands].tolist())
+        ]
@@ -8,6 +8,8 @@
 (() => {
   // ---------- CONFIG ----------
   const API_BASE = 'http://127.0.0.1:5000/clothing/api/v1/';
+  // Documentos por petición (limit de la API, máximo 500): las colecciones se cargan por páginas
+  const FETCH_LIMIT = 500;
 
   const COLLECTIONS = {
     brands:    { title: 'Marcas',    endpoint: 'brands',   icon: 'bi-shop', relFor: {} },
@@ -32,6 +34,8 @@
   let currentPage = 1;
   let pageSize = 5;
   const pageSizes = [5, 10, 25, 50];
+  // next_cursor de la última página pedida a la API (null si ya se cargó todo)
+  let nextCursor = null;
 
   const relatedCache = {};
 
@@ -118,9 +122,42 @@
         else if (v.$oid) r[k] = v.$oid;
       }
     });
+    // Relaciones resueltas por la API con ?expand= (product_id -> product): se guardan como etiquetas
+    // en una propiedad no enumerable para que no aparezcan como columnas
+    const labels = { ...(row.__labels || {}) };
+    Object.keys(COLLECTIONS[currentCollection].relFor || {}).forEach(col => {
+      const key = col.replace(/_id$/, '');
+      if (key in r && (r[key] === null || typeof r[key] === 'object')) {
+        if (r[key]) labels[col] = pickLabel(normalize(r[key]), r[col]);
+        delete r[key];
+      }
+    });
+    Object.defineProperty(r, '__labels', { value: labels, enumerable: false });
     return r;
   }
 
+  // Mejor lógica para elegir el label representativo
+  function pickLabel(n, fallback) {
+    if (n.name) return n.name;
+    if (n.title) return n.title;
+    if (n.username) return n.username;
+    if (n.email) return n.email;
+    if (n.country) return n.country;
+    if (n.category) return n.category;
+    if (n.brand) return n.brand;
+    if (n.product) return n.product;
+    return String(fallback);
+  }
+
+  // Una página de la colección (limit/after) con las relaciones resueltas por la API (?expand=)
+  function pageQuery(key, after = null) {
+    const params = new URLSearchParams({ limit: FETCH_LIMIT });
+    const rels = Object.keys(COLLECTIONS[key].relFor || {});
+    if (rels.length) params.set('expand', rels.join(','));
+    if (after) params.set('after', after);
+    return `?${params}`;
+  }
+
   function titleCase(s){ return s.replace(/_/g,' ').split(' ').map(x => x.charAt(0).toUpperCase() + x.slice(1)).join(' '); }
   function prettyCol(col){ if (!col) return ''; if (col === '_id' || col === 'id') return 'ID'; return titleCase(col); }
 
@@ -138,7 +175,7 @@
   }
 
   // ---------- CRUD ----------
-  async function list(endpoint){ return apiFetch(`/${endpoint}`); }
+  async function list(endpoint, query=''){ return apiFetch(`/${endpoint}${query}`); }
   async function getById(endpoint, id){ return apiFetch(`/${endpoint}?id=${encodeURIComponent(id)}`); }
   async function create(endpoint, payload){ return apiFetch(`/${endpoint}`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) }); }
   async function update(endpoint, id, payload){ return apiFetch(`/${endpoint}?id=${encodeURIComponent(id)}`, { method: 'PUT', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) }); }
@@ -203,8 +240,9 @@
     showToast(`Colección "${COLLECTIONS[currentCollection].title}" cargada — ${rawData.length} registros`, 'info', 900);
   }
 
-  function resolveRelatedLabel(col, id) {
+  function resolveRelatedLabel(col, id, row) {
     if (!id) return '';
+    if (row && row.__labels && row.__labels[col]) return row.__labels[col];
     const relFor = COLLECTIONS[currentCollection].relFor || {};
     const relCollection = relFor[col];
     if (!relCollection) return String(id);
@@ -261,7 +299,7 @@
         if (col === '_id') {
           td.textContent = row._id ?? '';
         } else if (/_id$/.test(col) && row[col]) {
-          td.textContent = resolveRelatedLabel(col, row[col]);
+          td.textContent = resolveRelatedLabel(col, row[col], row);
         } else {
           let v = row[col];
           if (Array.isArray(v)) v = v.join(', ');
@@ -289,7 +327,7 @@
     const rowsInfo = document.getElementById('rowsInfo');
     if (!rowsInfo) return;
     if (total === 0) rowsInfo.textContent = `0 registros`;
-    else rowsInfo.textContent = `Mostrando ${from}-${to} de ${total} registros (página ${currentPage})`;
+    else rowsInfo.textContent = `Mostrando ${from}-${to} de ${total}${nextCursor ? '+' : ''} registros (página ${currentPage})`;
   }
 
   // ---------- PAGINACIÓN ----------
@@ -331,6 +369,15 @@
 
     paginationContainer.appendChild(ul);
 
+    // Quedan documentos en la API: se piden solo si el usuario los quiere ver
+    if (nextCursor) {
+      const more = document.createElement('button');
+      more.className = 'btn btn-sm btn-outline-secondary ms-2';
+      more.textContent = 'Cargar más';
+      more.addEventListener('click', loadMore);
+      paginationContainer.appendChild(more);
+    }
+
     if (pageSizeSelectFooter) {
       pageSizeSelectFooter.innerHTML = pageSizes.map(sz => `<option value="${sz}" ${sz === pageSize ? 'selected' : ''}>${sz}</option>`).join('');
       pageSizeSelectFooter.onchange = (e) => { pageSize = Number(e.target.value) || 5; currentPage = 1; applyFilterAndRenderRows(activeFilters); };
@@ -394,23 +441,13 @@
   async function fetchRelated(rel) {
     if (relatedCache[rel]) return relatedCache[rel];
     try {
-      const listData = await list(rel);
-      const arr = Array.isArray(listData) ? listData : (listData ? [listData] : []);
+      // Solo la primera página: el valor actual de un registro se agrega aparte (ver makeFormFields)
+      const listData = await list(rel, `?limit=${FETCH_LIMIT}`);
+      const arr = Array.isArray(listData.data) ? listData.data : [];
       const mapped = arr.map(it => {
         const n = normalize(it);
         const value = n._id ?? n.id ?? '';
-        // Mejor lógica para elegir el label representativo
-        let label = '';
-        if (n.name) label = n.name;
-        else if (n.title) label = n.title;
-        else if (n.username) label = n.username;
-        else if (n.email) label = n.email;
-        else if (n.country) label = n.country;
-        else if (n.category) label = n.category;
-        else if (n.brand) label = n.brand;
-        else if (n.product) label = n.product;
-        else label = String(value);
-        return { value, label };
+        return { value, label: pickLabel(n, value) };
       });
       relatedCache[rel] = mapped;
       return mapped;
@@ -478,7 +515,10 @@
       }
 
       if (/_id$/.test(key)) {
-        const options = relData[key] || [];
+        const options = (relData[key] || []).slice();
+        if (val && !options.some(o => String(o.value) === String(val))) {
+          options.unshift({ value: val, label: (sample.__labels || {})[key] || String(val) });
+        }
         const opts = [`<option value="">-- Seleccione ${prettyCol(key)} --</option>`]
           .concat(options.map(o => `<option value="${o.value}">${o.label}</option>`))
           .join('');
@@ -610,6 +650,8 @@
 
   function markReportButton(id) {
     clearReportMarks();
+    // Los reportes llegan completos: no hay página siguiente que cargar
+    nextCursor = null;
     if (!id) return;
     const btn = document.getElementById(id);
     if (!btn) return;
@@ -664,9 +706,9 @@
     const keys = Object.keys(COLLECTIONS);
     const counts = await Promise.all(keys.map(async k => {
       try {
-        const l = await list(COLLECTIONS[k].endpoint);
-        const arr = Array.isArray(l) ? l : (l ? [l] : []);
-        return arr.length;
+        // Solo la primera página: más allá de FETCH_LIMIT se muestra "500+"
+        const page = await list(COLLECTIONS[k].endpoint, `?limit=${FETCH_LIMIT}`);
+        return `${page.data.length}${page.next_cursor ? '+' : ''}`;
       } catch (err) { console.error('Error counting', k, err); return 0; }
     }));
 
@@ -747,17 +789,38 @@
     collectionTitle.textContent = meta.title;
     collectionSubtitle.textContent = `${meta.title} (Panel de administración)`;
     try {
-      const data = await list(meta.endpoint);
+      // Las relaciones llegan resueltas en la misma respuesta (una consulta por relación en el servidor)
+      const page = await list(meta.endpoint, pageQuery(key));
+      nextCursor = page.next_cursor;
       clearReportMarks();
       markCollectionActive(key);
-      renderTable(data);
+      renderTable(page.data);
     } catch (err) {
       console.error(err);
       showToast('Error cargando colección: ' + (err.message || ''), 'danger', 4000);
+      nextCursor = null;
       renderTable([]);
     }
   }
 
+  // Siguiente página de la API: se agrega a lo ya cargado (la búsqueda y los filtros trabajan sobre eso)
+  async function loadMore() {
+    const key = currentCollection;
+    if (!nextCursor) return;
+    try {
+      const page = await list(COLLECTIONS[key].endpoint, pageQuery(key, nextCursor));
+      if (key !== currentCollection) return;
+      nextCursor = page.next_cursor;
+      const shownPage = currentPage;
+      renderTable(rawData.concat(page.data));
+      currentPage = shownPage;
+      applyFilterAndRenderRows(activeFilters);
+    } catch (err) {
+      console.error(err);
+      showToast('Error cargando más registros: ' + (err.message || ''), 'danger', 4000);
+    }
+  }
+
   // ---------- FILTERS ----------
   let activeFilters = null;
   function detectFieldType(col) {